@@ -1,3 +1,12 @@
 from django.contrib import admin
+from .models import OutgoingEmail
 
 # Register your models here.
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['subject', 'dedup_key']
+    readonly_fields = ['dedup_key', 'attempts', 'last_error', 'claimed_at', 'created_at', 'sent_at']
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        # LOGGING'deki kuyruk handler'larının listener thread'leri (core.logging)
+        from .logging import start_queue_listeners
+
+        start_queue_listeners()
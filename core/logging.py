@@ -0,0 +1,237 @@
+"""
+Loglama altyapısı
+
+İstek thread'i log yazarken diske/konsola dokunmaz:
+    logger -> QueueListenerHandler (kuyruğa at) -> listener thread -> console / JSON dosya
+
+- QueueListenerHandler: kayıtları sınırlı bir kuyruğa koyar; kuyruk doluysa
+  kaydı bekletmeden atar ve sayar - atılan sayısı en fazla dakikada bir, bir de
+  listener dururken WARNING olarak yazılır. Hedef handler'lar adlarıyla verilir
+  (dictConfig handler objesi veremediği için); listener CoreConfig.ready() içinde başlar.
+- JSONFormatter: her kayıt tek satır JSON (makine tarafından okunabilir).
+- SizedTimedRotatingFileHandler: gece yarısı veya dosya boyutu aşınca döndürür.
+- SamplingFilter: yüksek hacimli logger'ların INFO/DEBUG kayıtlarından sadece
+  bir oranını geçirir; WARNING ve üstü her zaman geçer.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+import weakref
+from datetime import datetime, timezone
+
+# LogRecord'un kendi alanları - geri kalanlar extra={...} ile eklenmiştir
+RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SizedTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Zamana göre döndürme + dosya max_bytes'ı aşarsa erken döndürme"""
+
+    def __init__(self, filename, max_bytes=0, **kwargs):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        super().__init__(filename, **kwargs)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes and self.stream is not None:
+            self.stream.seek(0, 2)
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+
+class SamplingFilter(logging.Filter):
+    """
+    rates: {"custom.listings.images": 0.1} - logger adı (veya ebeveyni) -> geçme oranı
+    En uzun eşleşen önek kullanılır; eşleşmeyen logger'lar filtrelenmez.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def rate_for(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+def handler_by_name(name):
+    """dictConfig'te adıyla tanımlanmış handler"""
+    if hasattr(logging, "getHandlerByName"):
+        return logging.getHandlerByName(name)
+    # Python < 3.12: genel bir API yok
+    return logging._handlers.get(name)
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """QueueListener.stop() sentinel'i put_nowait ile koyar; sınırlı kuyruk doluysa Full atardı"""
+
+    def enqueue_sentinel(self):
+        # Listener thread'i kuyruğu boşalttıkça yer açılır
+        self.queue.put(self._sentinel)
+
+
+# Oluşturulan tüm QueueListenerHandler'lar (start/stop/fork için)
+_queue_handlers = weakref.WeakSet()
+
+
+class QueueListenerHandler(logging.Handler):
+    """
+    Kayıtları sınırlı bir kuyruğa koyan handler; targets'taki handler'lar
+    (LOGGING['handlers'] adları) ayrı bir listener thread'inde çalışır.
+
+    logging.handlers.QueueHandler'dan türetilmez: Python 3.12+ dictConfig
+    QueueHandler alt sınıflarına kendi kuyruğunu/listener'ını verir ve
+    yapıcı argümanlarını değiştirir. Listener CoreConfig.ready() içinde
+    start_queue_listeners() ile başlatılır; fork sonrası çocuk süreçte
+    (ör. gunicorn --preload) yeniden başlatılır, çıkışta durdurulur.
+    """
+
+    # Atılan kayıt sayısının raporlanma aralığı (saniye)
+    DROP_REPORT_INTERVAL = 60
+
+    def __init__(self, targets, queue_size=10000):
+        super().__init__()
+        self.queue_size = queue_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.target_names = targets
+        self.targets = []
+        self.listener = None
+        self.dropped = 0
+        self.next_drop_report = 0
+        _queue_handlers.add(self)
+
+    def start(self):
+        if self.listener is not None:
+            return
+        self.targets = [handler_by_name(name) for name in self.target_names]
+        self.listener = DrainingQueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener:
+            # Kuyrukta kalanları yazıp thread'i kapatır
+            self.listener.stop()
+            self.listener = None
+        if self.dropped:
+            # Listener yok - sayıyı doğrudan hedeflere (yoksa lastResort'a) yaz
+            record = self.dropped_record()
+            for handler in self.targets or [logging.lastResort]:
+                if handler is not None and record.levelno >= handler.level:
+                    handler.handle(record)
+            self.dropped = 0
+
+    def close(self):
+        self.stop()
+        super().close()
+
+    def dropped_record(self):
+        record = logging.LogRecord(
+            "custom.logging", logging.WARNING, __file__, 0,
+            f"[Logging] Kuyruk dolu olduğu için {self.dropped} log kaydı atıldı", None, None,
+        )
+        record.dropped = self.dropped
+        return record
+
+    def report_dropped(self):
+        """Atılan kayıt sayısını kuyruğa WARNING olarak koy - yer yoksa sonra tekrar dener"""
+        try:
+            self.queue.put_nowait(self.dropped_record())
+        except queue.Full:
+            return
+        self.dropped = 0
+        self.next_drop_report = time.monotonic() + self.DROP_REPORT_INTERVAL
+
+    def reset_after_fork(self):
+        # Listener thread'i çocuk sürece geçmez; kuyruk da yarım kalmış bir kilit taşıyabilir
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.listener = None
+
+    def prepare(self, record):
+        """
+        Mesajı burada birleştir (args thread'ler arası taşınmasın),
+        exception'ı metne çevir; biçimlendirme listener'daki handler'ın işi.
+        """
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        # Listener başlamadan gelen kayıtlar kuyrukta bekler.
+        # Handler.handle emit'i self.lock altında çağırır; sayaç thread-safe.
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            # İsteği bekletmektense kaydı kaybetmek tercih edilir
+            self.dropped += 1
+            return
+        except Exception:
+            self.handleError(record)
+            return
+        if self.dropped and time.monotonic() >= self.next_drop_report:
+            self.report_dropped()
+
+
+def queue_handlers():
+    return list(_queue_handlers)
+
+
+def start_queue_listeners():
+    for handler in queue_handlers():
+        handler.start()
+
+
+def stop_queue_listeners():
+    for handler in queue_handlers():
+        handler.stop()
+
+
+def restart_queue_listeners_after_fork():
+    for handler in queue_handlers():
+        handler.reset_after_fork()
+        handler.start()
+
+
+atexit.register(stop_queue_listeners)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=restart_queue_listeners_after_fork)
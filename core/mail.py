@@ -0,0 +1,135 @@
+"""
+E-posta outbox'ı
+
+queue_email()   -> OutgoingEmail kaydı (istek içinde, SMTP'siz)
+send_pending()  -> vadesi gelenleri tek bağlantıyla toplu gönder (send_queued_emails komutu)
+
+Başarısız gönderimler üstel bekleme ile tekrar denenir:
+EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2^(deneme-1), EMAIL_OUTBOX_MAX_ATTEMPTS
+denemeden sonra 'failed' olarak kalır.
+"""
+
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import OutgoingEmail
+
+logger = logging.getLogger("custom.mail")
+
+# Gönderim sırasında çöken bir worker'ın kayıtları bu süreden sonra tekrar alınır
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def queue_email(subject, message, recipient_list, from_email=None, html_message=None, dedup_key=None):
+    """
+    E-postayı kuyruğa ekle. dedup_key verilmişse ve aynı anahtarla kayıt
+    varsa yenisi eklenmez. Dönen değer: OutgoingEmail veya None (tekrar)
+    """
+    try:
+        with transaction.atomic():
+            return OutgoingEmail.objects.create(
+                subject=subject,
+                body=message,
+                html_body=html_message or '',
+                from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+                to=list(recipient_list),
+                dedup_key=dedup_key,
+            )
+    except IntegrityError:
+        logger.info(f"[Mail] Tekrar eden e-posta atlandı: {dedup_key}")
+        return None
+
+
+def claim_batch(batch_size):
+    """
+    Vadesi gelen kayıtları 'sending' olarak işaretleyip al - paralel worker'lar aynı kaydı almaz.
+
+    Adaylar kilitsiz okunur; her biri, okunduğu durum (status, claimed_at) hâlâ
+    geçerliyse koşullu UPDATE ile alınır. UPDATE satır yazdıysa kayıt bizimdir,
+    yazmadıysa başka bir worker önce almıştır. select_for_update(skip_locked)
+    SQLite'ta etkisiz olduğundan her veritabanında bu yol kullanılır.
+    """
+    now = timezone.now()
+    candidates = (
+        OutgoingEmail.objects
+        .filter(
+            Q(status='pending', next_attempt_at__lte=now) |
+            Q(status='sending', claimed_at__lt=now - CLAIM_TIMEOUT)
+        )
+        .order_by('next_attempt_at')[:batch_size]
+    )
+    emails = []
+    for email in candidates:
+        claimed = OutgoingEmail.objects.filter(
+            pk=email.pk, status=email.status, claimed_at=email.claimed_at,
+        ).update(status='sending', claimed_at=now)
+        if claimed:
+            email.status, email.claimed_at = 'sending', now
+            emails.append(email)
+    return emails
+
+
+def mark_failed(email, error):
+    email.attempts += 1
+    email.last_error = str(error)[:2000]
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'failed'
+        logger.error(f"[Mail] Gönderilemedi, denemeler bitti: ID={email.pk} Hata: {error}")
+    else:
+        email.status = 'pending'
+        delay = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (email.attempts - 1)
+        email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        logger.warning(f"[Mail] Gönderilemedi, {delay} sn sonra tekrar: ID={email.pk} Hata: {error}")
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def send_pending(batch_size=None):
+    """
+    Bir batch gönder. Tüm batch tek SMTP bağlantısını kullanır.
+    Dönen değer: (gönderilen, başarısız) sayıları
+    """
+    emails = claim_batch(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # Sunucuya ulaşılamıyor - hepsi beklemeye döner
+        for email in emails:
+            mark_failed(email, e)
+        return 0, len(emails)
+
+    sent = failed = 0
+    try:
+        for email in emails:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.to,
+                connection=connection,
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+            try:
+                message.send()
+            except Exception as e:
+                mark_failed(email, e)
+                failed += 1
+                continue
+            email.status = 'sent'
+            email.sent_at = timezone.now()
+            email.attempts += 1
+            email.save(update_fields=['status', 'sent_at', 'attempts'])
+            sent += 1
+    finally:
+        connection.close()
+
+    logger.info(f"[Mail] Batch gönderildi: {sent} başarılı, {failed} başarısız")
+    return sent, failed
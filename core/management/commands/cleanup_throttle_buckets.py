@@ -0,0 +1,41 @@
+"""
+Django Management Command: Dolmuş throttle kovalarını temizle
+
+DatabaseThrottleStore anahtar başına bir satır tutar (ör. login için IP başına).
+tat geçmişte kalan satır, hiç olmamış bir satırla aynı anlama gelir; bu komut
+onları siler ki tablo büyümesin (store da PURGE_INTERVAL'de bir aynısını yapar).
+Cache ve Redis store'larda anahtarlar kendiliğinden düşer.
+
+Kullanım:
+    python manage.py cleanup_throttle_buckets
+    python manage.py cleanup_throttle_buckets --dry-run
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from core.models import ThrottleBucket
+from core.throttles import DatabaseThrottleStore
+
+
+class Command(BaseCommand):
+    help = 'Süresi dolan throttle kovalarını siler'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sadece say, silme',
+        )
+
+    def handle(self, *args, **options):
+        now = time.time()
+
+        if options['dry_run']:
+            count = ThrottleBucket.objects.filter(tat__lt=now).count()
+            self.stdout.write(
+                self.style.WARNING(f'🧪 DRY RUN: {count} kova silinecekti')
+            )
+            return
+
+        deleted = DatabaseThrottleStore.purge(now)
+        self.stdout.write(self.style.SUCCESS(f'✅ {deleted} süresi dolmuş kova silindi'))
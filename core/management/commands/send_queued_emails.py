@@ -0,0 +1,58 @@
+"""
+Django Management Command: Outbox'taki e-postaları gönder
+
+Vadesi gelen e-postalar batch'ler halinde, her batch tek SMTP bağlantısıyla
+gönderilir. Başarısızlar üstel beklemeyle tekrar denenir (bkz. core.mail).
+
+Kullanım:
+    python manage.py send_queued_emails              # kuyruğu boşalt ve çık (cron)
+    python manage.py send_queued_emails --loop       # sürekli çalışan worker
+    python manage.py send_queued_emails --loop --interval 10
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from core.mail import send_pending
+
+
+class Command(BaseCommand):
+    help = 'Outbox\'taki e-postaları toplu olarak gönderir'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Kuyruk boşalınca çıkmak yerine bekleyip tekrar kontrol et',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='--loop: boş kuyrukta bekleme süresi (saniye, default: 5)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Tek bağlantıyla gönderilecek e-posta sayısı (default: EMAIL_OUTBOX_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = send_pending(options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    self.stdout.write(f'📍 Gönderildi: {sent}, başarısız: {failed}')
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Tamamlandı! {total_sent} e-posta gönderildi, {total_failed} başarısız'
+        ))
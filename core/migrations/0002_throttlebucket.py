@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-19 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('tat', models.FloatField()),
+            ],
+            options={
+                'verbose_name': 'Throttle Kovası',
+                'verbose_name_plural': 'Throttle Kovaları',
+                'indexes': [models.Index(fields=['tat'], name='throttle_bucket_tat')],
+            },
+        ),
+    ]
@@ -1,3 +1,118 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
+
+
+class FieldTrackerMixin:
+    """
+    DB'den yüklenen alan değerlerini saklayıp değişiklikleri sorgusuz hesaplar.
+
+    Kullanım:
+        class Listing(FieldTrackerMixin, models.Model):
+            tracked_fields = ["title", "price", "province"]
+
+        listing.get_changes()  # {"price": (eski, yeni)}
+
+    Anlık görüntü instance DB'den oluşturulurken (from_db) ve her save'den
+    sonra alınır; ayrı bir SELECT veya modül seviyesinde sözlük gerekmez.
+    ForeignKey alanlarında id'ler karşılaştırılır (ilişkili obje yüklenmez).
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tracked_snapshot = instance._take_snapshot()
+        return instance
+
+    def _tracked_attnames(self):
+        return {name: self._meta.get_field(name).attname for name in self.tracked_fields}
+
+    def _take_snapshot(self):
+        # Ertelenmiş (defer/only) alanlar okunmaz - okumak sorgu çalıştırır
+        deferred = self.get_deferred_fields()
+        return {
+            name: getattr(self, attname)
+            for name, attname in self._tracked_attnames().items()
+            if attname not in deferred
+        }
+
+    def get_changes(self):
+        """Son yükleme/kayıttan beri değişen izlenen alanlar: {alan: (eski, yeni)}"""
+        snapshot = getattr(self, '_tracked_snapshot', None)
+        if not snapshot:
+            return {}
+        changes = {}
+        for name, attname in self._tracked_attnames().items():
+            if name in snapshot and snapshot[name] != getattr(self, attname):
+                changes[name] = (snapshot[name], getattr(self, attname))
+        return changes
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save sinyalleri eski görüntüyü gördü - artık kaydedilen hali referans
+        self._tracked_snapshot = self._take_snapshot()
+
+
+class OutgoingEmail(models.Model):
+    """
+    Gönderilecek e-posta kuyruğu (outbox).
+
+    İstek içinde SMTP'ye bağlanılmaz; e-posta bu tabloya yazılır ve
+    send_queued_emails komutu tek SMTP bağlantısı üzerinden toplu gönderir.
+    Kayıt, onu oluşturan işlemle (ör. kullanıcı kaydı) aynı transaction'da
+    yazılır - işlem geri alınırsa e-posta da gitmez.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Bekliyor'),
+        ('sending', 'Gönderiliyor'),
+        ('sent', 'Gönderildi'),
+        ('failed', 'Başarısız'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    # Aynı e-postanın iki kez kuyruğa girmesini engeller (ör. "welcome:<user_id>")
+    dedup_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Giden E-posta'
+        verbose_name_plural = 'Giden E-postalar'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outgoing_email_due'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)} ({self.status})"
+
+
+class ThrottleBucket(models.Model):
+    """
+    GCRA throttle durumu (core.throttles.DatabaseThrottleStore) - anahtar başına
+    tek satır. tat: "teorik varış zamanı" (unix saniye); tat <= şimdi olan satır
+    hiç olmamış gibidir, cleanup_throttle_buckets ile silinir.
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    tat = models.FloatField()
+
+    class Meta:
+        verbose_name = 'Throttle Kovası'
+        verbose_name_plural = 'Throttle Kovaları'
+        indexes = [
+            models.Index(fields=['tat'], name='throttle_bucket_tat'),
+        ]
+
+    def __str__(self):
+        return f"{self.key}: {self.tat}"
@@ -0,0 +1,120 @@
+"""
+Dosya gönderimi (sendfile)
+
+Dosyanın byte'larını Python worker'ı yerine front sunucuya (nginx/Apache)
+gönderttirir. Django sadece yetki ve header işini yapar, transfer için:
+- nginx:     X-Accel-Redirect: <internal URL>
+- xsendfile: X-Sendfile: <mutlak yol> (Apache mod_xsendfile, lighttpd)
+
+SENDFILE_BACKEND ayarlı değilse (lokal geliştirme) dosya Python'dan,
+Range ve If-Modified-Since desteğiyle gönderilir.
+"""
+
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def internal_url(path):
+    """Mutlak dosya yolunu SENDFILE_LOCATIONS'taki internal URL'e çevir"""
+    for root, url_prefix in settings.SENDFILE_LOCATIONS.items():
+        root = os.path.join(os.path.abspath(root), "")
+        if path.startswith(root):
+            return url_prefix.rstrip("/") + "/" + path[len(root):].replace(os.sep, "/")
+    raise ValueError(f"SENDFILE_LOCATIONS içinde olmayan dosya: {path}")
+
+
+def parse_range(header, size):
+    """
+    Tek aralıklı Range header'ını (start, end) olarak döndür.
+    Header yoksa/desteklenmiyorsa None, karşılanamıyorsa ValueError.
+    Çoklu aralık (multipart/byteranges) desteklenmez - tüm dosya gönderilir.
+    """
+    match = RANGE_RE.match(header or "")
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-500: son 500 byte
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Karşılanamayan aralık")
+    return start, end
+
+
+def file_range_iterator(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def sendfile(request, path, content_type=None):
+    """
+    Dosyayı front sunucuya devret veya Python'dan gönder.
+    Dönen response'a Cache-Control/Vary gibi header'lar çağıran tarafından eklenebilir.
+    """
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Dosya bulunamadı.")
+
+    if content_type is None:
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime):
+        response = HttpResponseNotModified()
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        return response
+
+    backend = settings.SENDFILE_BACKEND
+    if backend == "nginx":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = internal_url(path)
+    elif backend == "xsendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = path
+    else:
+        response = serve_file(request, path, stat.st_size, content_type)
+
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def serve_file(request, path, size, content_type):
+    """Python fallback: tam dosya (FileResponse) veya tek aralık (206)"""
+    try:
+        byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(path, "rb"), content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        file_range_iterator(path, start, length), status=206, content_type=content_type
+    )
+    response["Content-Length"] = str(length)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
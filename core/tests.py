@@ -1,3 +1,421 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import os
+import sys
+import time
+from datetime import timedelta
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from listings.tests import MediaTestCase, make_image, make_listing
+from listings.models import Listing, ListingImage
+from listings.views import ListingPagination
+from locations.models import Province
+from . import throttles
+from .logging import JSONFormatter, QueueListenerHandler, SamplingFilter
+from .mail import CLAIM_TIMEOUT, claim_batch, queue_email, send_pending
+from .models import OutgoingEmail, ThrottleBucket
+from .throttles import CacheThrottleStore, DatabaseThrottleStore, ListingSearchThrottle, LoginThrottle
 
-# Create your tests here.
+
+class ServeMediaTests(MediaTestCase):
+    def setUp(self):
+        self.listing = make_listing()
+        self.listing_image = ListingImage.objects.create(listing=self.listing, image=make_image())
+        self.url = f'/media/{self.listing_image.image.name}'
+        self.size = self.listing_image.image.size
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content)), self.size)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-99')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-99/{self.size}')
+        self.assertEqual(len(b''.join(response.streaming_content)), 100)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(response['Content-Range'], f'bytes {self.size - 10}-{self.size - 1}/{self.size}')
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={self.size}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_not_modified(self):
+        mtime = os.stat(default_storage.path(self.listing_image.image.name)).st_mtime
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(mtime + 1))
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(SENDFILE_BACKEND='nginx')
+    def test_nginx_backend(self):
+        with override_settings(SENDFILE_LOCATIONS={default_storage.location: '/protected/media/'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/media/{self.listing_image.image.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_path_traversal_and_hidden_files(self):
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/.hidden').status_code, 404)
+        self.assertEqual(self.client.get('/media/listing_images/').status_code, 404)
+
+    def test_inactive_listing_only_visible_to_owner(self):
+        self.listing.is_active = False
+        self.listing.save()
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_login(self.listing.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_deleted_listing_hidden(self):
+        self.listing.is_deleted = True
+        self.listing.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        for path in self.listing_image.blob.file_paths():
+            self.assertEqual(self.client.get(f'/media/{path}').status_code, 404, path)
+
+
+class FieldTrackerTests(TestCase):
+    def setUp(self):
+        self.listing = make_listing()
+
+    def test_changes_without_query(self):
+        listing = Listing.objects.get(pk=self.listing.pk)
+        listing.price = 90000
+        listing.title = 'Yeni başlık'
+        with self.assertNumQueries(0):
+            changes = listing.get_changes()
+        self.assertEqual(changes, {'price': (100000, 90000), 'title': ('İlan', 'Yeni başlık')})
+
+    def test_snapshot_reset_after_save(self):
+        listing = Listing.objects.get(pk=self.listing.pk)
+        listing.price = 90000
+        with self.assertLogs('custom.listings', 'INFO') as logs:
+            listing.save()
+        self.assertIn("price: '100000.00' → '90000'", logs.output[0])
+        self.assertEqual(listing.get_changes(), {})
+
+    def test_foreign_keys_compared_by_id(self):
+        province = Province.objects.create(api_id=34, name='İstanbul')
+        listing = Listing.objects.get(pk=self.listing.pk)
+        listing.province = province
+        self.assertEqual(listing.get_changes(), {'province': (None, province.pk)})
+
+    def test_deferred_fields_not_loaded(self):
+        listing = Listing.objects.only('id', 'price').get(pk=self.listing.pk)
+        with self.assertNumQueries(0):
+            listing.price = 1
+            self.assertEqual(listing.get_changes(), {'price': (100000, 1)})
+
+    def test_new_instance_has_no_changes(self):
+        self.assertEqual(Listing(title='Yeni').get_changes(), {})
+
+
+class CollectingHandler(logging.Handler):
+    def __init__(self, name):
+        super().__init__()
+        self.set_name(name)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def make_record(msg='mesaj %s', args=('arg',), level=logging.INFO, name='custom.test', **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    def test_json_formatter(self):
+        try:
+            raise ValueError('hata')
+        except ValueError:
+            record = make_record(listing_id=5)
+            record.exc_info = sys.exc_info()
+
+        data = json.loads(JSONFormatter().format(record))
+        self.assertEqual(data['message'], 'mesaj arg')
+        self.assertEqual(data['level'], 'INFO')
+        self.assertEqual(data['logger'], 'custom.test')
+        self.assertEqual(data['listing_id'], 5)
+        self.assertIn('ValueError: hata', data['exc'])
+
+    def test_sampling_filter(self):
+        sampling = SamplingFilter({'custom.listings': 0.0, 'custom.listings.images.keep': 1.0})
+        self.assertFalse(sampling.filter(make_record(name='custom.listings.images')))
+        self.assertTrue(sampling.filter(make_record(name='custom.listings.images', level=logging.WARNING)))
+        self.assertTrue(sampling.filter(make_record(name='custom.listings.images.keep.x')))
+        self.assertTrue(sampling.filter(make_record(name='custom.messages')))
+
+    def make_handler(self, queue_size):
+        target = CollectingHandler('test-queue-target')
+        handler = QueueListenerHandler(['test-queue-target'], queue_size=queue_size)
+        self.addCleanup(handler.close)
+        return handler, target
+
+    def test_records_written_by_listener(self):
+        handler, target = self.make_handler(queue_size=10)
+        handler.start()
+        handler.handle(make_record())
+        handler.stop()
+
+        self.assertEqual(len(target.records), 1)
+        record = target.records[0]
+        # Mesaj kuyruğa girerken birleştirildi
+        self.assertEqual((record.msg, record.args), ('mesaj arg', None))
+
+    def test_dropped_records_reported_on_stop(self):
+        handler, target = self.make_handler(queue_size=2)
+        for i in range(5):
+            handler.handle(make_record(args=(i,)))
+        self.assertEqual(handler.dropped, 3)
+
+        # Listener dururken dolu kuyruk boşaltılır, atılan sayısı en sona yazılır
+        handler.start()
+        handler.stop()
+        self.assertEqual([r.getMessage() for r in target.records[:2]], ['mesaj 0', 'mesaj 1'])
+        self.assertEqual(target.records[-1].levelno, logging.WARNING)
+        self.assertEqual(target.records[-1].dropped, 3)
+        self.assertEqual(handler.dropped, 0)
+
+    def test_dropped_records_reported_when_queue_has_room(self):
+        handler, target = self.make_handler(queue_size=2)
+        for i in range(3):
+            handler.handle(make_record(args=(i,)))
+        handler.queue.get_nowait()
+        handler.queue.get_nowait()
+
+        handler.handle(make_record(args=(3,)))
+        self.assertEqual(handler.dropped, 0)
+        report = handler.queue.queue[-1]
+        self.assertEqual(report.dropped, 1)
+
+        # Bir sonraki rapor DROP_REPORT_INTERVAL sonra
+        handler.queue.get_nowait()
+        handler.handle(make_record(args=(4,)))
+        handler.handle(make_record(args=(5,)))
+        handler.queue.get_nowait()
+        handler.handle(make_record(args=(6,)))
+        self.assertEqual(handler.dropped, 1)
+
+        handler.start()
+        handler.stop()
+        self.assertEqual(target.records[-1].dropped, 1)
+
+
+class EmailOutboxTests(TestCase):
+    def queue(self, n=1, **kwargs):
+        return [queue_email(f'Konu {i}', 'Metin', [f'user{i}@example.com'], **kwargs) for i in range(n)]
+
+    def test_queue_does_not_send(self):
+        self.queue()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingEmail.objects.get().status, 'pending')
+
+    def test_dedup_key(self):
+        self.assertIsNotNone(queue_email('Hoş geldiniz', 'Metin', ['a@example.com'], dedup_key='welcome:1'))
+        self.assertIsNone(queue_email('Hoş geldiniz', 'Metin', ['a@example.com'], dedup_key='welcome:1'))
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_batch_sent_over_one_connection(self):
+        self.queue(3, html_message='<p>Metin</p>')
+        with mock.patch('core.mail.get_connection', wraps=get_connection) as connection:
+            out = io.StringIO()
+            call_command('send_queued_emails', stdout=out)
+
+        connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertIn('3 e-posta gönderildi', out.getvalue())
+        self.assertFalse(OutgoingEmail.objects.exclude(status='sent').exists())
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_BASE_SECONDS=60)
+    def test_retry_with_backoff(self):
+        self.queue()
+        with mock.patch('core.mail.EmailMultiAlternatives.send', side_effect=OSError('SMTP kapalı')):
+            self.assertEqual(send_pending(), (0, 1))
+
+            email = OutgoingEmail.objects.get()
+            self.assertEqual((email.status, email.attempts, email.last_error), ('pending', 1, 'SMTP kapalı'))
+            self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+            # Vadesi gelmeden tekrar denenmez
+            self.assertEqual(send_pending(), (0, 0))
+
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+            send_pending()
+        self.assertEqual(OutgoingEmail.objects.get().status, 'failed')
+
+    def test_claimed_rows_not_taken_twice(self):
+        self.queue(2)
+        self.assertEqual(len(claim_batch(10)), 2)
+        self.assertEqual(claim_batch(10), [])
+
+        # Gönderirken çöken worker'ın kayıtları zaman aşımından sonra tekrar alınır
+        OutgoingEmail.objects.update(claimed_at=timezone.now() - CLAIM_TIMEOUT - timedelta(seconds=1))
+        self.assertEqual(len(claim_batch(10)), 2)
+
+    def test_claim_race(self):
+        self.queue(3)
+        real_filter = OutgoingEmail.objects.filter
+        calls = []
+
+        def filter_with_rival(*args, **kwargs):
+            calls.append(kwargs)
+            queryset = real_filter(*args, **kwargs)
+            if len(calls) == 1:
+                # Adaylar okunduktan hemen sonra başka bir worker hepsini alır
+                candidates = list(queryset.order_by('next_attempt_at'))
+                OutgoingEmail.objects.update(status='sending', claimed_at=timezone.now())
+                return mock.Mock(order_by=mock.Mock(return_value=candidates))
+            return queryset
+
+        with mock.patch.object(OutgoingEmail.objects, 'filter', side_effect=filter_with_rival):
+            self.assertEqual(claim_batch(10), [])
+        self.assertEqual(len(calls), 4)
+
+
+class ThrottleStoreTestsMixin:
+    """Aynı GCRA davranışı her store için: 60 saniyede 5 istek (T = 12)"""
+
+    def test_burst_then_deny_with_retry_after(self):
+        store = self.make_store()
+        for _ in range(5):
+            self.assertEqual(store.consume('key', 1000.0, 12, 60), (True, 0))
+
+        allowed, wait = store.consume('key', 1000.0, 12, 60)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 12)
+
+        # Reddedilen istek durumu değiştirmez; bir aralık sonra tek istek açılır
+        allowed, wait = store.consume('key', 1005.0, 12, 60)
+        self.assertAlmostEqual(wait, 7)
+        self.assertEqual(store.consume('key', 1012.0, 12, 60), (True, 0))
+        self.assertFalse(store.consume('key', 1012.0, 12, 60)[0])
+
+    def test_keys_are_independent(self):
+        store = self.make_store()
+        for _ in range(5):
+            store.consume('a', 1000.0, 12, 60)
+        self.assertEqual(store.consume('b', 1000.0, 12, 60), (True, 0))
+
+    def test_cost_larger_than_window_never_allowed(self):
+        self.assertEqual(self.make_store().consume('key', 1000.0, 61, 60), (False, None))
+
+
+class CacheThrottleStoreTests(ThrottleStoreTestsMixin, SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def make_store(self):
+        return CacheThrottleStore()
+
+
+class DatabaseThrottleStoreTests(ThrottleStoreTestsMixin, TestCase):
+    def make_store(self):
+        store = DatabaseThrottleStore()
+        store._next_purge = float('inf')
+        return store
+
+    def test_purge_removes_expired_buckets(self):
+        store = DatabaseThrottleStore()
+        store.consume('old', 1000.0, 12, 60)
+        store.consume('new', 2000.0, 12, 60)
+        self.assertEqual(ThrottleBucket.objects.get(key='new').tat, 2012.0)
+
+        store.consume('other', 2005.0, 12, 60)
+        store._next_purge = 0
+        store.consume('other', 2006.0, 12, 60)
+        self.assertEqual(set(ThrottleBucket.objects.values_list('key', flat=True)), {'new', 'other'})
+
+    def test_cleanup_command(self):
+        ThrottleBucket.objects.create(key='old', tat=time.time() - 1)
+        ThrottleBucket.objects.create(key='new', tat=time.time() + 60)
+
+        out = io.StringIO()
+        call_command('cleanup_throttle_buckets', '--dry-run', stdout=out)
+        self.assertIn('1 kova silinecekti', out.getvalue())
+        call_command('cleanup_throttle_buckets', stdout=io.StringIO())
+        self.assertEqual(list(ThrottleBucket.objects.values_list('key', flat=True)), ['new'])
+
+
+class GCRAThrottleTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(setattr, throttles, '_store', None)
+        throttles._store = None
+
+    def test_login_throttle_returns_retry_after(self):
+        factory = APIRequestFactory()
+        throttle = LoginThrottle()
+        with mock.patch.object(throttle, 'timer', return_value=1000.0):
+            for _ in range(15):
+                self.assertTrue(throttle.allow_request(factory.post('/api/token/'), None))
+            self.assertFalse(throttle.allow_request(factory.post('/api/token/'), None))
+        self.assertAlmostEqual(throttle.wait(), 4)
+
+        other_ip = factory.post('/api/token/', REMOTE_ADDR='10.0.0.2')
+        with mock.patch.object(throttle, 'timer', return_value=1000.0):
+            self.assertTrue(throttle.allow_request(other_ip, None))
+
+    def test_store_error_does_not_block(self):
+        with mock.patch.object(throttles, 'get_throttle_store', side_effect=ConnectionError('redis yok')):
+            self.assertTrue(LoginThrottle().allow_request(APIRequestFactory().post('/api/token/'), None))
+
+
+class ListingSearchThrottleTests(SimpleTestCase):
+    def cost(self, query, view=None):
+        request = Request(APIRequestFactory().get('/api/listings/', query))
+        if view is None:
+            view = mock.Mock(paginator=ListingPagination())
+        return ListingSearchThrottle().get_cost(request, view)
+
+    def test_simple_filter(self):
+        self.assertEqual(self.cost({'brand': 'BMW'}), 1)
+
+    def test_text_search_and_or_terms(self):
+        self.assertEqual(self.cost({'description_search': 'temiz'}), 6)
+        self.assertEqual(self.cost({'title_search': 'bmw', 'brand': '1,2,3,4,5,6,7'}), 4)
+        self.assertEqual(self.cost({'brand': ['1,2,3', '4,5,6']}), 1.5)
+
+    def test_page_size_from_paginator(self):
+        self.assertEqual(self.cost({'page_size': 24}), 2)
+        # max_page_size (50) üstü paginator'daki gibi kırpılır
+        self.assertEqual(self.cost({'page_size': 500}), 50 / 12)
+        self.assertEqual(self.cost({'page_size': 'x'}), 1)
+
+    def test_deep_offset(self):
+        self.assertEqual(self.cost({'page': 101}), 13)
+        self.assertEqual(self.cost({'page': 101, 'page_size': 50}), 1 + 50 / 12 - 1 + 50)
+
+    def test_view_without_paginator(self):
+        self.assertEqual(self.cost({'page': 101}, view=mock.Mock(paginator=None)), 1)
+
+
+class ListingSearchThrottleEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(setattr, throttles, '_store', None)
+        throttles._store = None
+
+    def test_too_expensive_query_rejected(self):
+        self.assertEqual(self.client.get('/api/listings/').status_code, 200)
+        response = self.client.get('/api/listings/', {'page': 2600})
+        self.assertEqual(response.status_code, 429)
+        self.assertNotIn('Retry-After', response)
@@ -1,6 +1,201 @@
+"""
+Paylaşılan rate limit (GCRA)
+
+SimpleRateThrottle her anahtar için zaman damgası listesini cache'te tutar;
+LocMem cache süreç başına olduğundan limitler worker başına uygulanır ve her
+kontrol listenin tamamını yeniden yazar. GCRAThrottle bunun yerine anahtar
+başına tek sayı tutar (GCRA - Generic Cell Rate Algorithm):
+
+    T   = süre / istek sayısı          (istekler arası ideal aralık)
+    tat = teorik varış zamanı           (saklanan tek değer)
+    yeni_tat = max(tat, şimdi) + T * maliyet
+    yeni_tat - şimdi <= süre ise izin verilir ve yeni_tat yazılır
+
+Yani "5/minute" en fazla 5 isteklik bir patlamaya izin verir, sonra her 12
+saniyede bir istek açılır. Store THROTTLE_STORE ayarı ile seçilir:
+- CacheThrottleStore:    Django cache'i (varsayılan) - paylaşılan bir cache
+                         backend'iyle tüm worker'lar aynı durumu görür
+- RedisThrottleStore:    Lua script (THROTTLE_REDIS_URL) - atomik
+- DatabaseThrottleStore: koşullu tek UPDATE (core.ThrottleBucket) - atomik,
+                         ama her istek bir yazma; SQLite'ta tek yazar olduğundan
+                         yoğun okuma endpoint'lerini sıraya sokar. Bilerek seçilmeli.
+"""
+
+import logging
+import math
+import threading
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest
+from django.utils.module_loading import import_string
 from rest_framework.throttling import SimpleRateThrottle
+from .models import ThrottleBucket
+
+logger = logging.getLogger("custom.throttles")
+
+
+class CacheThrottleStore:
+    """
+    tat Django cache'inde (THROTTLE_CACHE_ALIAS) tutulur ve dolunca kendiliğinden
+    düşer. Oku-yaz atomik değildir: aynı anahtara aynı anda gelen istekler nadiren
+    limiti birkaç birim aşabilir (SimpleRateThrottle ile aynı garanti). Süreç içi
+    yarış bir kilitle engellenir; LocMem cache'te limitler worker başınadır.
+    """
+
+    def __init__(self):
+        self._cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        self._lock = threading.Lock()
+
+    def consume(self, key, now, increment, limit):
+        if increment > limit:
+            return False, None
+        with self._lock:
+            tat = max(self._cache.get(key, now), now)
+            new_tat = tat + increment
+            if new_tat - now > limit:
+                return False, new_tat - now - limit
+            self._cache.set(key, new_tat, timeout=math.ceil(new_tat - now))
+        return True, 0
+
+
+class DatabaseThrottleStore:
+    """
+    Tek satırlık koşullu UPDATE: izin verilecekse tat artırılır, verilmeyecekse
+    satır değişmez. Satır kilidi gerekmez, her veritabanında atomiktir.
+
+    Anahtar başına (ör. IP başına) bir satır oluştuğundan, tat'ı geçmişte
+    kalan satırlar PURGE_INTERVAL saniyede bir süreç içinden silinir
+    (ayrıca: python manage.py cleanup_throttle_buckets).
+    """
+    PURGE_INTERVAL = 300
+
+    def __init__(self):
+        self._next_purge = 0
+
+    def consume(self, key, now, increment, limit):
+        """Dönen değer: (izin verildi mi, kaç saniye sonra tekrar denenebilir)"""
+        if increment > limit:
+            # Maliyet pencerenin tamamından büyük - hiçbir zaman geçemez
+            return False, None
+
+        if now >= self._next_purge:
+            self._next_purge = now + self.PURGE_INTERVAL
+            self.purge(now)
+
+        if self.conditional_update(key, now, increment, limit):
+            return True, 0
+
+        try:
+            with transaction.atomic():
+                ThrottleBucket.objects.create(key=key, tat=now + increment)
+            return True, 0
+        except IntegrityError:
+            # Satır zaten var: ya koşul sağlanmadı ya da ilk satırı aynı anda
+            # başka bir istek oluşturdu - o satır üzerinde koşullu UPDATE'i tekrarla
+            if self.conditional_update(key, now, increment, limit):
+                return True, 0
+
+        tat = ThrottleBucket.objects.filter(key=key).values_list('tat', flat=True).first()
+        if tat is None:
+            return True, 0
+        return False, max(tat + increment - now - limit, 0)
+
+    @staticmethod
+    def purge(now):
+        """Dolmuş kovaları sil - tat geçmişteyse satır hiç yokmuş gibidir"""
+        return ThrottleBucket.objects.filter(tat__lt=now).delete()[0]
+
+    @staticmethod
+    def conditional_update(key, now, increment, limit):
+        return ThrottleBucket.objects.filter(key=key, tat__lte=now + limit - increment).update(
+            tat=Greatest(F('tat'), Value(now), output_field=FloatField()) + Value(increment)
+        )
+
+
+class RedisThrottleStore:
+    """Aynı hesap Redis'te tek Lua script olarak - anahtar tat dolunca kendiliğinden silinir"""
+
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local increment = tonumber(ARGV[2])
+    local limit = tonumber(ARGV[3])
+    local tat = tonumber(redis.call('GET', KEYS[1]))
+    if not tat or tat < now then
+        tat = now
+    end
+    local new_tat = tat + increment
+    if new_tat - now > limit then
+        return {0, tostring(new_tat - now - limit)}
+    end
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+    return {1, '0'}
+    """
+
+    def __init__(self):
+        import redis
+
+        self._client = redis.Redis.from_url(settings.THROTTLE_REDIS_URL)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def consume(self, key, now, increment, limit):
+        if increment > limit:
+            return False, None
+        allowed, wait = self._script(keys=[key], args=[now, increment, limit])
+        return bool(allowed), float(wait)
+
 
-class ListingCreateThrottle(SimpleRateThrottle):
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_throttle_store():
+    """Ayarlardaki store'un süreç genelindeki tek örneği"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(settings.THROTTLE_STORE)()
+    return _store
+
+
+class GCRAThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle ile aynı arayüz (scope, rate, get_cache_key) - durum
+    paylaşılan store'da. Her istek varsayılan olarak 1 birim harcar;
+    get_cost() ile istek başına farklı maliyet verilebilir.
+    """
+    cost = 1
+
+    def get_cost(self, request, view):
+        return self.cost
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        interval = self.duration / self.num_requests
+        increment = interval * self.get_cost(request, view)
+        try:
+            allowed, self.retry_after = get_throttle_store().consume(
+                self.key, self.timer(), increment, self.duration
+            )
+        except Exception as e:
+            # Store'a ulaşılamıyor - istekleri kesmektense limitsiz geçir
+            logger.error(f"[Throttle] Store hatası, istek sınırlanmadı: {self.key} Hata: {e}")
+            return True
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class ListingCreateThrottle(GCRAThrottle):
     scope = "listing_create"
 
     def get_cache_key(self, request, view):
@@ -11,7 +206,7 @@ class ListingCreateThrottle(SimpleRateThrottle):
             }
         return None
 
-class MessageSendThrottle(SimpleRateThrottle):
+class MessageSendThrottle(GCRAThrottle):
     scope = "message_send"
 
     def get_cache_key(self, request, view):
@@ -21,13 +216,91 @@ class MessageSendThrottle(SimpleRateThrottle):
                 "ident": request.user.pk,
             }
         return None
-    
-class LoginThrottle(SimpleRateThrottle):
+
+class LoginThrottle(GCRAThrottle):
     scope = "login"
 
     def get_cache_key(self, request, view):
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
 
-            return self.cache_format % {
-                "scope": self.scope,
-                "ident": self.get_ident(request),
-            }
+
+class ListingSearchThrottle(GCRAThrottle):
+    """
+    İlan listesi/arama için maliyet bazlı limit. Her isteğin maliyeti
+    ListingsFilter parametrelerinden tahmin edilir; istemci (kullanıcı veya IP)
+    pencere başına "listing_search" oranı kadar birim harcayabilir.
+
+    Basit bir marka filtresi 1 birimdir; metin araması, derin sayfalar,
+    büyük page_size ve çok sayıda OR terimi maliyeti artırır. Maliyeti
+    pencerenin tamamını aşan sorgu (ör. çok derin sayfa) hiç çalıştırılmaz.
+    """
+    scope = "listing_search"
+
+    # icontains/contains - index kullanamayan tam tarama
+    TEXT_SEARCH_COSTS = {
+        "title_search": 2,
+        "description_search": 5,
+        "color": 1,
+        "body_type": 1,
+    }
+    # CSV veya tekrar eden parametre - her biri OR koşulu
+    MULTI_VALUE_PARAMS = [
+        "brand", "model", "variant", "trim",
+        "province", "district", "neighborhood",
+        "fuel_type", "transmission",
+    ]
+    FREE_TERMS = 5
+    TERM_COST = 0.5
+    # Atlanan her OFFSET_STEP satır 1 birim (OFFSET taranan satırları okur)
+    OFFSET_STEP = 100
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": ident,
+        }
+
+    @staticmethod
+    def int_param(params, name, default):
+        try:
+            return max(int(params.get(name, default)), 1)
+        except (TypeError, ValueError):
+            return default
+
+    def get_cost(self, request, view):
+        params = request.query_params
+        cost = 1
+
+        for name, weight in self.TEXT_SEARCH_COSTS.items():
+            if params.get(name, "").strip():
+                cost += weight
+
+        terms = sum(
+            len([term for term in value.split(",") if term.strip()])
+            for name in self.MULTI_VALUE_PARAMS
+            for value in params.getlist(name)
+        )
+        cost += max(terms - self.FREE_TERMS, 0) * self.TERM_COST
+
+        # Sayfa boyutları view'ın paginator'ından - pagination değişirse maliyet de izler
+        paginator = getattr(view, "paginator", None)
+        default_page_size = getattr(paginator, "page_size", None)
+        if not default_page_size:
+            return cost
+        page_size = default_page_size
+        if paginator.page_size_query_param:
+            page_size = self.int_param(params, paginator.page_size_query_param, default_page_size)
+            if paginator.max_page_size:
+                page_size = min(page_size, paginator.max_page_size)
+        page = self.int_param(params, paginator.page_query_param, 1)
+        cost += (page_size / default_page_size) - 1
+        cost += (page - 1) * page_size // self.OFFSET_STEP
+
+        return cost
@@ -1,3 +1,49 @@
-from django.shortcuts import render
+import os
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
+from listings.models import ListingImage
+from listings.utils import ImageProcessor
+from .sendfile import sendfile
 
-# Create your views here.
+
+@require_GET
+def serve_media(request, path):
+    """
+    MEDIA_ROOT altındaki dosyaları sun
+    GET /media/<path>
+
+    Sadece yol/yetki kontrolü ve header'lar burada; byte'ları SENDFILE_BACKEND
+    ayarına göre nginx/Apache gönderir (bkz. core.sendfile).
+
+    İlan resimleri yalnızca en az bir yayındaki ilan kullanıyorsa herkese
+    açıktır; silinmiş/pasif ilanlarınkiler sadece sahibine (oturum) ve staff'a
+    private olarak sunulur. Diğer medya (profil fotoğrafları vb.) herkese açıktır.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Dosya bulunamadı.")
+
+    # Gizli dosyalar ve dizin listesi sunulmaz
+    if any(part.startswith('.') for part in path.split('/')) or os.path.isdir(full_path):
+        raise Http404("Dosya bulunamadı.")
+
+    public = True
+    if path.startswith(f"{ImageProcessor.UPLOAD_DIR}/"):
+        images = ListingImage.objects.for_file(path)
+        if not images.visible_to(AnonymousUser()).exists():
+            if not (request.user.is_authenticated and images.visible_to(request.user).exists()):
+                raise Http404("Dosya bulunamadı.")
+            public = False
+
+    response = sendfile(request, full_path)
+    if public:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    else:
+        patch_cache_control(response, private=True, max_age=0)
+    return response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Listing, ListingImage
+from .models import Listing, ListingImage, ImageBlob, ImageUpload
 
 # Inline yapı: İlan düzenlerken resimleri de altına ekleyebil
 class ListingImageInline(admin.TabularInline):
@@ -46,5 +46,19 @@ class ListingAdmin(admin.ModelAdmin):
 class ListingImageAdmin(admin.ModelAdmin):
     list_display = ['listing', 'image', 'order', 'is_primary', 'file_size', 'uploaded_at']
     list_filter = ['listing', 'is_primary']
-    readonly_fields = ['file_size', 'width', 'height', 'uploaded_at']
-    fields = ['listing', 'image', 'order', 'is_primary', 'file_size', 'width', 'height', 'uploaded_at']
+    readonly_fields = ['blob', 'file_size', 'width', 'height', 'variants', 'dominant_color', 'uploaded_at']
+    fields = ['listing', 'image', 'blob', 'order', 'is_primary', 'file_size', 'width', 'height', 'variants', 'dominant_color', 'uploaded_at']
+
+# İçerik adresli dosyalar - sadece izleme amaçlı
+@admin.register(ImageBlob)
+class ImageBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'path', 'ref_count', 'created_at']
+    search_fields = ['sha256', 'path']
+    readonly_fields = ['sha256', 'path', 'variants', 'dominant_color', 'ref_count', 'created_at']
+
+# Parça parça yüklemeler - yarım kalanları izlemek için
+@admin.register(ImageUpload)
+class ImageUploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'listing', 'offset', 'size', 'status', 'updated_at']
+    list_filter = ['status']
+    readonly_fields = ['offset', 'listing_image', 'created_at', 'updated_at']
@@ -0,0 +1,109 @@
+"""
+Django Management Command: Resim formatı benchmark'ı
+
+Örnek resimleri tüm boyutlarda ve Pillow'un desteklediği tüm çıktı
+formatlarında (JPEG, WebP, AVIF) encode eder; format başına ortalama
+dosya boyutunu, JPEG'e göre kazancı ve encode süresini raporlar.
+
+Kullanım:
+    python manage.py benchmark_image_formats
+    python manage.py benchmark_image_formats --source-dir ./ornek_resimler --limit 20
+"""
+
+import os
+import time
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from listings.models import ListingImage
+from listings.utils import ImageProcessor
+
+
+class Command(BaseCommand):
+    help = 'İlan resimlerini tüm formatlarda encode edip boyut ve süre karşılaştırması yapar'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source-dir',
+            type=str,
+            help='Örnek resimlerin okunacağı klasör (verilmezse yüklenmiş ilan resimleri kullanılır)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Kullanılacak en fazla resim sayısı (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        samples = list(self.iter_samples(options['source_dir'], options['limit']))
+        if not samples:
+            raise CommandError('Benchmark için resim bulunamadı.')
+
+        formats = ImageProcessor.available_formats()
+        self.stdout.write(
+            self.style.SUCCESS(f'📊 {len(samples)} resim, formatlar: {", ".join(formats)}')
+        )
+
+        # (boyut, format) -> [toplam byte, toplam süre, adet]
+        results = defaultdict(lambda: [0, 0.0, 0])
+
+        for name, opener in samples:
+            try:
+                with opener() as image_file:
+                    source_image = ImageProcessor.open_image(image_file)
+                    source_image.load()
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'⚠️ Atlandı: {name} ({e})'))
+                continue
+
+            for size_name, dimensions in ImageProcessor.get_sizes().items():
+                processed_image = ImageProcessor.fit_to_4_3(source_image, dimensions)
+                for fmt in formats:
+                    start_time = time.perf_counter()
+                    encoded = ImageProcessor.encode_image(processed_image, fmt)
+                    elapsed = time.perf_counter() - start_time
+
+                    result = results[(size_name, fmt)]
+                    result[0] += encoded.size
+                    result[1] += elapsed
+                    result[2] += 1
+
+        self.print_report(results, formats)
+
+    def iter_samples(self, source_dir, limit):
+        """(isim, dosya açan fonksiyon) çiftleri üret"""
+        if source_dir:
+            if not os.path.isdir(source_dir):
+                raise CommandError(f'Klasör bulunamadı: {source_dir}')
+            names = sorted(os.listdir(source_dir))[:limit]
+            for name in names:
+                path = os.path.join(source_dir, name)
+                if os.path.isfile(path):
+                    yield name, (lambda path=path: open(path, 'rb'))
+            return
+
+        images = ListingImage.objects.exclude(image='').order_by('-pk')[:limit]
+        for listing_image in images:
+            yield listing_image.image.name, (lambda field=listing_image.image: field.storage.open(field.name, 'rb'))
+
+    def print_report(self, results, formats):
+        self.stdout.write('\n' + '=' * 72)
+        self.stdout.write(f'{"Boyut":<12}{"Format":<8}{"Ort. KB":>10}{"Kazanç":>14}{"Ort. encode ms":>16}')
+        self.stdout.write('=' * 72)
+
+        for size_name in ImageProcessor.get_sizes():
+            baseline = results.get((size_name, ImageProcessor.FALLBACK_FORMAT))
+            baseline_avg = baseline[0] / baseline[2] if baseline and baseline[2] else None
+
+            for fmt in formats:
+                total_bytes, total_time, count = results.get((size_name, fmt), (0, 0.0, 0))
+                if not count:
+                    continue
+                avg_bytes = total_bytes / count
+                # JPEG'e göre byte kazancı
+                saving = f'{(1 - avg_bytes / baseline_avg) * 100:.1f}%' if baseline_avg else '-'
+                self.stdout.write(
+                    f'{size_name:<12}{fmt:<8}{avg_bytes / 1024:>10.1f}{saving:>14}{total_time / count * 1000:>16.1f}'
+                )
+
+        self.stdout.write('=' * 72)
@@ -0,0 +1,79 @@
+"""
+Django Management Command: Eksik resim manifestlerini oluştur
+
+Manifest (ListingImage.variants) alanı eklenmeden önce yüklenen resimlerin
+boyutlarını yüklenen orijinal dosyadan yeniden üretir ve manifesti yazar.
+Manifesti olup placeholder'ı olmayan resimler için sadece placeholder
+ve baskın renk hesaplanır.
+
+Kullanım:
+    python manage.py build_image_manifests
+    python manage.py build_image_manifests --dry-run
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from listings.models import ListingImage
+
+
+class Command(BaseCommand):
+    help = 'Manifesti olmayan ilan resimlerinin boyutlarını oluşturur ve manifesti kaydeder'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sadece say, dosya oluşturma',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Tek seferde okunacak kayıt sayısı (default: 100)',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+
+        queryset = ListingImage.objects.filter(
+            Q(variants={}) | Q(placeholder='')
+        ).exclude(image='').order_by('pk')
+        total = queryset.count()
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(f'🧪 DRY RUN: {total} resim için manifest oluşturulacaktı')
+            )
+            return
+
+        start_time = time.time()
+        processed = 0
+        failed = 0
+
+        for listing_image in queryset.iterator(chunk_size=batch_size):
+            try:
+                if listing_image.variants:
+                    listing_image.generate_placeholder()
+                    variants = listing_image.variants
+                else:
+                    variants = listing_image.generate_variants()
+            except Exception as e:
+                variants = {}
+                self.stdout.write(self.style.ERROR(f'❌ ID={listing_image.pk}: {e}'))
+
+            if variants:
+                processed += 1
+            else:
+                failed += 1
+
+            if (processed + failed) % batch_size == 0:
+                self.stdout.write(f'📍 İşlendi: {processed + failed}/{total}')
+
+        elapsed_time = time.time() - start_time
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Tamamlandı! {processed} manifest yazıldı, {failed} hata. Süre: {elapsed_time:.1f} saniye'
+            )
+        )
@@ -0,0 +1,45 @@
+"""
+Django Management Command: Yarım kalmış parça yüklemelerini temizle
+
+LISTING_IMAGE_UPLOAD_EXPIRY_HOURS süresince ilerlemeyen yüklemelerin
+geçici dosyalarını ve kayıtlarını siler. Tamamlanmış yüklemelerin
+kayıtları da aynı süreden sonra silinir (geçici dosyaları zaten yoktur).
+
+Kullanım:
+    python manage.py cleanup_image_uploads
+    python manage.py cleanup_image_uploads --dry-run
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from listings.models import ImageUpload
+
+
+class Command(BaseCommand):
+    help = 'Süresi dolan parça yüklemelerini ve geçici dosyalarını siler'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sadece say, silme',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=settings.LISTING_IMAGE_UPLOAD_EXPIRY_HOURS)
+        queryset = ImageUpload.objects.filter(updated_at__lt=cutoff)
+        total = queryset.count()
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(f'🧪 DRY RUN: {total} yükleme silinecekti')
+            )
+            return
+
+        for upload in queryset.iterator():
+            upload.delete_temp_file()
+            upload.delete()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} süresi dolmuş yükleme silindi'))
@@ -0,0 +1,253 @@
+"""
+Django Management Command: Storage'daki sahipsiz resim dosyalarını sil
+
+listing_images/ ağacı ve DB'deki referanslar (ImageBlob ve ListingImage
+orijinalleri + manifestlerdeki tüm boyutlar) sıralı iki akış olarak okunur
+ve merge join ile karşılaştırılır. İki taraf da belleğe alınmaz; bellekte
+en fazla tek bir dizinin listesi tutulur (sıralamak için). Hash'e göre
+bölünmüş dizinler küçüktür; düz eski dizinler (ör. listing_images/thumbnails/)
+ise tek seferde listelenir. DB akışları Python'la aynı (byte) sırayla okunur
+(binary collation); akışlardan biri geri giderse komut hiçbir dosya silmeden
+durur - sahipsizler join bitene kadar geçici dosyada bekler.
+
+Manifest yolu orijinalinden önce sıralanan kayıtlar (Django'nun çakışma
+ekleri, eski tek dizinli thumbnail'lar) join'e katılmaz: raporlanır ve
+tüm yolları korunur, silinmez.
+
+Yeni yüklenen bir dosya DB kaydı commit olmadan önce storage'a yazıldığı
+için --min-age'den yeni dosyalara dokunulmaz.
+
+Kullanım:
+    python manage.py gc_image_files --dry-run
+    python manage.py gc_image_files
+    python manage.py gc_image_files --purge-deleted-listings --deleted-days 30
+"""
+
+import heapq
+import tempfile
+import time
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Collate
+from django.utils import timezone
+from listings.models import ImageBlob, ListingImage
+from listings.utils import ImageProcessor
+
+
+def walk_storage(directory):
+    """
+    Dizindeki tüm dosyaları tam yol sırasıyla (string karşılaştırması) üret.
+    Alt dizinler adlarının sonuna '/' eklenerek sıralanır; böylece
+    'a/b.jpg' < 'a/b/x.jpg' sırası korunur. Sıralamak için her dizinin
+    listesi bir kez belleğe alınır (yalnızca isimler).
+    """
+    dirs, files = default_storage.listdir(directory)
+    entries = [(f"{name}/", True) for name in dirs] + [(name, False) for name in files]
+    for name, is_dir in sorted(entries):
+        path = f"{directory}/{name}"
+        if is_dir:
+            yield from walk_storage(path.rstrip('/'))
+        else:
+            yield path
+
+
+# Python'un str sıralaması (kod noktası = UTF-8 byte sırası) ile aynı sıralayan collation'lar.
+# Varsayılan (ör. PostgreSQL en_US.UTF-8) collation noktalama/büyük harfi farklı sıralar;
+# o sırayla merge join referanslı dosyaları sahipsiz sanar.
+BINARY_COLLATIONS = {
+    'postgresql': 'C',
+    'mysql': 'utf8mb4_bin',
+    'sqlite': 'BINARY',
+    'oracle': 'BINARY',
+}
+
+
+def binary_order(field):
+    collation = BINARY_COLLATIONS.get(connection.vendor)
+    if collation is None:
+        return field
+    return Collate(F(field), collation)
+
+
+def ascending(stream, label):
+    """Akış gerçekten artan sırada mı - değilse join güvenilmez, dur"""
+    previous = None
+    for item in stream:
+        path = item[0] if isinstance(item, tuple) else item
+        if previous is not None and path < previous:
+            raise CommandError(f"{label} sıralı gelmiyor: {path} < {previous}")
+        previous = path
+        yield item
+
+
+def referenced_paths(batch_size, protected):
+    """
+    DB'deki tüm dosya referanslarını sıralı üret.
+
+    Kayıtlar orijinal yola göre sıralı okunur. Bir kaydın boyutları
+    (<isim>_<boyut>.<uzantı>) orijinalinden ('.' < '_') sonra gelir ama
+    sonraki kayıtların orijinalleriyle karışabilir; bu yüzden yollar küçük
+    bir heap'te tutulup sıradaki orijinalden küçük olanlar dışarı verilir.
+
+    Boyut yolu orijinalinden önce gelen kayıt sıraya sokulamaz; yolları
+    akışa girmez, protected sözlüğüne (orijinal -> yollar) eklenir.
+    """
+    blobs = ascending(
+        ImageBlob.objects.order_by(binary_order('path'))
+        .values_list('path', 'variants').iterator(chunk_size=batch_size),
+        'ImageBlob yolları',
+    )
+    images = ascending(
+        ListingImage.objects.exclude(image='').order_by(binary_order('image'))
+        .values_list('image', 'variants').iterator(chunk_size=batch_size),
+        'ListingImage yolları',
+    )
+
+    pending = []
+    for original, variants in heapq.merge(blobs, images, key=lambda row: row[0]):
+        while pending and pending[0] < original:
+            yield heapq.heappop(pending)
+        paths = [original, *ImageProcessor.manifest_paths(variants)]
+        # Boyut yolları normalde orijinalle aynı önekle üretilir (variant_path);
+        # öyle değilse bu kayıt join'e katılamaz - atla, dosyalarını koru
+        if any(path < original for path in paths):
+            protected.setdefault(original, set()).update(paths)
+            continue
+        for path in paths:
+            heapq.heappush(pending, path)
+    while pending:
+        yield heapq.heappop(pending)
+
+
+class Command(BaseCommand):
+    help = 'DB\'de referansı olmayan resim dosyalarını (orijinal ve boyutlar) siler'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sadece raporla, silme',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Silme ve DB okuma batch boyutu (default: 500)',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60,
+            help='Bundan (dakika) yeni dosyalara dokunma (default: 60)',
+        )
+        parser.add_argument(
+            '--purge-deleted-listings',
+            action='store_true',
+            help='Önce silinmiş (is_deleted) ilanların resim kayıtlarını sil',
+        )
+        parser.add_argument(
+            '--deleted-days',
+            type=int,
+            default=30,
+            help='--purge-deleted-listings: en az bu kadar gündür silinmiş ilanlar (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+        start_time = time.time()
+
+        if options['purge_deleted_listings']:
+            self.purge_deleted_listings(options['deleted_days'], dry_run)
+
+        cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+        protected = {}
+        refs = ascending(referenced_paths(batch_size, protected), 'Referanslar')
+        ref = next(refs, None)
+
+        scanned = orphaned = orphaned_bytes = 0
+
+        if not default_storage.exists(ImageProcessor.UPLOAD_DIR):
+            self.stdout.write('Storage boş.')
+            return
+
+        # Aday sahipsizler önce geçici dosyaya yazılır; join sonuna kadar hatasız
+        # biterse (atlanan kayıtların yolları çıkarılarak) silinir
+        with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as candidates:
+            for path in walk_storage(ImageProcessor.UPLOAD_DIR):
+                scanned += 1
+                while ref is not None and ref < path:
+                    ref = next(refs, None)
+                if ref == path:
+                    continue
+                if default_storage.get_modified_time(path) > cutoff:
+                    continue
+                candidates.write(path + '\n')
+
+            # Storage bitti; kalan referansların da sırası doğrulanır
+            for ref in refs:
+                pass
+
+            protected_paths = set()
+            for original, paths in protected.items():
+                self.stdout.write(self.style.WARNING(
+                    f'⚠️ Atlandı (manifest yolu orijinalden önce sıralanıyor): {original}'
+                ))
+                protected_paths.update(paths)
+
+            candidates.seek(0)
+            batch = []
+            for line in candidates:
+                path = line.rstrip('\n')
+                if path in protected_paths:
+                    continue
+                orphaned += 1
+                orphaned_bytes += default_storage.size(path)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'🗑️ {path}')
+                if not dry_run:
+                    batch.append(path)
+                    if len(batch) >= batch_size:
+                        self.delete_batch(batch)
+            if batch:
+                self.delete_batch(batch)
+
+        elapsed_time = time.time() - start_time
+        summary = (
+            f'{scanned} dosya tarandı, {orphaned} sahipsiz dosya '
+            f'({orphaned_bytes / (1024 * 1024):.1f} MB), {len(protected)} kayıt atlandı. '
+            f'Süre: {elapsed_time:.1f} saniye'
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'🧪 DRY RUN: {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ Tamamlandı! {summary}'))
+
+    def delete_batch(self, batch):
+        for path in batch:
+            default_storage.delete(path)
+        self.stdout.write(f'📍 Silindi: {len(batch)} dosya')
+        batch.clear()
+
+    def purge_deleted_listings(self, days, dry_run):
+        """
+        Silinmiş ilanların resim kayıtlarını sil. Blob referansları sinyallerle
+        bırakılır; dosyalar blob'un son referansıysa hemen, değilse bir sonraki
+        GC çalışmasında silinir.
+        """
+        cutoff = timezone.now() - timedelta(days=days)
+        queryset = ListingImage.objects.filter(
+            listing__is_deleted=True,
+            listing__updated_at__lt=cutoff,
+        )
+        total = queryset.count()
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'🧪 DRY RUN: silinmiş ilanlardan {total} resim kaydı silinecekti'))
+            return
+
+        for listing_image in queryset.iterator():
+            listing_image.delete()
+        self.stdout.write(f'📍 Silinmiş ilanlardan {total} resim kaydı silindi')
@@ -0,0 +1,166 @@
+"""
+Django Management Command: Resim dosyalarını sharded dizin yapısına taşı
+
+Eski düzende tüm orijinaller ve boyutlar listing_images/ altında tek dizindeydi.
+Yeni düzen: listing_images/<ab>/<cd>/<isim>... (bkz. ImageProcessor.shard_dir)
+
+Her batch için:
+1. Dosyalar paralel olarak yeni yollarına kopyalanır (aynı diskteyse hard link)
+2. DB yolları (ImageBlob.path/variants, ListingImage.image/variants) tek transaction'da güncellenir
+3. Commit sonrası eski dosyalar silinir
+
+Komut yarıda kesilirse tekrar çalıştırılabilir: taşınmış kayıtlar sorguya
+girmez, hedefte zaten olan dosyalar tekrar kopyalanmaz. 2 ile 3 arasında
+kesilirse kalan eski dosyaları gc_image_files toplar.
+
+Kullanım:
+    python manage.py shard_media_files
+    python manage.py shard_media_files --workers 8 --batch-size 500
+    python manage.py shard_media_files --dry-run
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from listings.models import ImageBlob, ListingImage
+from listings.utils import ImageProcessor
+
+SHARDED_PATH_RE = rf'^{ImageProcessor.UPLOAD_DIR}/[^/]{{2}}/[^/]{{2}}/[^/]+$'
+
+
+def remap_manifest(variants, mapping):
+    """Manifestteki yolları yeni yollarla değiştir"""
+    remapped = {}
+    for size_name, variant in (variants or {}).items():
+        entry = dict(variant, path=mapping.get(variant["path"], variant["path"]))
+        entry["alternates"] = {
+            fmt: dict(alternate, path=mapping.get(alternate["path"], alternate["path"]))
+            for fmt, alternate in variant.get("alternates", {}).items()
+        }
+        remapped[size_name] = entry
+    return remapped
+
+
+def copy_file(old_path, new_path):
+    """
+    Dosyayı yeni yoluna kopyala. Hedef zaten varsa (önceki yarım çalışma) atla.
+    Dönen değer: kaynak dosya bulunamadıysa False
+    """
+    if old_path == new_path or default_storage.exists(new_path):
+        return True
+    if not default_storage.exists(old_path):
+        return False
+    try:
+        # Yerel disk: hard link - veri kopyalanmaz, eski ad silinene kadar iki ad da geçerli
+        source, target = default_storage.path(old_path), default_storage.path(new_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.link(source, target)
+    except (NotImplementedError, OSError):
+        with default_storage.open(old_path, 'rb') as f:
+            default_storage.save(new_path, f)
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Düz listing_images/ dizinindeki dosyaları hash önekli alt dizinlere taşır'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sadece say, dosya taşıma',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Tek transaction\'da güncellenecek kayıt sayısı (default: 200)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Paralel dosya kopyalama thread sayısı (default: 4)',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+
+        blobs = ImageBlob.objects.exclude(path__regex=SHARDED_PATH_RE).order_by('pk')
+        legacy_images = (
+            ListingImage.objects.filter(blob__isnull=True)
+            .exclude(image='')
+            .exclude(image__regex=SHARDED_PATH_RE)
+            .order_by('pk')
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'🧪 DRY RUN: {blobs.count()} blob ve {legacy_images.count()} blob\'suz resim taşınacaktı'
+            ))
+            return
+
+        start_time = time.time()
+        self.moved = self.missing = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            self.pool = pool
+            self.migrate(blobs, self.plan_blob, self.apply_blob)
+            self.migrate(legacy_images, self.plan_legacy_image, self.apply_legacy_image)
+
+        elapsed_time = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Tamamlandı! {self.moved} kayıt taşındı, {self.missing} eksik dosya. Süre: {elapsed_time:.1f} saniye'
+        ))
+
+    def migrate(self, queryset, plan, apply):
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:self.batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1].pk
+
+            plans = [plan(obj) for obj in batch]
+            moves = [move for _, mapping in plans for move in mapping.items()]
+
+            # 1 Kopyala - hepsi bitmeden DB'ye dokunma
+            for (old_path, new_path), found in zip(moves, self.pool.map(lambda m: copy_file(*m), moves)):
+                if not found:
+                    self.missing += 1
+                    self.stdout.write(self.style.WARNING(f'⚠️ Dosya bulunamadı: {old_path}'))
+
+            # 2 Yolları güncelle
+            with transaction.atomic():
+                for obj, mapping in plans:
+                    apply(obj, mapping)
+
+            # 3 Eski dosyaları sil
+            old_paths = [old_path for old_path, new_path in moves if old_path != new_path]
+            list(self.pool.map(default_storage.delete, old_paths))
+
+            self.moved += len(batch)
+            self.stdout.write(f'📍 Taşındı: {self.moved}')
+
+    def plan_blob(self, blob):
+        return blob, {path: ImageProcessor.sharded_path(path, blob.sha256) for path in blob.file_paths()}
+
+    def apply_blob(self, blob, mapping):
+        path = mapping[blob.path]
+        variants = remap_manifest(blob.variants, mapping)
+        ImageBlob.objects.filter(pk=blob.pk).update(path=path, variants=variants)
+        # Blob'u paylaşan resimler aynı dosyaları gösterir
+        ListingImage.objects.filter(blob=blob).update(image=path, variants=variants)
+
+    def plan_legacy_image(self, listing_image):
+        key = os.path.splitext(os.path.basename(listing_image.image.name))[0]
+        paths = [listing_image.image.name, *ImageProcessor.manifest_paths(listing_image.variants)]
+        return listing_image, {path: ImageProcessor.sharded_path(path, key) for path in paths}
+
+    def apply_legacy_image(self, listing_image, mapping):
+        ListingImage.objects.filter(pk=listing_image.pk).update(
+            image=mapping[listing_image.image.name],
+            variants=remap_manifest(listing_image.variants, mapping),
+        )
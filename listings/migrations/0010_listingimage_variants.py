@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_listing_district_listing_neighborhood_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Oluşturulan boyutların manifesti'),
+        ),
+    ]
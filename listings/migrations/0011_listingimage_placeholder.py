@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_listingimage_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingimage',
+            name='dominant_color',
+            field=models.CharField(blank=True, default='', help_text='Baskın renk (#rrggbb)', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='placeholder',
+            field=models.TextField(blank=True, default='', help_text='Küçük inline placeholder (data URI)'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-19 12:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_listingimage_placeholder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('path', models.CharField(help_text='Yüklenen orijinal dosyanın storage yolu', max_length=255)),
+                ('variants', models.JSONField(blank=True, default=dict)),
+                ('placeholder', models.TextField(blank=True, default='')),
+                ('dominant_color', models.CharField(blank=True, default='', max_length=7)),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Bu dosyayı kullanan ilan resmi sayısı')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Resim Dosyası',
+                'verbose_name_plural': 'Resim Dosyaları',
+            },
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='listing_images', to='listings.imageblob'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 13:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0004_rename_vairant_car_variant'),
+        ('listings', '0013_imageupload'),
+        ('locations', '0002_district_neighborhood_province_delete_city_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['user', 'is_deleted', 'is_active', '-created_at'], name='listing_owner_status_created'),
+        ),
+    ]
@@ -1,10 +1,45 @@
-from django.db import models
+import os
+import tempfile
+from django.db import models, transaction
+from django.db.models import F, Count, Q
 from django.conf import settings
+from django_cleanup import cleanup
 from locations.models import Province, District, Neighborhood
 from cars.models import Car
+from core.models import FieldTrackerMixin
+from django.core.files.storage import default_storage
+from .utils import ImageProcessor
+import logging
 
+logger = logging.getLogger("custom.listings")
 
-class Listing(models.Model):
+
+class ListingQuerySet(models.QuerySet):
+    def with_details(self):
+        """
+        ListingSerializer'ın dokunduğu tüm ilişkiler: araç hiyerarşisi (CarSerializer
+        iç içe brand/model/variant/trim), konum ve resimler - ilan başına ek sorgu olmaz
+        """
+        return self.select_related(
+            'user', 'province', 'district', 'neighborhood',
+            'car__brand', 'car__model__brand',
+            'car__variant__car__brand',
+            'car__trim__variant__car__brand',
+        ).prefetch_related('images')
+
+    def for_owner(self, user):
+        """
+        İlan sahibinin kendi listesi (my_listings): detaylar + sadece sahibine
+        gösterilen sayılar. Resim sayıları aynı sorguda annotate edilir;
+        processing_image_count manifesti henüz yazılmamış (boyutları üretilmemiş) resimler.
+        """
+        return self.filter(user=user, is_deleted=False).with_details().annotate(
+            image_count=Count('images'),
+            processing_image_count=Count('images', filter=Q(images__variants={})),
+        ).order_by('-created_at')
+
+
+class Listing(FieldTrackerMixin, models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='listings')
     car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='listings')
     title = models.CharField(max_length=150)
@@ -24,6 +59,14 @@ class Listing(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)    
 
+    # Güncelleme logu için izlenen alanlar (bkz. signals.log_listing_update)
+    tracked_fields = [
+        "title", "description", "price", "province", "district", "neighborhood",
+        "is_active", "is_deleted"
+    ]
+
+    objects = ListingQuerySet.as_manager()
+
     @property
     def is_premium(self):
         """
@@ -67,14 +110,120 @@ class Listing(models.Model):
         ordering = ['-created_at']
         verbose_name = 'İlan'
         verbose_name_plural = 'İlanlar'
+        indexes = [
+            # Sahibinin ilanları (my_listings, dashboard): durum filtresi + en yeni önce
+            models.Index(fields=['user', 'is_deleted', 'is_active', '-created_at'], name='listing_owner_status_created'),
+        ]
 
     def __str__(self):
         location_info = f" - {self.full_address}" if any([self.province, self.district, self.neighborhood]) else ""
         return f"{self.title} - {self.car.brand.name} {self.car.model.name} ({self.price} ₺){location_info}"
 
+class ImageBlob(models.Model):
+    """
+    İçerik adresli (SHA-256) resim dosyası.
+    Aynı byte'lar bir kez saklanır ve bir kez işlenir; ListingImage'lar
+    blob'u paylaşır, son referans silinince dosyalar da silinir.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=255, help_text="Yüklenen orijinal dosyanın storage yolu")
+
+    # ListingImage ile aynı manifest yapısı - yeni referanslara kopyalanır
+    variants = models.JSONField(default=dict, blank=True)
+    placeholder = models.TextField(blank=True, default='')
+    dominant_color = models.CharField(max_length=7, blank=True, default='')
+
+    ref_count = models.PositiveIntegerField(default=0, help_text="Bu dosyayı kullanan ilan resmi sayısı")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Resim Dosyası'
+        verbose_name_plural = 'Resim Dosyaları'
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} referans)"
+
+    def generate_variants(self, image_file):
+        """Boyutları ve placeholder'ı blob için bir kez oluştur"""
+        self.variants = ImageProcessor.create_thumbnails(image_file, self.sha256)
+        try:
+            self.placeholder, self.dominant_color = ImageProcessor.create_placeholder(image_file)
+        except Exception as e:
+            logger.error(f"Placeholder oluşturma hatası: {e}")
+        ImageBlob.objects.filter(pk=self.pk).update(
+            variants=self.variants,
+            placeholder=self.placeholder,
+            dominant_color=self.dominant_color,
+        )
+
+    def file_paths(self):
+        """Blob'a ait tüm dosyalar: orijinal + tüm boyut ve formatlar"""
+        return [self.path, *ImageProcessor.manifest_paths(self.variants)]
+
+    def acquire(self):
+        ImageBlob.objects.filter(pk=self.pk).update(ref_count=F('ref_count') + 1)
+
+    @classmethod
+    def release(cls, blob_id):
+        """
+        Referans sayısını azalt; son referans gittiyse blob'u ve
+        dosyalarını sil. Dosyalar transaction commit olduktan sonra silinir.
+        """
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(pk=blob_id).first()
+            if not blob:
+                return
+            blob.ref_count = max(blob.ref_count - 1, 0)
+            if blob.ref_count == 0 and not blob.listing_images.exists():
+                paths = blob.file_paths()
+                blob.delete()
+                transaction.on_commit(lambda: ImageProcessor.delete_files(paths))
+                logger.info(f"[ImageBlob] Son referans silindi, dosyalar kaldırılıyor: {blob.sha256}")
+            else:
+                cls.objects.filter(pk=blob.pk).update(ref_count=blob.ref_count)
+
+
+class ListingImageQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Yayındaki (aktif, silinmemiş) ilanların resimleri. Sahibi kendi pasif
+        ilanlarının resimlerini, staff hepsini görür.
+        """
+        if user.is_authenticated and user.is_staff:
+            return self
+        visible = Q(listing__is_active=True, listing__is_deleted=False)
+        if user.is_authenticated:
+            visible |= Q(listing__user=user)
+        return self.filter(visible)
+
+    def for_file(self, path):
+        """
+        Storage'daki dosyayı (orijinal veya herhangi bir boyutu) kullanan resimler.
+
+        İçerik adresli dosyaların adı sha256 ile başlar: tek index'li sorgu.
+        Eski (blob'suz) dosyalarda boyut adı <isim>_<boyut>.<uzantı> olduğundan
+        adın '_' ile ayrılan önekleri orijinal adı olarak denenir.
+        """
+        name = os.path.basename(path)
+        key = name[:64]
+        if len(name) > 64 and name[64] in "._" and all(c in "0123456789abcdef" for c in key):
+            return self.filter(blob__sha256=key)
+
+        parts = name.rsplit(".", 1)[0].split("_")
+        stems = ["_".join(parts[:i]) for i in range(len(parts), 0, -1)]
+        condition = Q()
+        for stem in stems:
+            condition |= Q(image__contains=f"/{stem}.")
+        return self.filter(condition, blob__isnull=True)
+
+
+# Dosyalar blob'lar arasında paylaşıldığı için django_cleanup silmemeli
+@cleanup.ignore
 class ListingImage(models.Model):
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to="listing_images/")
+    # Aynı içerik tekrar yüklenirse mevcut blob kullanılır (dosya ve işleme paylaşılır)
+    blob = models.ForeignKey(ImageBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='listing_images')
     # thumbnail alanı kaldırıldı - signals ile otomatik oluşturuluyor
 
     order = models.PositiveIntegerField(default=0, help_text="Resim sırası, 0 en önde")
@@ -84,8 +233,18 @@ class ListingImage(models.Model):
     width = models.PositiveIntegerField(help_text="Resim genişliği", null=True, blank=True)
     height = models.PositiveIntegerField(help_text="Resim yüksekliği", null=True, blank=True)
 
+    # İşleme bitince yazılan manifest: {boyut adı: {path, width, height, bytes, format}}
+    # URL'ler sadece buradan üretilir, storage'a exists() sorgusu atılmaz
+    variants = models.JSONField(default=dict, blank=True, help_text="Oluşturulan boyutların manifesti")
+
+    # Liste yanıtlarında resim inene kadar gösterilen LQIP ve baskın renk
+    placeholder = models.TextField(blank=True, default='', help_text="Küçük inline placeholder (data URI)")
+    dominant_color = models.CharField(max_length=7, blank=True, default='', help_text="Baskın renk (#rrggbb)")
+
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ListingImageQuerySet.as_manager()
+
     class Meta:
         ordering = ['order', 'uploaded_at']
         verbose_name = 'İlan Resmi'
@@ -94,20 +253,12 @@ class ListingImage(models.Model):
     @property
     def thumbnail_url(self):
         """Otomatik oluşturulan thumbnail'ın URL'ini döndür"""
-        if self.image:
-            # Ana resim dosya yolundan thumbnail yolunu oluştur
-            import os
-            base_name = os.path.splitext(self.image.name)[0]
-            # Sadece dosya adını al (path kaldır)
-            clean_base_name = os.path.basename(base_name)
-            thumbnail_path = f"listing_images/thumbnails/{clean_base_name}_thumbnail.jpg"
-            try:
-                from django.core.files.storage import default_storage
-                if default_storage.exists(thumbnail_path):
-                    return default_storage.url(thumbnail_path)
-            except:
-                pass
-        return None
+        return self.get_image_url(size='thumbnail')
+
+    @property
+    def is_processed(self):
+        """Boyutlar oluşturulup manifest yazıldı mı?"""
+        return bool(self.variants)
 
     def save(self, *args, **kwargs):
         # Sadece basit model logic - ağır işler signals'da
@@ -118,19 +269,212 @@ class ListingImage(models.Model):
             ).exclude(pk=self.pk).update(is_primary=False)
         super().save(*args, **kwargs)
 
-    def get_image_url(self, size='original'):
+    def get_variant_path(self, size='original', fmt=None):
         """
-        4:3 formatındaki resim URL'lerini döndür
+        Manifestteki dosya yolunu döndür. fmt verilmezse JPEG fallback.
         """
-        try:
-            if size == 'thumbnail':
-                return self.thumbnail_url
-            elif size == 'original' and self.image:
-                return self.image.url
-            else:
-                return None
-        except:
+        variant = (self.variants or {}).get(size)
+        if not variant:
             return None
+        if fmt is None or fmt == variant['format']:
+            return variant['path']
+        alternate = variant.get('alternates', {}).get(fmt)
+        return alternate['path'] if alternate else None
+
+    def get_image_url(self, size='original', fmt=None):
+        """
+        4:3 formatındaki resim URL'lerini manifestten döndür.
+        Manifest henüz yazılmadıysa original için yüklenen dosyaya düşer.
+        """
+        path = self.get_variant_path(size, fmt)
+        if path:
+            return default_storage.url(path)
+        if size == 'original' and fmt is None and self.image:
+            return self.image.url
+        return None
+
+    def get_image_sources(self, size='original'):
+        """
+        Bir boyutun tüm formatlardaki URL'leri: {format: url}
+        """
+        variant = (self.variants or {}).get(size)
+        if not variant:
+            return {}
+        sources = {variant['format']: default_storage.url(variant['path'])}
+        for fmt, alternate in variant.get('alternates', {}).items():
+            sources[fmt] = default_storage.url(alternate['path'])
+        return sources
+
+    def get_srcset(self):
+        """
+        Manifestteki tüm boyutlar genişliğe göre sıralı:
+        [{"size", "width", "height", "url", "sources": {format: url}}]
+        """
+        return [
+            {
+                'size': size_name,
+                'width': variant['width'],
+                'height': variant['height'],
+                'url': default_storage.url(variant['path']),
+                'sources': self.get_image_sources(size_name),
+            }
+            for size_name, variant in sorted(
+                (self.variants or {}).items(), key=lambda item: item[1]['width']
+            )
+        ]
+
+    def pick_size(self, min_width):
+        """
+        Genişliği en az min_width olan en küçük boyutun adı.
+        Yoksa en geniş boyut döner.
+        """
+        variants = sorted((self.variants or {}).items(), key=lambda item: item[1]['width'])
+        for size_name, variant in variants:
+            if variant['width'] >= min_width:
+                return size_name
+        return variants[-1][0] if variants else None
+
+    def negotiate_variant(self, size, accept_header):
+        """
+        Accept header'ına göre sunulacak (path, format) çiftini seç
+        """
+        variant = (self.variants or {}).get(size)
+        if not variant:
+            return None
+        available = [variant['format'], *variant.get('alternates', {})]
+        fmt = ImageProcessor.negotiate_format(accept_header, available)
+        return self.get_variant_path(size, fmt), fmt
+
+    def generate_variants(self):
+        """
+        Tüm boyutları ve placeholder'ı oluştur, manifesti kaydet.
+        Blob'a bağlı resimlerde blob zaten işlendiyse sadece kopyalanır.
+        update() ile yazılır, save sinyalleri tekrar tetiklenmez.
+        """
+        if self.blob_id:
+            if not self.blob.variants:
+                self.blob.generate_variants(self.image)
+            self.copy_from_blob(self.blob)
+        else:
+            self.variants = ImageProcessor.create_thumbnails(
+                self.image,
+                os.path.splitext(self.image.name)[0]  # Dosya adını uzantı olmadan al
+            )
+            self.generate_placeholder(commit=False)
+        ListingImage.objects.filter(pk=self.pk).update(
+            variants=self.variants,
+            placeholder=self.placeholder,
+            dominant_color=self.dominant_color,
+        )
+        return self.variants
+
+    def copy_from_blob(self, blob):
+        self.variants = blob.variants
+        self.placeholder = blob.placeholder
+        self.dominant_color = blob.dominant_color
+
+    def delete_files(self):
+        """Blob'a bağlı olmayan (eski) resmin dosyalarını sil"""
+        paths = [self.image.name, *ImageProcessor.manifest_paths(self.variants)] if self.image else []
+        ImageProcessor.delete_files(paths)
+
+    def generate_placeholder(self, commit=True):
+        """LQIP ve baskın rengi hesapla"""
+        try:
+            self.placeholder, self.dominant_color = ImageProcessor.create_placeholder(self.image)
+        except Exception as e:
+            logger.error(f"Placeholder oluşturma hatası: {e}")
+            return
+        if commit:
+            ListingImage.objects.filter(pk=self.pk).update(
+                placeholder=self.placeholder,
+                dominant_color=self.dominant_color,
+            )
 
     def __str__(self):
         return f"{self.listing.title} - Resim {self.order + 1}"
+
+
+class ImageUpload(models.Model):
+    """
+    Parça parça (resumable) resim yüklemesi.
+
+    İstemci önce toplam boyutu bildirip kayıt açar, sonra parçaları
+    Upload-Offset ile gönderir. Parçalar doğrudan diskteki geçici dosyaya
+    eklenir; bağlantı koparsa HEAD ile kaldığı offset'i öğrenip devam eder.
+    Tamamlanınca dosya normal ListingImage akışına verilir.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Yükleniyor'),
+        ('completed', 'Tamamlandı'),
+    ]
+    CHUNK_READ_SIZE = 64 * 1024
+    # Bundan büyük parçalar gövde okunurken diske taşar
+    CHUNK_SPOOL_MAX_SIZE = 1024 * 1024
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='image_uploads')
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='image_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField(help_text="Toplam dosya boyutu (byte)")
+    offset = models.PositiveIntegerField(default=0, help_text="Alınan byte sayısı")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    listing_image = models.ForeignKey(ListingImage, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Resim Yüklemesi'
+        verbose_name_plural = 'Resim Yüklemeleri'
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.LISTING_IMAGE_UPLOAD_DIR, f"{self.pk}.part")
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.size
+
+    @classmethod
+    def spool_chunk(cls, stream, length):
+        """
+        İstek gövdesini kilit almadan önce tamamen oku: küçük parçalar bellekte,
+        büyükler geçici dosyada. Dönen değer: (başa sarılmış dosya, okunan byte)
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=cls.CHUNK_SPOOL_MAX_SIZE)
+        received = 0
+        while received < length:
+            data = stream.read(min(cls.CHUNK_READ_SIZE, length - received))
+            if not data:
+                break
+            spool.write(data)
+            received += len(data)
+        spool.seek(0)
+        return spool, received
+
+    def append_chunk(self, stream, length):
+        """
+        Stream'den en fazla `length` byte'ı geçici dosyanın sonuna yaz.
+        Bellekte tek seferde yalnızca bir okuma bloğu tutulur.
+        """
+        os.makedirs(settings.LISTING_IMAGE_UPLOAD_DIR, exist_ok=True)
+        written = 0
+        with open(self.temp_path, 'r+b' if self.offset else 'wb') as f:
+            # Önceki yarım kalmış yazmanın artığını at
+            f.truncate(self.offset)
+            f.seek(self.offset)
+            while written < length:
+                data = stream.read(min(self.CHUNK_READ_SIZE, length - written))
+                if not data:
+                    break
+                f.write(data)
+                written += len(data)
+        return written
+
+    def delete_temp_file(self):
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
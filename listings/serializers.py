@@ -1,11 +1,13 @@
+import os
 from rest_framework import serializers
-from .models import Listing, ListingImage
+from .models import Listing, ListingImage, ImageUpload
 from users.serializers import UserSerializer
 from cars.serializers import CarSerializer
 from locations.serializers import ProvinceSerializer, DistrictSerializer, NeighborhoodSerializer
 from .utils import ImageProcessor
 from cars.models import Car, CarBrand, CarModel, CarVariant, CarTrim
 from locations.models import Province, District, Neighborhood
+from django.conf import settings
 
 
 
@@ -16,6 +18,10 @@ class ListingImageSerializer(serializers.ModelSerializer):
     # 4:3 resim URL'leri - sadece thumbnail ve original
     thumbnail_url = serializers.SerializerMethodField()  # 320x240
     original_url = serializers.SerializerMethodField()   # 1200x900
+    # Her boyut için tüm formatlar: {"thumbnail": {"jpeg": url, "webp": url, ...}}
+    sources = serializers.SerializerMethodField()
+    # Genişliğe göre sıralı boyutlar - <img srcset> / <picture> için
+    srcset = serializers.SerializerMethodField()
 
     file_size_mb = serializers.SerializerMethodField()
     dimensions = serializers.SerializerMethodField()
@@ -24,32 +30,40 @@ class ListingImageSerializer(serializers.ModelSerializer):
         model = ListingImage
         fields = [
             'id', 'listing', 'image', 'order', 'is_primary',
-            'thumbnail_url', 'original_url',
+            'thumbnail_url', 'original_url', 'sources', 'srcset',
+            'placeholder', 'dominant_color',
             'file_size', 'file_size_mb', 'dimensions', 'uploaded_at'
         ]
-        read_only_fields = ['file_size', 'width', 'height']
+        read_only_fields = ['file_size', 'width', 'height', 'placeholder', 'dominant_color']
 
-    def get_thumbnail_url(self, obj):
-        thumbnail_url = obj.get_image_url(size='thumbnail')
-        if thumbnail_url:
+    def build_url(self, url):
+        if url:
             # Request context varsa tam URL oluştur
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(thumbnail_url)
+                return request.build_absolute_uri(url)
             # Context yoksa Django'nun tam URL'ini oluştur
-            return f"http://localhost:8000{thumbnail_url}"
+            return f"http://localhost:8000{url}"
         return None
+
+    def get_thumbnail_url(self, obj):
+        return self.build_url(obj.get_image_url(size='thumbnail'))
     
     def get_original_url(self, obj):
-        original_url = obj.get_image_url(size='original')
-        if original_url:
-            # Request context varsa tam URL oluştur
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(original_url)
-            # Context yoksa Django'nun tam URL'ini oluştur
-            return f"http://localhost:8000{original_url}"
-        return None
+        return self.build_url(obj.get_image_url(size='original'))
+
+    def get_sources(self, obj):
+        return {
+            size_name: {fmt: self.build_url(url) for fmt, url in obj.get_image_sources(size_name).items()}
+            for size_name in (obj.variants or {})
+        }
+
+    def get_srcset(self, obj):
+        srcset = obj.get_srcset()
+        for item in srcset:
+            item['url'] = self.build_url(item['url'])
+            item['sources'] = {fmt: self.build_url(url) for fmt, url in item['sources'].items()}
+        return srcset
     
     def get_file_size_mb(self, obj):
         if obj.file_size:
@@ -71,7 +85,7 @@ class BulkImageUploadSerializer(serializers.Serializer):
     listing_id = serializers.IntegerField()
     images = serializers.ListField(
         child=serializers.ImageField(),
-        max_length=10,  # Max 10 images per upload
+        max_length=ImageProcessor.MAX_FILES_PER_UPLOAD,
         min_length=1,  # At least 1 image required
     )
     
@@ -101,6 +115,31 @@ class BulkImageUploadSerializer(serializers.Serializer):
         
         return created_images
 
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImageUpload
+        fields = ['id', 'listing', 'filename', 'size', 'offset', 'status', 'listing_image', 'created_at']
+        read_only_fields = ['offset', 'status', 'listing_image', 'created_at']
+
+    def validate_listing(self, value):
+        request = self.context.get('request')
+        if request and value.user != request.user:
+            raise serializers.ValidationError("You don't have permission to upload images for this listing.")
+        return value
+
+    def validate_filename(self, value):
+        return os.path.basename(value.replace('\\', '/')) or 'upload'
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Dosya boyutu geçersiz.")
+        if value > ImageProcessor.MAX_FILE_SIZE:
+            raise serializers.ValidationError(
+                f"Dosya boyutu çok büyük. Maksimum {ImageProcessor.MAX_FILE_SIZE // (1024*1024)}MB olabilir."
+            )
+        return value
+
 # NEW: İlan oluşturma için özel serializer
 class CreateListingSerializer(serializers.ModelSerializer):
     # Araç bilgileri
@@ -299,6 +338,8 @@ class ListingSerializer(serializers.ModelSerializer):
 
     images = ListingImageSerializer(many=True, read_only=True)
     primary_image = serializers.SerializerMethodField()
+    # Kart görünümü için LISTING_CARD_IMAGE_WIDTH'e uygun boyut
+    card_image = serializers.SerializerMethodField()
     image_count = serializers.SerializerMethodField()
     is_premium = serializers.ReadOnlyField()  # Property'den otomatik gelir
 
@@ -321,21 +362,55 @@ class ListingSerializer(serializers.ModelSerializer):
             'updated_at',
             'images',
             'primary_image',
+            'card_image',
             'image_count'
         ]
 
+    def get_primary_listing_image(self, obj):
+        """
+        Ana resim, yoksa sıradaki ilk resim.
+        prefetch_related('images') varsa ek sorgu atmaz.
+        """
+        images = list(obj.images.all())
+        for image in images:
+            if image.is_primary:
+                return image
+        return images[0] if images else None
+
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        primary_image = self.get_primary_listing_image(obj)
         if primary_image:
             # Use the ListingImageSerializer to serialize the primary image
-            return ListingImageSerializer(primary_image).data
-        first = obj.images.first()
-        if first:
-            return ListingImageSerializer(first, context=self.context).data
+            return ListingImageSerializer(primary_image, context=self.context).data
         return None
+
+    def get_card_image(self, obj):
+        primary_image = self.get_primary_listing_image(obj)
+        if not primary_image:
+            return None
+        size_name = primary_image.pick_size(settings.LISTING_CARD_IMAGE_WIDTH)
+        if not size_name:
+            return None
+        image_serializer = ListingImageSerializer(context=self.context)
+        variant = primary_image.variants[size_name]
+        return {
+            'size': size_name,
+            'width': variant['width'],
+            'height': variant['height'],
+            'url': image_serializer.build_url(primary_image.get_image_url(size_name)),
+            'sources': {
+                fmt: image_serializer.build_url(url)
+                for fmt, url in primary_image.get_image_sources(size_name).items()
+            },
+            'placeholder': primary_image.placeholder,
+            'dominant_color': primary_image.dominant_color,
+        }
         
     def get_image_count(self, obj):
-        return obj.images.count()
+        # for_owner() annotate eder; yoksa prefetch edilmiş resimlerden sayılır
+        if hasattr(obj, 'image_count'):
+            return obj.image_count
+        return len(obj.images.all())
 
     def validate_price(self,value):
         if value <= 0:
@@ -347,6 +422,21 @@ class ListingSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Title cannot be empty.")
         return value
 
+class OwnerListingSerializer(ListingSerializer):
+    """
+    İlan sahibinin kendi listesi - Listing.objects.for_owner() ile kullanılır,
+    ek alanlar annotate edilmiş değerlerden gelir (ek sorgu yok)
+    """
+    processing_image_count = serializers.IntegerField(read_only=True)
+    is_processing = serializers.SerializerMethodField()
+
+    class Meta(ListingSerializer.Meta):
+        fields = ListingSerializer.Meta.fields + ['processing_image_count', 'is_processing']
+
+    def get_is_processing(self, obj):
+        return obj.processing_image_count > 0
+
+
 # NEW: İlan düzenleme için serializer
 class UpdateListingSerializer(serializers.ModelSerializer):
     # Araç bilgileri
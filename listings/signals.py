@@ -3,96 +3,66 @@ Bu dosya Django signal handlers kullanarak ilanlar ve ilan resimleri için logla
 
 Loglama İşlemleri:
 
-1. Bir ilan (Listing) kaydedilmeden önce:
-    - İlanın mevcut durumu hafızada saklanır (_PREVIOUS_LISTINGS sözlüğünde)
-    - Bu sayede değişiklikleri takip edebiliriz
-
-2. Bir ilan (Listing) kaydedildikten sonra:
+1. Bir ilan (Listing) kaydedildikten sonra:
     - Yeni ilan oluşturulduğunda: Yeni ilanın ID'si, başlığı ve kullanıcısı loglanır
     - Mevcut ilan güncellendiğinde: Önemli alanlardaki değişiklikler karşılaştırılır ve loglanır
-      - Kontrol edilen alanlar: başlık, açıklama, fiyat, şehir, aktif durumu ve silinme durumu
+      - Kontrol edilen alanlar Listing.tracked_fields: başlık, açıklama, fiyat, adres, aktif durumu ve silinme durumu
+      - Eski değerler ilan DB'den yüklenirken saklanır (core.models.FieldTrackerMixin), ek sorgu yapılmaz
       - Uzun metinler 30 karaktere kısaltılır
       - Değişiklikler "eski değer → yeni değer" formatında loglanır
-      - İşlem sonunda önceki durum hafızadan temizlenir
 
-3. Bir ilan resmi (ListingImage) silindiğinde:
-    - Fiziksel dosya da silinmeye çalışılır
+2. Bir ilan resmi (ListingImage) silindiğinde:
+    - İçerik adresli blob'un referans sayısı azaltılır, son referans ise dosyalar silinir
+    - Blob'a bağlı olmayan eski resimlerde dosya ve tüm boyutları silinir
     - Silme işlemi başarısız olursa, hata mesajı loglanır
 
 Bu loglama sistemi, sistemdeki tüm ilan değişikliklerini izlemeyi ve hata ayıklamayı kolaylaştırır.
 """
 from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Listing, ListingImage
+from .models import Listing, ListingImage, ImageBlob
+from django.core.files.storage import default_storage
 import logging
 from .utils import ImageProcessor
 from PIL import Image
 
-logger = logging.getLogger("custom")
-
-# Önceki değeri önceden saklamak için
-_PREVIOUS_LISTINGS = {}
-
-
-@receiver(pre_save, sender=Listing)
-def store_previous_listing_state(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old = Listing.objects.get(pk=instance.pk)
-            _PREVIOUS_LISTINGS[instance.pk] = old
-        except Listing.DoesNotExist:
-            pass
+logger = logging.getLogger("custom.listings")
 
+def shorten(value):
+    """Log için değeri kısalt - uzun metinler 30 karakter"""
+    if isinstance(value, str) and len(value) > 30:
+        return value[:30] + "..."
+    return value
 
 
 @receiver(post_save, sender=Listing)
 def log_listing_update(sender, instance, created, **kwargs):
     if created:
         logger.info(f"[Listing] Yeni ilan oluşturuldu: ID={instance.id}, Başlık='{instance.title}', Kullanıcı={instance.user}")
-    else:
-        old = _PREVIOUS_LISTINGS.get(instance.pk)
-        if not old:
-            return
-
-        fields_to_check = [
-            "title", "description", "price", "province", "district", "neighborhood",
-            "is_active", "is_deleted"
-        ]
-        changes = []
-
-        for field in fields_to_check:
-            old_val = getattr(old, field)
-            new_val = getattr(instance, field)
-            if old_val != new_val:
-                # string uzunluklarını kısalt
-                if isinstance(old_val, str):
-                    old_val = (old_val[:30] + "...") if len(old_val) > 30 else old_val
-                if isinstance(new_val, str):
-                    new_val = (new_val[:30] + "...") if len(new_val) > 30 else new_val
-
-                # ForeignKey objesi ise str haline getir
-                if hasattr(old_val, "__str__") and not isinstance(old_val, (str, int, float, bool)):
-                    old_val = str(old_val)
-                if hasattr(new_val, "__str__") and not isinstance(new_val, (str, int, float, bool)):
-                    new_val = str(new_val)
-
-                changes.append(f"{field}: '{old_val}' → '{new_val}'")
-
-        if changes:
-            logger.info(
-                f"[Listing] İlan güncellendi: ID={instance.id}, Kullanıcı={instance.user} | Değişiklikler: {', '.join(changes)}"
-            )
-
-        _PREVIOUS_LISTINGS.pop(instance.pk, None)
+        return
+
+    # Yüklenen değerlerle karşılaştırma bellekte - ek SELECT yok (FieldTrackerMixin)
+    # ForeignKey alanları id olarak loglanır
+    changes = [
+        f"{field}: '{shorten(old_val)}' → '{shorten(new_val)}'"
+        for field, (old_val, new_val) in instance.get_changes().items()
+    ]
+    if changes:
+        logger.info(
+            f"[Listing] İlan güncellendi: ID={instance.id}, Kullanıcı={instance.user_id} | Değişiklikler: {', '.join(changes)}"
+        )
 
 
 @receiver(post_delete, sender=ListingImage)
 def delete_listing_image_file(sender, instance, **kwargs):
-    if instance.image:
-        try:
-            instance.image.delete(save=False)
-        except Exception as e:
-            logger.warning(f"[ListingImage] Fiziksel dosya silinemedi. ID={instance.id} Hata: {e}")
+    try:
+        if instance.blob_id:
+            # Dosya başka ilanlarla paylaşılıyor olabilir - sadece son referansta silinir
+            ImageBlob.release(instance.blob_id)
+        elif instance.image:
+            instance.delete_files()
+    except Exception as e:
+        logger.warning(f"[ListingImage] Fiziksel dosya silinemedi. ID={instance.id} Hata: {e}")
 
 
 @receiver(pre_save, sender=ListingImage)
@@ -101,7 +71,8 @@ def process_image_before_save(sender, instance, **kwargs):
     Model kaydedilmeden önce resim işleme
     - Validation
     - File info extraction
-    - Filename generation
+    - Content hash (SHA-256) ve içerik adresli dosya adı
+    - Aynı içerik daha önce yüklendiyse mevcut blob'u kullan (dosya tekrar yazılmaz)
     """
 
     if not instance.pk and instance.image:
@@ -126,31 +97,63 @@ def process_image_before_save(sender, instance, **kwargs):
             if hasattr(instance.image, 'seek'):
                 instance.image.seek(original_position)
 
-            # 3 Yeni dosya adını oluştur
-            original_name = instance.image.name
-            new_filename = ImageProcessor.generate_filename(original_name=original_name)
-            instance.image.name = new_filename
-
-            logger.info(f"Resim hazırlandı: {new_filename} ({instance.width}x{instance.height})")
+            # Storage'da zaten olan dosya (ör. admin'den path verilmiş) yeniden adlandırılmaz
+            if instance.image._committed:
+                return
+
+            # 3 İçerik özeti - aynı byte'lar aynı blob'a gider
+            content_hash = ImageProcessor.compute_hash(instance.image)
+            blob = ImageBlob.objects.filter(sha256=content_hash).first()
+
+            if blob:
+                # Dosya ve boyutlar zaten var - yükleme kaydedilmez, işlenmez
+                instance.image = blob.path
+                instance.blob = blob
+                instance.copy_from_blob(blob)
+                logger.info(f"Resim tekrar kullanıldı: {blob.path} ({instance.width}x{instance.height})")
+            else:
+                instance.image.name = ImageProcessor.content_filename(content_hash, instance.image.name)
+                instance._content_hash = content_hash
+                logger.info(f"Resim hazırlandı: {instance.image.name} ({instance.width}x{instance.height})")
         except Exception as e:
             logger.error(f"Resim işleme hatası: {e}")
             raise e
-        
+
+
+@receiver(post_save, sender=ListingImage)
+def link_image_blob(sender, instance, created, **kwargs):
+    """
+    Yeni yüklenen içerik için blob oluştur ve referans sayısını artır.
+    Aynı içerik eşzamanlı yüklendiyse kendi kopyamızı silip mevcut blob'u kullanırız.
+    """
+    if not created:
+        return
+
+    content_hash = getattr(instance, '_content_hash', None)
+    if content_hash:
+        blob, blob_created = ImageBlob.objects.get_or_create(
+            sha256=content_hash,
+            defaults={'path': instance.image.name},
+        )
+        if not blob_created and blob.path != instance.image.name:
+            default_storage.delete(instance.image.name)
+            instance.image = blob.path
+        instance.blob = blob
+        ListingImage.objects.filter(pk=instance.pk).update(blob=blob, image=instance.image.name)
+
+    if instance.blob_id:
+        instance.blob.acquire()
+
 
 @receiver(post_save, sender=ListingImage)
 def create_thumbnail_after_save(sender, instance, created, **kwargs):
-    # Model kaydedildikten sonra thumbnail oluşturma
+    # Model kaydedildikten sonra boyutları oluştur ve manifesti yaz
     if created and instance.image:
         try:
-            import os
-            thumbnails = ImageProcessor.create_thumbnails(
-                instance.image,
-                os.path.splitext(instance.image.name)[0]  # Dosya adını uzantı olmadan al
-            )
-            # Thumbnail dosyası oluşturuldu - artık veritabanında thumbnail field'ı yok
-            # Thumbnail'a property üzerinden erişiliyor
+            variants = instance.generate_variants()
+            # URL'ler artık manifestten (ListingImage.variants) üretiliyor
             
-            if "thumbnail" in thumbnails:
+            if "thumbnail" in variants:
                 logger.info(f"4:3 Thumbnail oluşturuldu: {instance.image.name}")
         except Exception as e:
             logger.error(f"Thumbnail oluşturma hatası: {e}")
@@ -1,3 +1,506 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from cars.models import Car, CarBrand, CarModel
+from users.models import User
+from .models import ImageBlob, ImageUpload, Listing, ListingImage
+from .serializers import ListingImageSerializer
+from . import utils
+from .management.commands.gc_image_files import ascending
+from .utils import ImageProcessor, ResizedImageCache
 
-# Create your tests here.
+
+def make_image(width=800, height=600, color=(200, 30, 30), fmt='JPEG', name='car.jpg'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format=fmt)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+def make_listing(user=None, **kwargs):
+    user = user or User.objects.create_user(username='seller', email='seller@example.com', password='Str0ng!pass99')
+    brand = CarBrand.objects.create(name='BMW')
+    model = CarModel.objects.create(brand=brand, name='3 Serisi')
+    car = Car.objects.create(
+        brand=brand, model=model, year=2020, mileage=10000, fuel_type='gasoline',
+        transmission='manual', color='red', body_type='sedan', engine_power=150,
+    )
+    return Listing.objects.create(user=user, car=car, title='İlan', description='Açıklama', price=100000, **kwargs)
+
+
+class MediaTestCase(TestCase):
+    """Her test sınıfı kendi geçici MEDIA_ROOT'unu kullanır"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+
+class VariantManifestTests(MediaTestCase):
+    def test_manifest_written_on_upload(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image())
+        listing_image.refresh_from_db()
+
+        self.assertIn('original', listing_image.variants)
+        self.assertIn('thumbnail', listing_image.variants)
+        thumbnail = listing_image.variants['thumbnail']
+        self.assertEqual((thumbnail['width'], thumbnail['height']), (320, 240))
+        self.assertTrue(default_storage.exists(thumbnail['path']))
+
+    def test_urls_built_without_storage_lookups(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image())
+        listing_image.refresh_from_db()
+
+        with mock.patch.object(default_storage, 'exists', side_effect=AssertionError('exists() çağrıldı')):
+            data = ListingImageSerializer(listing_image).data
+        self.assertTrue(data['thumbnail_url'].endswith(listing_image.variants['thumbnail']['path']))
+
+    def test_build_image_manifests_fills_missing(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image())
+        ListingImage.objects.filter(pk=listing_image.pk).update(variants={})
+
+        call_command('build_image_manifests', stdout=io.StringIO())
+
+        listing_image.refresh_from_db()
+        self.assertIn('thumbnail', listing_image.variants)
+
+
+class FormatNegotiationTests(MediaTestCase):
+    def test_negotiate_format(self):
+        available = ['jpeg', 'webp']
+        self.assertEqual(ImageProcessor.negotiate_format('image/avif,image/webp,*/*;q=0.8', available), 'webp')
+        self.assertEqual(ImageProcessor.negotiate_format('image/webp;q=0.5,image/jpeg', available), 'jpeg')
+        self.assertEqual(ImageProcessor.negotiate_format('', available), 'jpeg')
+        self.assertEqual(ImageProcessor.negotiate_format('image/png', available), 'jpeg')
+
+    def test_webp_alternate_in_manifest(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image())
+        listing_image.refresh_from_db()
+
+        thumbnail = listing_image.variants['thumbnail']
+        self.assertEqual(thumbnail['format'], 'jpeg')
+        self.assertIn('webp', thumbnail['alternates'])
+
+    def test_file_endpoint_serves_by_accept(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image())
+        url = f'/api/listing-images/{listing_image.pk}/file/thumbnail/'
+
+        response = self.client.get(url, HTTP_ACCEPT='image/webp,image/*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('Accept', response['Vary'])
+
+        response = self.client.get(url, HTTP_ACCEPT='image/jpeg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+        self.assertEqual(self.client.get(f'/api/listing-images/{listing_image.pk}/file/nope/').status_code, 404)
+
+
+class ResponsiveVariantTests(MediaTestCase):
+    @override_settings(LISTING_IMAGE_WIDTHS=[320, 640, 960])
+    def test_width_ladder_and_srcset(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image(1600, 1200))
+        listing_image.refresh_from_db()
+
+        srcset = listing_image.get_srcset()
+        widths = [item['width'] for item in srcset]
+        self.assertEqual(widths, sorted(widths))
+        self.assertEqual(widths, [320, 640, 960, 1200])
+        self.assertEqual({item['size'] for item in srcset}, {'thumbnail', 'w640', 'w960', 'original'})
+        for item in srcset:
+            self.assertEqual(item['height'] * 4, item['width'] * 3)
+            self.assertIn('jpeg', item['sources'])
+
+        self.assertEqual(listing_image.pick_size(500), 'w640')
+        self.assertEqual(listing_image.pick_size(5000), 'original')
+
+    def test_serializer_exposes_srcset(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image())
+        listing_image.refresh_from_db()
+
+        data = ListingImageSerializer(listing_image).data
+        self.assertEqual(len(data['srcset']), len(listing_image.variants))
+        self.assertTrue(all(item['url'].startswith('http') for item in data['srcset']))
+
+
+class PlaceholderTests(MediaTestCase):
+    def test_dominant_color(self):
+        image = Image.new('RGB', (64, 48), (200, 30, 40))
+        image.paste((10, 200, 10), (0, 0, 16, 48))
+        self.assertEqual(ImageProcessor.dominant_color(image), (200, 30, 40))
+
+    def test_placeholder_stored_and_serialized(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image(color=(20, 40, 200)))
+        listing_image.refresh_from_db()
+
+        self.assertTrue(listing_image.placeholder.startswith('data:image/'))
+        self.assertLess(len(listing_image.placeholder), 1000)
+        self.assertRegex(listing_image.dominant_color, r'^#[0-9a-f]{6}$')
+        red, green, blue = (int(listing_image.dominant_color[i:i + 2], 16) for i in (1, 3, 5))
+        self.assertGreater(blue, red + 100)
+
+        data = ListingImageSerializer(listing_image).data
+        self.assertEqual(data['placeholder'], listing_image.placeholder)
+        self.assertEqual(data['dominant_color'], listing_image.dominant_color)
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+    def test_duplicate_upload_shares_blob(self):
+        listing = make_listing()
+        first = ListingImage.objects.create(listing=listing, image=make_image())
+        second = ListingImage.objects.create(listing=listing, image=make_image())
+        first.refresh_from_db()
+        second.refresh_from_db()
+
+        self.assertIsNotNone(first.blob_id)
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(ImageBlob.objects.count(), 1)
+        self.assertEqual(ImageBlob.objects.get().ref_count, 2)
+
+    def test_files_deleted_with_last_reference(self):
+        listing = make_listing()
+        first = ListingImage.objects.create(listing=listing, image=make_image())
+        second = ListingImage.objects.create(listing=listing, image=make_image())
+        blob = ImageBlob.objects.get()
+        paths = blob.file_paths()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(all(default_storage.exists(path) for path in paths))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(any(default_storage.exists(path) for path in paths))
+
+    def test_different_content_gets_own_blob(self):
+        listing = make_listing()
+        ListingImage.objects.create(listing=listing, image=make_image())
+        ListingImage.objects.create(listing=listing, image=make_image(color=(0, 0, 255)))
+        self.assertEqual(ImageBlob.objects.count(), 2)
+        self.assertEqual(set(ImageBlob.objects.values_list('ref_count', flat=True)), {1})
+
+
+class ResizedImageCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def test_renders_once(self):
+        cache = ResizedImageCache(self.directory, 1000)
+        render = mock.Mock(return_value=b'x' * 10)
+
+        first = cache.get_or_render('ab/key.webp', render)
+        second = cache.get_or_render('ab/key.webp', render)
+
+        self.assertEqual(first, second)
+        self.assertEqual(render.call_count, 1)
+        with open(first, 'rb') as f:
+            self.assertEqual(f.read(), b'x' * 10)
+
+    def test_evicted_file_kept_for_grace_period(self):
+        cache = ResizedImageCache(self.directory, 250, eviction_grace=60)
+        for key in ('a', 'b', 'c'):
+            cache.get_or_render(key, lambda: b'x' * 100)
+
+        # 'a' bütçeden düştü ama hâlâ sunulabilir ve tekrar istenince render edilmez
+        self.assertNotIn('a', cache._index)
+        self.assertTrue(os.path.exists(self.path('a')))
+        cache.get_or_render('a', mock.Mock(side_effect=AssertionError('render edilmemeli')))
+        self.assertIn('a', cache._index)
+
+    def test_evicted_file_removed_after_grace_period(self):
+        cache = ResizedImageCache(self.directory, 250, eviction_grace=0)
+        for key in ('a', 'b', 'c'):
+            cache.get_or_render(key, lambda: b'x' * 100)
+
+        self.assertFalse(os.path.exists(self.path('a')))
+        self.assertEqual(cache._total_bytes, 200)
+
+    def test_failed_write_leaves_no_temp_file(self):
+        cache = ResizedImageCache(self.directory, 1000)
+        with mock.patch('listings.utils.os.replace', side_effect=OSError(28, 'No space left on device')):
+            with self.assertRaises(OSError):
+                cache.get_or_render('key', lambda: b'x' * 10)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_index_ignores_temp_files(self):
+        with open(self.path('leftover.1.2.tmp'), 'wb') as f:
+            f.write(b'x' * 100)
+        with open(self.path('kept'), 'wb') as f:
+            f.write(b'x' * 10)
+
+        cache = ResizedImageCache(self.directory, 1000)
+        cache._load_index()
+        self.assertEqual(list(cache._index), ['kept'])
+        self.assertEqual(cache._total_bytes, 10)
+
+
+class ResizeEndpointTests(MediaTestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        override = override_settings(LISTING_IMAGE_CACHE_DIR=cache_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        utils._resized_image_cache = None
+        self.addCleanup(setattr, utils, '_resized_image_cache', None)
+
+    def test_resize(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image(1600, 1200))
+
+        response = self.client.get(f'/api/listing-images/{listing_image.pk}/640x480.webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (640, 480))
+
+        self.assertEqual(self.client.get(f'/api/listing-images/{listing_image.pk}/641x480.webp').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/listing-images/{listing_image.pk}/640x480.gif').status_code, 404)
+
+
+class UploadHandlerTests(MediaTestCase):
+    def setUp(self):
+        self.listing = make_listing()
+        self.client = APIClient()
+        self.client.force_authenticate(self.listing.user)
+
+    def post_image(self, upload):
+        return self.client.post('/api/listing-images/', {'listing': self.listing.pk, 'image': upload})
+
+    def test_valid_image_accepted(self):
+        response = self.post_image(make_image())
+        self.assertEqual(response.status_code, 201)
+
+    def test_small_image_rejected_from_header(self):
+        with mock.patch.object(ImageProcessor, 'validate_image') as validate_image:
+            response = self.post_image(make_image(100, 100))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.json())
+        # Tam doğrulamaya hiç gelinmez
+        validate_image.assert_not_called()
+        self.assertFalse(ListingImage.objects.exists())
+
+    def test_non_image_rejected(self):
+        response = self.post_image(SimpleUploadedFile('car.jpg', b'not an image' * 100, content_type='image/jpeg'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_oversized_file_rejected(self):
+        with mock.patch.object(ImageProcessor, 'MAX_FILE_SIZE', 1024):
+            response = self.post_image(make_image())
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(ListingImage.objects.exists())
+
+
+class ChunkedUploadTests(MediaTestCase):
+    def setUp(self):
+        upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_dir, ignore_errors=True)
+        override = override_settings(LISTING_IMAGE_UPLOAD_DIR=upload_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.listing = make_listing()
+        self.client = APIClient()
+        self.client.force_authenticate(self.listing.user)
+        self.data = make_image(1600, 1200).read()
+
+    def create_upload(self, size=None):
+        response = self.client.post('/api/image-uploads/', {
+            'listing': self.listing.pk,
+            'filename': 'car.jpg',
+            'size': len(self.data) if size is None else size,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Upload-Offset'], '0')
+        return response.json()['id']
+
+    def patch_chunk(self, upload_id, offset, chunk):
+        return self.client.generic(
+            'PATCH', f'/api/image-uploads/{upload_id}/', chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_upload_in_chunks(self):
+        upload_id = self.create_upload()
+        middle = len(self.data) // 2
+
+        response = self.patch_chunk(upload_id, 0, self.data[:middle])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], str(middle))
+
+        # Eksik yükleme tamamlanamaz
+        self.assertEqual(self.client.post(f'/api/image-uploads/{upload_id}/complete/').status_code, 409)
+
+        response = self.patch_chunk(upload_id, middle, self.data[middle:])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], str(len(self.data)))
+
+        response = self.client.post(f'/api/image-uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, 201)
+        listing_image = ListingImage.objects.get()
+        self.assertEqual(listing_image.listing, self.listing)
+        self.assertEqual((listing_image.width, listing_image.height), (1600, 1200))
+
+        upload = ImageUpload.objects.get()
+        self.assertEqual(upload.status, 'completed')
+        self.assertFalse(os.path.exists(upload.temp_path))
+
+        # Tekrar complete aynı resmi döner
+        response = self.client.post(f'/api/image-uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ListingImage.objects.count(), 1)
+
+    def test_wrong_offset_conflict(self):
+        upload_id = self.create_upload()
+        self.patch_chunk(upload_id, 0, self.data[:1000])
+
+        response = self.patch_chunk(upload_id, 500, self.data[500:2000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '1000')
+        self.assertEqual(ImageUpload.objects.get().offset, 1000)
+
+    def test_chunk_past_declared_size(self):
+        upload_id = self.create_upload(size=1000)
+        response = self.patch_chunk(upload_id, 0, self.data[:2000])
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(ImageUpload.objects.get().offset, 0)
+
+    def test_missing_offset_header(self):
+        upload_id = self.create_upload()
+        response = self.client.generic(
+            'PATCH', f'/api/image-uploads/{upload_id}/', b'data',
+            content_type='application/offset+octet-stream',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_header_aborts_upload(self):
+        self.data = make_image(100, 100).read() + b'\0' * ImageProcessor.MAX_HEADER_BYTES
+        upload_id = self.create_upload()
+
+        response = self.patch_chunk(upload_id, 0, self.data)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_other_users_upload_not_found(self):
+        upload_id = self.create_upload()
+        other = User.objects.create_user(username='other', email='other@example.com', password='pass12345')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.patch_chunk(upload_id, 0, self.data[:100]).status_code, 404)
+
+
+class ShardedLayoutTests(MediaTestCase):
+    def test_shard_dir(self):
+        sha256 = 'ab' + 'c' * 62
+        self.assertEqual(ImageProcessor.shard_dir(sha256), 'ab/cc')
+        # Eski dosya adları adın özetiyle dağıtılır
+        self.assertRegex(ImageProcessor.shard_dir('old_car_name'), r'^[0-9a-f]{2}/[0-9a-f]{2}$')
+        self.assertEqual(ImageProcessor.shard_dir('old_car_name'), ImageProcessor.shard_dir('old_car_name'))
+
+    def test_is_sharded(self):
+        self.assertTrue(ImageProcessor.is_sharded('listing_images/ab/cd/file.jpg'))
+        self.assertFalse(ImageProcessor.is_sharded('listing_images/file.jpg'))
+        self.assertFalse(ImageProcessor.is_sharded('listing_images/thumbnails/file.jpg'))
+
+    def test_new_uploads_are_sharded(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image())
+        self.assertTrue(ImageProcessor.is_sharded(listing_image.image.name))
+        for path in ImageProcessor.manifest_paths(listing_image.variants):
+            self.assertTrue(ImageProcessor.is_sharded(path), path)
+
+    def test_command_moves_flat_files(self):
+        original = default_storage.save('listing_images/old_car.jpg', make_image())
+        thumbnail = default_storage.save('listing_images/thumbnails/old_car_thumbnail.jpg', make_image(320, 240))
+        ListingImage.objects.bulk_create([ListingImage(
+            listing=make_listing(),
+            image=original,
+            variants={'thumbnail': {'path': thumbnail, 'width': 320, 'height': 240, 'alternates': {}}},
+        )])
+
+        call_command('shard_media_files', stdout=io.StringIO())
+
+        listing_image = ListingImage.objects.get()
+        shard = ImageProcessor.shard_dir('old_car')
+        self.assertEqual(listing_image.image.name, f'listing_images/{shard}/old_car.jpg')
+        self.assertEqual(listing_image.variants['thumbnail']['path'], f'listing_images/{shard}/old_car_thumbnail.jpg')
+        self.assertTrue(default_storage.exists(listing_image.image.name))
+        self.assertTrue(default_storage.exists(listing_image.variants['thumbnail']['path']))
+        self.assertFalse(default_storage.exists(original))
+        self.assertFalse(default_storage.exists(thumbnail))
+
+        # Tekrar çalıştırmak bir şey değiştirmez
+        out = io.StringIO()
+        call_command('shard_media_files', stdout=out)
+        self.assertIn('0 kayıt taşındı', out.getvalue())
+
+
+class ImageGarbageCollectionTests(MediaTestCase):
+    def gc(self, *args):
+        out = io.StringIO()
+        call_command('gc_image_files', '--min-age', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_deletes_only_orphans(self):
+        listing_image = ListingImage.objects.create(listing=make_listing(), image=make_image())
+        referenced = listing_image.blob.file_paths()
+        orphan = default_storage.save('listing_images/ab/cd/orphan.jpg', make_image())
+
+        out = self.gc('--dry-run')
+        self.assertIn('DRY RUN', out)
+        self.assertTrue(default_storage.exists(orphan))
+
+        self.gc()
+        self.assertFalse(default_storage.exists(orphan))
+        for path in referenced:
+            self.assertTrue(default_storage.exists(path), path)
+
+    def test_recent_files_kept(self):
+        orphan = default_storage.save('listing_images/ab/cd/orphan.jpg', make_image())
+        call_command('gc_image_files', stdout=io.StringIO())
+        self.assertTrue(default_storage.exists(orphan))
+
+    def test_out_of_order_row_skipped_and_protected(self):
+        # Boyut yolu orijinalinden önce sıralanıyor ('thumbnails' < 'zz_car')
+        original = default_storage.save('listing_images/zz_car.jpg', make_image())
+        thumbnail = default_storage.save('listing_images/thumbnails/zz_car_thumbnail.jpg', make_image(320, 240))
+        ListingImage.objects.bulk_create([ListingImage(
+            listing=make_listing(),
+            image=original,
+            variants={'thumbnail': {'path': thumbnail, 'width': 320, 'height': 240, 'alternates': {}}},
+        )])
+        orphan = default_storage.save('listing_images/thumbnails/orphan.jpg', make_image())
+
+        out = self.gc()
+        self.assertIn(f'Atlandı (manifest yolu orijinalden önce sıralanıyor): {original}', out)
+        self.assertIn('1 kayıt atlandı', out)
+        self.assertTrue(default_storage.exists(original))
+        self.assertTrue(default_storage.exists(thumbnail))
+        self.assertFalse(default_storage.exists(orphan))
+
+    def test_unsorted_stream_aborts(self):
+        with self.assertRaises(CommandError):
+            list(ascending(iter(['b', 'a']), 'test'))
+        self.assertEqual(list(ascending(iter([('a', 1), ('b', 2)]), 'test')), [('a', 1), ('b', 2)])
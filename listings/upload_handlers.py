@@ -0,0 +1,78 @@
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import exceptions, status
+from .utils import ImageProcessor
+import logging
+
+logger = logging.getLogger("custom.listings.uploads")
+
+
+class UploadTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Yükleme boyutu çok büyük."
+    default_code = "upload_too_large"
+
+
+class ListingImageUploadHandler(FileUploadHandler):
+    """
+    Resim yüklemelerini gövde akarken kontrol eden upload handler
+
+    Django dosyanın tamamını belleğe/diske yazmadan önce:
+    - Content-Length toplam sınırı aşıyorsa hiç okumadan 413
+    - Dosya MAX_FILE_SIZE'ı geçtiği anda 413
+    - İlk KB'lardaki header'dan format ve boyut okunur, geçersizse 400
+    Asıl dosyayı bu handler saklamaz; veriyi zincirdeki sonraki handler'a
+    (Memory/TemporaryFileUploadHandler) aynen iletir.
+    """
+
+    # Multipart boundary ve form alanları için pay
+    FORM_OVERHEAD = 64 * 1024
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        max_length = (
+            ImageProcessor.MAX_FILES_PER_UPLOAD * ImageProcessor.MAX_FILE_SIZE
+            + self.FORM_OVERHEAD
+        )
+        if content_length > max_length:
+            logger.warning(f"Upload rejected before reading body: {content_length} bytes")
+            raise UploadTooLarge(
+                f"Yükleme boyutu çok büyük. Tek seferde en fazla "
+                f"{ImageProcessor.MAX_FILES_PER_UPLOAD} resim, her biri "
+                f"{ImageProcessor.MAX_FILE_SIZE // (1024*1024)}MB olabilir."
+            )
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b""
+        self.inspected = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > ImageProcessor.MAX_FILE_SIZE:
+            raise UploadTooLarge(
+                f"Dosya boyutu çok büyük. Maksimum {ImageProcessor.MAX_FILE_SIZE // (1024*1024)}MB olabilir."
+            )
+
+        if not self.inspected:
+            self.header += raw_data
+            self.inspect()
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.inspected:
+            # Dosya header sınırından kısa - elimizdeki her şeyle son deneme
+            self.inspect(final=True)
+        return None
+
+    def inspect(self, final=False):
+        try:
+            result = ImageProcessor.inspect_header(self.header)
+            if result is None and final:
+                raise ValueError("Geçerli bir resim dosyası değil.")
+        except ValueError as e:
+            logger.warning(f"Upload rejected from header: {self.file_name} - {e}")
+            raise exceptions.ValidationError({self.field_name: [str(e)]})
+
+        if result is not None:
+            self.inspected = True
+            self.header = b""
@@ -1,12 +1,19 @@
 from rest_framework import routers
 from django.urls import path, include
-from .views import ListingViewSet, ListingImageViewSet
+from .views import ListingViewSet, ListingImageViewSet, ImageUploadViewSet, listing_image_file, listing_image_resized
 
 router = routers.DefaultRouter()
 router.register(r'listings', ListingViewSet)
 router.register(r'listing-images', ListingImageViewSet)
+router.register(r'image-uploads', ImageUploadViewSet, basename='image-upload')
 
 urlpatterns = [
+    path('listing-images/<int:pk>/file/<str:size>/', listing_image_file, name='listing-image-file'),
+    path(
+        'listing-images/<int:pk>/<int:width>x<int:height>.<str:extension>',
+        listing_image_resized,
+        name='listing-image-resized',
+    ),
     path('', include(router.urls)),
 
 ]
\ No newline at end of file
@@ -1,12 +1,18 @@
 import os 
-import uuid
+import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+import numpy as np
 from PIL import Image, ImageOps
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.conf import settings
 import logging
 
-logger = logging.getLogger("custom")
+logger = logging.getLogger("custom.listings.images")
 
 class ImageProcessor:
     """
@@ -20,6 +26,12 @@ class ImageProcessor:
 
     ALLOWED_FORMATS = ['JPEG', 'PNG', 'WEBP', "JPG"]
     MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 MB
+    MIN_WIDTH, MIN_HEIGHT = 320, 240
+    # ListingImage.image upload_to ile aynı kök dizin
+    UPLOAD_DIR = "listing_images"
+    MAX_FILES_PER_UPLOAD = 10
+    # Header (boyut bilgisi) en fazla bu kadar byte içinde bulunmalı - EXIF dahil
+    MAX_HEADER_BYTES = 256 * 1024
     
     # 🆕 TEK FORMAT: 4:3 ASPECT RATIO
     ASPECT_RATIO = 4 / 3  # 1.333...
@@ -30,6 +42,40 @@ class ImageProcessor:
         "thumbnail": (320, 240),     # 4:3 format - Küçük resim
     }
 
+    # settings.LISTING_IMAGE_WIDTHS ile eklenen ara genişlikler "w<genişlik>" adını alır
+    # (ör. w640 = 640x480). Bkz. get_sizes()
+
+    # Her boyut için üretilen çıktı formatları - JPEG her zaman fallback
+    OUTPUT_FORMATS = {
+        "jpeg": {
+            "pil_format": "JPEG",
+            "extension": "jpg",
+            "content_type": "image/jpeg",
+            "options": {"quality": 85, "optimize": True},
+        },
+        "webp": {
+            "pil_format": "WEBP",
+            "extension": "webp",
+            "content_type": "image/webp",
+            "options": {"quality": 80, "method": 4},
+        },
+        "avif": {
+            "pil_format": "AVIF",
+            "extension": "avif",
+            "content_type": "image/avif",
+            "options": {"quality": 60},
+        },
+    }
+    FALLBACK_FORMAT = "jpeg"
+
+    # LQIP: liste yanıtlarına gömülen küçük placeholder (16x12 ≈ 130 byte WebP)
+    PLACEHOLDER_SIZE = (16, 12)
+    PLACEHOLDER_QUALITY = 40
+    # Baskın renk kovaları: kanal başına 8 - 5 = 3 bit (32 değerlik aralıklar)
+    DOMINANT_COLOR_SHIFT = 5
+    # Accept header'ında eşit q değerinde tercih sırası (küçükten büyüğe dosya)
+    FORMAT_PREFERENCE = ["avif", "webp", "jpeg"]
+
     @staticmethod
     def validate_image(image_file):
         try:
@@ -49,8 +95,7 @@ class ImageProcessor:
                 if image.format not in ImageProcessor.ALLOWED_FORMATS:
                     raise ValueError(f"Desteklenmeyen format. Sadece {', '.join(ImageProcessor.ALLOWED_FORMATS)} desteklenir.")
                 
-                if image.size[0] < 320 or image.size[1] < 240:
-                    raise ValueError("Resim boyutu çok küçük. En az 320x240 piksel olmalıdır.")
+                ImageProcessor.check_dimensions(*image.size)
             
             # Dosya pozisyonunu geri yükle
             if hasattr(image_file, 'seek'):
@@ -69,11 +114,93 @@ class ImageProcessor:
             raise ValueError(f"Resim doğrulama hatası: {e}")
         
     @staticmethod
-    def generate_filename(original_name):
-        name, ext = os.path.splitext(original_name)
-        unique_id = uuid.uuid4().hex[:8]
-        clean_name = name.replace(" ", "_").replace("-", "_").replace("ş", "s").replace("ğ", "g").replace("ı", "i").replace("ü", "u").replace("ö", "o").replace("ç", "c")
-        return f"{clean_name}_{unique_id}{ext.lower()}"
+    def check_dimensions(width, height):
+        if width < ImageProcessor.MIN_WIDTH or height < ImageProcessor.MIN_HEIGHT:
+            raise ValueError(
+                f"Resim boyutu çok küçük. En az {ImageProcessor.MIN_WIDTH}x{ImageProcessor.MIN_HEIGHT} piksel olmalıdır."
+            )
+
+    @staticmethod
+    def inspect_header(data):
+        """
+        Dosyanın ilk byte'larından format ve boyutları oku - piksel decode edilmez.
+
+        Header henüz tamamlanmadıysa None döner (daha fazla veri gerekir).
+        Format desteklenmiyorsa veya resim çok küçükse ValueError.
+        """
+        try:
+            with Image.open(BytesIO(data)) as image:
+                image_format, (width, height) = image.format, image.size
+        except Image.DecompressionBombError:
+            raise ValueError("Resim çözünürlüğü çok büyük.")
+        except Exception:
+            if len(data) >= ImageProcessor.MAX_HEADER_BYTES:
+                raise ValueError("Geçerli bir resim dosyası değil.")
+            return None
+
+        if image_format not in ImageProcessor.ALLOWED_FORMATS:
+            raise ValueError(f"Desteklenmeyen format. Sadece {', '.join(ImageProcessor.ALLOWED_FORMATS)} desteklenir.")
+        ImageProcessor.check_dimensions(width, height)
+        return image_format, width, height
+
+    @staticmethod
+    def compute_hash(image_file):
+        """
+        Dosyanın SHA-256 özeti - chunk chunk okunur, dosya belleğe alınmaz
+        """
+        digest = hashlib.sha256()
+        for chunk in image_file.chunks():
+            digest.update(chunk)
+        if hasattr(image_file, 'seek'):
+            image_file.seek(0)
+        return digest.hexdigest()
+
+    @staticmethod
+    def shard_dir(key):
+        """
+        Dosyaların dağıtılacağı alt dizin: <ab>/<cd>/
+        Anahtar içerik özeti (sha256) ise ilk 4 karakteri, değilse (eski dosya
+        adları) adın özetinin ilk 4 karakteri kullanılır. 65536 dizine bölünür.
+        """
+        if len(key) != 64 or any(c not in "0123456789abcdef" for c in key):
+            key = hashlib.sha256(key.encode()).hexdigest()
+        return f"{key[:2]}/{key[2:4]}"
+
+    @staticmethod
+    def sharded_path(path, key):
+        """Mevcut bir yolu (düz veya sharded) anahtarın dizinine taşınmış haliyle döndür"""
+        return f"{ImageProcessor.UPLOAD_DIR}/{ImageProcessor.shard_dir(key)}/{os.path.basename(path)}"
+
+    @staticmethod
+    def is_sharded(path):
+        parts = path.split("/")
+        return len(parts) == 4 and parts[0] == ImageProcessor.UPLOAD_DIR and len(parts[1]) == len(parts[2]) == 2
+
+    @staticmethod
+    def content_filename(content_hash, original_name):
+        """
+        İçerik adresli dosya adı: <ab>/<cd>/<sha256>.<uzantı>
+        Aynı byte'lar her zaman aynı ada gider; upload_to ile birleşince
+        listing_images/<ab>/<cd>/ altına düşer.
+        """
+        ext = os.path.splitext(original_name)[1].lower()
+        return f"{ImageProcessor.shard_dir(content_hash)}/{content_hash}{ext}"
+
+    @staticmethod
+    def manifest_paths(variants):
+        """Manifestteki tüm dosya yolları (tüm boyutlar ve formatlar)"""
+        for variant in (variants or {}).values():
+            yield variant["path"]
+            for alternate in variant.get("alternates", {}).values():
+                yield alternate["path"]
+
+    @staticmethod
+    def delete_files(paths):
+        for path in paths:
+            try:
+                default_storage.delete(path)
+            except Exception as e:
+                logger.warning(f"Dosya silinemedi: {path} Hata: {e}")
     
     @staticmethod
     def fit_to_4_3(image, target_size):
@@ -116,33 +243,193 @@ class ImageProcessor:
         return final_image
 
     @staticmethod
-    def process_image(image_file, size_name="original"):
+    def get_sizes():
+        """
+        Oluşturulacak tüm boyutlar: SIZES + settings.LISTING_IMAGE_WIDTHS merdiveni.
+        Merdivendeki genişlik SIZES'ta zaten varsa (320, 1200) tekrar üretilmez.
+        """
+        sizes = dict(ImageProcessor.SIZES)
+        known_widths = {width for width, height in sizes.values()}
+        for width in getattr(settings, 'LISTING_IMAGE_WIDTHS', []):
+            if width not in known_widths:
+                sizes[f"w{width}"] = (width, round(width / ImageProcessor.ASPECT_RATIO))
+                known_widths.add(width)
+        return sizes
+
+    @staticmethod
+    def available_formats():
+        """
+        Kurulu Pillow'un yazabildiği çıktı formatları, fallback (JPEG) en başta.
+        AVIF sadece Pillow AVIF encoder'ı ile derlenmişse listede olur.
+        """
+        Image.init()
+        return [
+            fmt for fmt, spec in ImageProcessor.OUTPUT_FORMATS.items()
+            if fmt == ImageProcessor.FALLBACK_FORMAT or spec["pil_format"] in Image.SAVE
+        ]
+
+    @staticmethod
+    def negotiate_format(accept_header, available):
+        """
+        Accept header'ına göre available içinden en uygun formatı seç.
+        q değeri en yüksek olan, eşitlikte FORMAT_PREFERENCE sırası kazanır.
+        Hiçbiri kabul edilmiyorsa fallback format döner.
+        """
+        accepted = {}
+        for part in (accept_header or "").split(","):
+            media_type, _, params = part.strip().partition(";")
+            quality = 1.0
+            for param in params.split(";"):
+                key, _, value = param.strip().partition("=")
+                if key == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            accepted[media_type.strip().lower()] = quality
+
+        def quality_of(fmt):
+            content_type = ImageProcessor.OUTPUT_FORMATS[fmt]["content_type"]
+            for media_type in (content_type, "image/*", "*/*"):
+                if media_type in accepted:
+                    return accepted[media_type]
+            return 0.0
+
+        candidates = [fmt for fmt in ImageProcessor.FORMAT_PREFERENCE if fmt in available]
+        best = max(candidates, key=quality_of, default=None)  # max eşitlikte ilkini döndürür
+        if best is None or quality_of(best) <= 0:
+            return ImageProcessor.FALLBACK_FORMAT
+        return best
+
+    @staticmethod
+    def open_image(image_file, draft_size=None):
+        """
+        Resmi bir kez decode et: EXIF rotasyonu düzeltilir, RGB'ye çevrilir.
+        draft_size verilirse JPEG'ler bu boyuttan küçük olmayacak şekilde
+        düşük ölçekte decode edilir (küçük çıktılar için çok daha hızlı).
+        """
+        if hasattr(image_file, 'seek'):
+            image_file.seek(0)
+        image = Image.open(image_file)
+        if draft_size:
+            # EXIF ile 90° dönebilir - iki kenar da en uzun hedef kenardan küçük olmasın
+            longest = max(draft_size)
+            image.draft("RGB", (longest, longest))
+        image = ImageOps.exif_transpose(image)  # EXIF rotation fix
+        
+        # RGBA/P/CMYK formatlarını RGB'ye çevir
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image
+
+    @staticmethod
+    def encode_image(image, fmt="jpeg"):
+        """
+        İşlenmiş resmi istenen formatta ContentFile olarak döndür
+        """
+        spec = ImageProcessor.OUTPUT_FORMATS.get(fmt)
+        if not spec:
+            raise ValueError(f"Geçersiz format: {fmt}")
+
+        output = BytesIO()
+        image.save(output, format=spec["pil_format"], **spec["options"])
+        return ContentFile(output.getvalue())
+
+    @staticmethod
+    def create_placeholder(image_file):
+        """
+        Küçük inline placeholder (data URI) ve baskın renk (#rrggbb) üret.
+
+        JPEG'lerde draft() ile 1/8 ölçekte decode edilir, tam decode yapılmaz.
+        Baskın renk 64px'e küçültülmüş resim üzerinde NumPy ile bulunur: her
+        kanal 8 kademeye indirilir (512 kova), en kalabalık kovadaki gerçek
+        piksellerin ortalaması alınır.
+        """
+        if hasattr(image_file, 'seek'):
+            image_file.seek(0)
+        with Image.open(image_file) as source:
+            source.draft("RGB", (160, 120))
+            image = ImageOps.exif_transpose(source).convert("RGB")
+        image.thumbnail((64, 64))
+
+        red, green, blue = ImageProcessor.dominant_color(image)
+        dominant_color = f"#{red:02x}{green:02x}{blue:02x}"
+
+        # WebP, aynı boyuttaki JPEG'in yaklaşık üçte biri (header'lar küçük)
+        fmt = "webp" if "webp" in ImageProcessor.available_formats() else ImageProcessor.FALLBACK_FORMAT
+        spec = ImageProcessor.OUTPUT_FORMATS[fmt]
+        output = BytesIO()
+        ImageProcessor.fit_to_4_3(image, ImageProcessor.PLACEHOLDER_SIZE).save(
+            output, format=spec["pil_format"], quality=ImageProcessor.PLACEHOLDER_QUALITY
+        )
+        placeholder = f"data:{spec['content_type']};base64,{base64.b64encode(output.getvalue()).decode('ascii')}"
+
+        return placeholder, dominant_color
+
+    @staticmethod
+    def dominant_color(image):
+        """RGB resmin baskın rengi (r, g, b) - döngüsüz, tüm pikseller tek seferde"""
+        pixels = np.asarray(image, dtype=np.uint8).reshape(-1, 3)
+        levels = (pixels >> ImageProcessor.DOMINANT_COLOR_SHIFT).astype(np.uint16)
+        bits = 8 - ImageProcessor.DOMINANT_COLOR_SHIFT
+        buckets = (levels[:, 0] << (2 * bits)) | (levels[:, 1] << bits) | levels[:, 2]
+        top = np.bincount(buckets, minlength=1 << (3 * bits)).argmax()
+        return tuple(int(c) for c in pixels[buckets == top].mean(axis=0).round())
+
+    @staticmethod
+    def on_demand_sizes():
+        """settings.LISTING_IMAGE_ON_DEMAND_SIZES izin listesi: {(genişlik, yükseklik)}"""
+        sizes = set()
+        for size in getattr(settings, 'LISTING_IMAGE_ON_DEMAND_SIZES', []):
+            width, _, height = size.partition("x")
+            sizes.add((int(width), int(height)))
+        return sizes
+
+    @staticmethod
+    def format_for_extension(extension):
+        """Dosya uzantısından çıktı formatı (jpg/jpeg -> jpeg)"""
+        extension = extension.lower()
+        if extension == "jpeg":
+            extension = "jpg"
+        for fmt, spec in ImageProcessor.OUTPUT_FORMATS.items():
+            if spec["extension"] == extension:
+                return fmt
+        return None
+
+    @staticmethod
+    def render_size(image_file, target_size, fmt="jpeg"):
+        """
+        Orijinalden istenen boyutu fit_to_4_3 ile üret, encode edilmiş byte döndür
+        """
+        image = ImageProcessor.open_image(image_file, draft_size=target_size)
+        processed_image = ImageProcessor.fit_to_4_3(image, target_size)
+        return ImageProcessor.encode_image(processed_image, fmt).read()
+
+    @staticmethod
+    def variant_path(clean_base_name, size_name, fmt="jpeg"):
+        """
+        Tüm boyutlar kaynak dosyanın yanına yazılır: <ab>/<cd>/<isim>_<boyut>.<uzantı>
+        Böylece bir dosyanın bütün türevleri aynı dizinde ve aynı önekle gruplanır.
+        """
+        extension = ImageProcessor.OUTPUT_FORMATS[fmt]["extension"]
+        return ImageProcessor.sharded_path(f"{clean_base_name}_{size_name}.{extension}", clean_base_name)
+
+    @staticmethod
+    def process_image(image_file, size_name="original", fmt="jpeg"):
         """
         Resmi işle ve 4:3 formatına uyarla
         """
         try:
-            image = Image.open(image_file)
-            image = ImageOps.exif_transpose(image)  # EXIF rotation fix
-            
-            # RGBA/P formatlarını RGB'ye çevir
-            if image.mode in ("RGBA", "P"):
-                image = image.convert("RGB")
+            image = ImageProcessor.open_image(image_file)
 
             # Hedef boyutu al
-            target_size = ImageProcessor.SIZES.get(size_name)
+            target_size = ImageProcessor.get_sizes().get(size_name)
             if not target_size:
                 raise ValueError(f"Geçersiz boyut: {size_name}")
             
             # 4:3 formatına uyarla
             processed_image = ImageProcessor.fit_to_4_3(image, target_size)
-            
-            # BytesIO'ya kaydet
-            from io import BytesIO
-            output = BytesIO()
-            processed_image.save(output, format="JPEG", quality=85, optimize=True)
-            output.seek(0)
-
-            return ContentFile(output.getvalue())
+            return ImageProcessor.encode_image(processed_image, fmt)
             
         except Exception as e:
             logger.error(f"Resim işleme hatası: {e}")
@@ -150,34 +437,230 @@ class ImageProcessor:
         
     @staticmethod
     def create_thumbnails(image_file, filename_base):
+        """
+        Tüm boyutları tüm formatlarda oluşturup storage'a kaydet.
+        Kaynak resim bir kez decode edilir, her boyut bir kez resize edilir.
+
+        Dönen değer ListingImage.variants alanına yazılan manifesttir:
+        {boyut adı: {"path", "width", "height", "bytes", "format",
+                     "alternates": {format: {"path", "bytes"}}}}
+        Ana kayıt JPEG fallback'tir, WebP/AVIF alternates altındadır.
+        """
         thumbnails = {}
         base_name, extension = os.path.splitext(filename_base)
         
         # Dosya adından sadece filename kısmını al (path'ı kaldır)
         clean_base_name = os.path.basename(base_name)
+
+        try:
+            source_image = ImageProcessor.open_image(image_file)
+        except Exception as e:
+            logger.error(f"Resim açma hatası: {e}")
+            return thumbnails
+
+        formats = ImageProcessor.available_formats()
         
-        for size_name, dimensions in ImageProcessor.SIZES.items():
+        for size_name, dimensions in ImageProcessor.get_sizes().items():
             try:
-                processed_image = ImageProcessor.process_image(image_file, size_name)
-                if size_name == "original":
-                    # ✅ Orijinal resim ana dizine
-                    file_path = default_storage.save(
-                        f"listing_images/{clean_base_name}.jpg",
-                        processed_image
-                    )
-                else:
-                    # Thumbnail'lar alt dizine - sadece clean filename kullan
-                    file_path = default_storage.save(
-                        f"listing_images/thumbnails/{clean_base_name}_{size_name}.jpg",
-                        processed_image
-                    )
+                processed_image = ImageProcessor.fit_to_4_3(source_image, dimensions)
+                encoded = ImageProcessor.encode_image(processed_image, ImageProcessor.FALLBACK_FORMAT)
+                file_path = default_storage.save(
+                    ImageProcessor.variant_path(clean_base_name, size_name, ImageProcessor.FALLBACK_FORMAT),
+                    encoded
+                )
+                entry = {
+                    "path": file_path,
+                    "width": dimensions[0],
+                    "height": dimensions[1],
+                    "bytes": encoded.size,
+                    "format": ImageProcessor.FALLBACK_FORMAT,
+                    "alternates": {},
+                }
+
+                for fmt in formats:
+                    if fmt == ImageProcessor.FALLBACK_FORMAT:
+                        continue
+                    try:
+                        encoded = ImageProcessor.encode_image(processed_image, fmt)
+                        entry["alternates"][fmt] = {
+                            "path": default_storage.save(
+                                ImageProcessor.variant_path(clean_base_name, size_name, fmt),
+                                encoded
+                            ),
+                            "bytes": encoded.size,
+                        }
+                    except Exception as e:
+                        # Alternatif format olmazsa JPEG ile devam
+                        logger.warning(f"{fmt} oluşturulamadı ({size_name}): {e}")
                 
-                thumbnails[size_name] = file_path
-                logger.info(f"4:3 Resim oluşturuldu: {size_name} ({ImageProcessor.SIZES[size_name][0]}x{ImageProcessor.SIZES[size_name][1]}) - {file_path}")
+                thumbnails[size_name] = entry
+                logger.info(f"4:3 Resim oluşturuldu: {size_name} ({dimensions[0]}x{dimensions[1]}) - {file_path} (+{', '.join(entry['alternates']) or '-'})")
                 
             except Exception as e:
                 logger.error(f"Resim oluşturma hatası ({size_name}): {e}")
                 
         return thumbnails
     
-    
+
+class ResizedImageCache:
+    """
+    On-demand boyutlandırılan resimler için byte bütçeli LRU disk cache.
+
+    - get_or_render(): dosya cache'te varsa yolunu döndürür, yoksa render eder
+    - Aynı anahtar için eşzamanlı ilk istekler tek render'ı bekler (single-flight)
+    - Toplam boyut max_bytes'ı aşınca en uzun süredir kullanılmayan dosyalar
+      index'ten çıkarılır; diskten ancak eviction_grace saniye sonra silinir
+
+    Yanıt X-Accel-Redirect/X-Sendfile ile dönerken dosyayı web sunucusu
+    view döndükten sonra açar - hemen silinen dosya o istekte 404 olurdu.
+    Bekleme süresinde tekrar istenen dosya index'e geri alınır; başka bir
+    process'in dokunduğu (mtime'ı yenilenen) dosya silinmez.
+
+    Index process başına tutulur ve ilk kullanımda diskteki dosyalardan
+    (erişim zamanına göre) kurulur. Dosyalar geçici isimle yazılıp os.replace
+    ile yerine konduğu için farklı process'ler yarım dosya görmez.
+    """
+
+    TEMP_SUFFIX = ".tmp"
+
+    def __init__(self, directory, max_bytes, eviction_grace=60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.eviction_grace = eviction_grace
+        self._evicted = OrderedDict()  # key -> (index'ten çıktığı an, byte), en eski başta
+        self._index = OrderedDict()  # key -> byte, en eski kullanılan başta
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Lock
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key)
+
+    def _load_index(self):
+        if self._loaded:
+            return
+        entries = []
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(self.TEMP_SUFFIX):
+                    continue  # Yarım kalmış yazma - cache'in parçası değil
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, os.path.relpath(path, self.directory), stat.st_size))
+        for atime, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def _touch(self, key):
+        """Cache hit - LRU sırasında sona al. Dosya başka process'te silindiyse False"""
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            self._total_bytes -= self._index.pop(key, 0)
+            return False
+        self._index.move_to_end(key)
+        try:
+            os.utime(path)  # Restart sonrası LRU sırası için erişim zamanı
+        except OSError:
+            pass
+        return True
+
+    def _restore(self, key):
+        """Bekleme süresindeki dosya tekrar istendi - silmeden index'e geri al"""
+        evicted_at, size = self._evicted.pop(key)
+        self._index[key] = size
+        self._total_bytes += size
+        return self._touch(key)
+
+    def _evict(self):
+        now = time.time()
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self._evicted[key] = (now, size)
+        self._purge_evicted(now)
+
+    def _purge_evicted(self, now):
+        while self._evicted:
+            key, (evicted_at, size) = next(iter(self._evicted.items()))
+            if now - evicted_at < self.eviction_grace:
+                break
+            del self._evicted[key]
+            path = self.path_for(key)
+            try:
+                if os.path.getmtime(path) > evicted_at:
+                    continue  # Başka process bu arada sundu - onun index'inde
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            logger.info(f"[ResizedImageCache] Silindi (LRU): {key}")
+
+    def get_or_render(self, key, render):
+        """
+        key için cache'teki dosya yolunu döndür; yoksa render() ile üret.
+        render() byte döndürmelidir.
+        """
+        with self._lock:
+            self._load_index()
+            if key in self._evicted and self._restore(key):
+                return self.path_for(key)
+            if key in self._index and self._touch(key):
+                return self.path_for(key)
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # Biz beklerken başka bir thread render etmiş olabilir
+                if key in self._evicted and self._restore(key):
+                    return self.path_for(key)
+                if key in self._index and self._touch(key):
+                    return self.path_for(key)
+
+            try:
+                data = render()
+                path = self.path_for(key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}{self.TEMP_SUFFIX}"
+                try:
+                    with open(temp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    # Disk dolu vb. - yarım dosya geride kalmasın
+                    try:
+                        os.remove(temp_path)
+                    except FileNotFoundError:
+                        pass
+                    raise
+
+                with self._lock:
+                    self._evicted.pop(key, None)
+                    self._total_bytes += len(data) - self._index.pop(key, 0)
+                    self._index[key] = len(data)
+                    self._evict()
+                return path
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+
+_resized_image_cache = None
+_resized_image_cache_lock = threading.Lock()
+
+
+def get_resized_image_cache():
+    """settings'e göre process başına tek ResizedImageCache"""
+    global _resized_image_cache
+    with _resized_image_cache_lock:
+        if _resized_image_cache is None:
+            _resized_image_cache = ResizedImageCache(
+                settings.LISTING_IMAGE_CACHE_DIR,
+                settings.LISTING_IMAGE_CACHE_MAX_BYTES,
+                settings.LISTING_IMAGE_CACHE_EVICTION_GRACE_SECONDS,
+            )
+        return _resized_image_cache
+
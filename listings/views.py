@@ -1,22 +1,33 @@
-from django.shortcuts import render
-from rest_framework import viewsets, permissions, status
+import os
+from django.conf import settings
+from django.shortcuts import render, get_object_or_404
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import Http404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_GET
+from rest_framework import viewsets, permissions, status, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from .models import Listing, ListingImage
+from .models import Listing, ListingImage, ImageUpload
 from .serializers import (
     ListingSerializer,
     CreateListingSerializer,
     UpdateListingSerializer,
     ListingImageSerializer,
-    BulkImageUploadSerializer
+    BulkImageUploadSerializer,
+    ImageUploadSerializer,
     )
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db import transaction
 from rest_framework import exceptions 
 from .permissions import IsOwnerOrReadOnly
-from core.throttles import ListingCreateThrottle
+from core.throttles import ListingCreateThrottle, ListingSearchThrottle
+from core.sendfile import sendfile
 from .filters import ListingsFilter
+from .utils import ImageProcessor, get_resized_image_cache
+from .upload_handlers import ListingImageUploadHandler
 from django.db.models import Q
 from functools import reduce
 import operator
@@ -131,6 +142,8 @@ class ListingViewSet(viewsets.ModelViewSet):
     def get_throttles(self):
         if self.action == "create":
             return [ListingCreateThrottle()]
+        if self.action == "list":
+            return [ListingSearchThrottle()]
         return super().get_throttles()
 
 class ListingImageViewSet(viewsets.ModelViewSet):
@@ -144,6 +157,13 @@ class ListingImageViewSet(viewsets.ModelViewSet):
         if listing_id:
             queryset = queryset.filter(listing_id=listing_id)
         return queryset.order_by("order", "uploaded_at")
+
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        # Yükleme endpoint'lerinde gövde okunurken erken kontrol (413/400)
+        if self.action in ("create", "bulk_upload"):
+            request.upload_handlers.insert(0, ListingImageUploadHandler(request))
+        return drf_request
     
     def perform_create(self, serializer):
         listing = serializer.validated_data["listing"]
@@ -268,3 +288,237 @@ class ListingImageViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ImageUploadViewSet(mixins.CreateModelMixin,
+                         mixins.RetrieveModelMixin,
+                         mixins.DestroyModelMixin,
+                         viewsets.GenericViewSet):
+    """
+    Parça parça (resumable) resim yükleme
+
+    POST   /api/image-uploads/                 {listing, filename, size} -> yükleme aç
+    PATCH  /api/image-uploads/{id}/            Upload-Offset header + ham byte'lar -> parça ekle
+    HEAD   /api/image-uploads/{id}/            Upload-Offset -> kaldığı yeri öğren
+    POST   /api/image-uploads/{id}/complete/   -> ListingImage oluştur
+    DELETE /api/image-uploads/{id}/            -> iptal
+    """
+    serializer_class = ImageUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(user=self.request.user)
+
+    def offset_headers(self, upload):
+        return {
+            "Upload-Offset": str(upload.offset),
+            "Upload-Length": str(upload.size),
+            "Cache-Control": "no-store",
+        }
+
+    def perform_create(self, serializer):
+        upload = serializer.save(user=self.request.user)
+        os.makedirs(settings.LISTING_IMAGE_UPLOAD_DIR, exist_ok=True)
+        open(upload.temp_path, 'wb').close()
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response["Location"] = f"{request.path}{response.data['id']}/"
+        response["Upload-Offset"] = "0"
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        upload = self.get_object()
+        return Response(self.get_serializer(upload).data, headers=self.offset_headers(upload))
+
+    def check_chunk(self, upload, client_offset, length):
+        """Parça bu yüklemeye eklenebilir mi - eklenemiyorsa hata yanıtı"""
+        if upload.status != 'pending':
+            return Response({
+                "success": False,
+                "error": "Yükleme zaten tamamlandı."
+            }, status=status.HTTP_409_CONFLICT)
+        # İstemci farklı bir yerden devam etmek istiyor - doğru offset'i bildir
+        if client_offset != upload.offset:
+            return Response({
+                "success": False,
+                "error": "Upload-Offset uyuşmuyor.",
+                "offset": upload.offset,
+            }, status=status.HTTP_409_CONFLICT, headers=self.offset_headers(upload))
+        if upload.offset + length > upload.size:
+            return Response({
+                "success": False,
+                "error": "Parça, bildirilen dosya boyutunu aşıyor."
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, headers=self.offset_headers(upload))
+        return None
+
+    def partial_update(self, request, *args, **kwargs):
+        try:
+            client_offset = int(request.headers.get("Upload-Offset", ""))
+            length = int(request.headers.get("Content-Length") or 0)
+        except ValueError:
+            return Response({
+                "success": False,
+                "error": "Upload-Offset header is required."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Ucuz ön kontrol (kilitsiz) - yanlış offset'le gelen gövdeyi hiç okuma
+        rejection = self.check_chunk(self.get_object(), client_offset, length)
+        if rejection:
+            return rejection
+
+        # Gövde kilit dışında okunur; yavaş istemci satır kilidini tutmaz
+        spool, received = ImageUpload.spool_chunk(request.stream, length)
+        with spool:
+            with transaction.atomic():
+                upload = self.get_queryset().select_for_update().filter(pk=kwargs["pk"]).first()
+                if not upload:
+                    raise Http404
+                # Okuma sırasında başka bir istek parça eklemiş olabilir - tekrar kontrol
+                rejection = self.check_chunk(upload, client_offset, received)
+                if rejection:
+                    return rejection
+
+                previous_offset = upload.offset
+                upload.offset += upload.append_chunk(spool, received) if received else 0
+                upload.save(update_fields=["offset", "updated_at"])
+
+        # Header alındığı anda format/boyut kontrolü - kalan parçaları beklemeden reddet
+        header_length = min(upload.size, ImageProcessor.MAX_HEADER_BYTES)
+        if previous_offset < header_length <= upload.offset:
+            with open(upload.temp_path, 'rb') as f:
+                header = f.read(header_length)
+            try:
+                if ImageProcessor.inspect_header(header) is None:
+                    raise ValueError("Geçerli bir resim dosyası değil.")
+            except ValueError as e:
+                upload.delete_temp_file()
+                upload.delete()
+                return Response({
+                    "success": False,
+                    "error": str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=self.offset_headers(upload))
+
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        """
+        Tüm parçalar geldiyse dosyayı normal resim akışına ver
+        POST /api/image-uploads/{id}/complete/
+        """
+        self.get_object()
+        try:
+            with transaction.atomic():
+                # Aynı anda gelen iki complete'ten yalnızca biri resim oluşturur;
+                # durum kilit alındıktan sonra yeniden okunur
+                upload = self.get_queryset().select_for_update().get(pk=pk)
+                if upload.status == 'completed' and upload.listing_image:
+                    return Response({
+                        "success": True,
+                        "image": ListingImageSerializer(upload.listing_image, context={"request": request}).data
+                    })
+                if not upload.is_complete:
+                    return Response({
+                        "success": False,
+                        "error": "Yükleme henüz tamamlanmadı.",
+                        "offset": upload.offset,
+                    }, status=status.HTTP_409_CONFLICT, headers=self.offset_headers(upload))
+
+                with open(upload.temp_path, 'rb') as f:
+                    listing_image = ListingImage.objects.create(
+                        listing=upload.listing,
+                        image=File(f, name=upload.filename),
+                    )
+                upload.status = 'completed'
+                upload.listing_image = listing_image
+                upload.save(update_fields=["status", "listing_image", "updated_at"])
+        except Exception as e:
+            return Response({
+                "success": False,
+                "error": f'Resim yükleme hatası: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        upload.delete_temp_file()
+
+        return Response({
+            "success": True,
+            "image": ListingImageSerializer(listing_image, context={"request": request}).data
+        }, status=status.HTTP_201_CREATED)
+
+    def perform_destroy(self, instance):
+        instance.delete_temp_file()
+        instance.delete()
+
+
+def patch_image_cache_control(response, listing_image, max_age):
+    """Yayındaki ilanın resmi paylaşılan cache'lere girebilir; sahibine/staff'a özel olan giremez"""
+    listing = listing_image.listing
+    if listing.is_active and not listing.is_deleted:
+        patch_cache_control(response, public=True, max_age=max_age)
+    else:
+        patch_cache_control(response, private=True, max_age=0)
+
+
+@require_GET
+def listing_image_file(request, pk, size):
+    """
+    Accept header'ına göre en uygun formattaki (AVIF/WebP/JPEG) resmi döndür
+    GET /api/listing-images/{id}/file/{size}/
+    """
+    listing_image = get_object_or_404(
+        ListingImage.objects.visible_to(request.user).select_related('listing')
+        .only('id', 'variants', 'listing__is_active', 'listing__is_deleted'), pk=pk
+    )
+
+    choice = listing_image.negotiate_variant(size, request.META.get('HTTP_ACCEPT', ''))
+    if not choice or not choice[0]:
+        raise Http404("Bu boyutta resim bulunamadı.")
+    path, fmt = choice
+
+    response = sendfile(request, default_storage.path(path), ImageProcessor.OUTPUT_FORMATS[fmt]['content_type'])
+    # Aynı URL formatı Accept'e göre değiştiriyor - cache'ler buna göre ayırmalı
+    patch_vary_headers(response, ['Accept'])
+    patch_image_cache_control(response, listing_image, 86400)
+    return response
+
+
+@require_GET
+def listing_image_resized(request, pk, width, height, extension):
+    """
+    İzin listesindeki bir boyutu ilk istekte orijinalden üret,
+    sonraki isteklerde LRU disk cache'ten sun
+    GET /api/listing-images/{id}/{genişlik}x{yükseklik}.{jpg|webp|avif}
+    """
+    if (width, height) not in ImageProcessor.on_demand_sizes():
+        raise Http404("Bu boyut desteklenmiyor.")
+
+    fmt = ImageProcessor.format_for_extension(extension)
+    if fmt not in ImageProcessor.available_formats():
+        raise Http404("Bu format desteklenmiyor.")
+
+    listing_image = get_object_or_404(
+        ListingImage.objects.visible_to(request.user).select_related('blob', 'listing'), pk=pk
+    )
+    if not listing_image.image:
+        raise Http404("Resim dosyası bulunamadı.")
+
+    # Blob'lu resimlerde anahtar içerik özeti - aynı içerik tüm ilanlarda tek kez render edilir
+    if listing_image.blob_id:
+        content_hash = listing_image.blob.sha256
+        source_key = f"{content_hash[:2]}/{content_hash}"
+    else:
+        source_key = f"legacy/{listing_image.pk}"
+    cache_key = f"{source_key}/{width}x{height}.{ImageProcessor.OUTPUT_FORMATS[fmt]['extension']}"
+
+    def render():
+        with listing_image.image.open('rb') as image_file:
+            return ImageProcessor.render_size(image_file, (width, height), fmt)
+
+    try:
+        path = get_resized_image_cache().get_or_render(cache_key, render)
+    except FileNotFoundError:
+        raise Http404("Resim dosyası bulunamadı.")
+
+    response = sendfile(request, path, ImageProcessor.OUTPUT_FORMATS[fmt]['content_type'])
+    patch_image_cache_control(response, listing_image, 604800)
+    return response
+
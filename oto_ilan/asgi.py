@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Mesaj olayları (SSE, /api/messages/events/) uzun süre açık kalan bağlantılardır;
+worker thread tutmamaları için uygulama bir ASGI sunucusuyla çalıştırılmalı:
+    uvicorn oto_ilan.asgi:application
 """
 
 import os
@@ -151,9 +151,62 @@ AUTH_USER_MODEL = 'users.User'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# İlan resimleri için 4:3 genişlik merdiveni (srcset)
+# 320 ve 1200 zaten thumbnail ve original boyutları
+LISTING_IMAGE_WIDTHS = [320, 480, 640, 960, 1200]
+# Liste kartında kullanılacak en küçük genişlik (320px kart x 2 retina)
+LISTING_CARD_IMAGE_WIDTH = 640
+
+# On-demand boyutlandırma: sadece bu boyutlar üretilir (kötüye kullanıma karşı)
+LISTING_IMAGE_ON_DEMAND_SIZES = [
+    "160x120", "320x240", "480x360", "640x480", "800x600", "960x720", "1200x900",
+]
+# Üretilen boyutların LRU disk cache'i ve byte bütçesi
+LISTING_IMAGE_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'listing_images')
+LISTING_IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+# LRU'dan düşen dosya, X-Accel-Redirect ile sunulmakta olabilir - bu kadar saniye sonra silinir
+LISTING_IMAGE_CACHE_EVICTION_GRACE_SECONDS = 60
+
+# Parça parça (resumable) yüklemelerin geçici dosyaları ve yaşam süresi
+LISTING_IMAGE_UPLOAD_DIR = os.path.join(BASE_DIR, 'tmp', 'uploads')
+LISTING_IMAGE_UPLOAD_EXPIRY_HOURS = 24
+
+# Medya transferini front sunucuya devretme (core.sendfile)
+# None: Python'dan gönder (lokal) | 'nginx': X-Accel-Redirect | 'xsendfile': X-Sendfile
+SENDFILE_BACKEND = os.environ.get('SENDFILE_BACKEND') or None
+# nginx için: dosya kökü -> internal location (location /protected/media/ { internal; alias ...; })
+SENDFILE_LOCATIONS = {
+    MEDIA_ROOT: '/protected/media/',
+    LISTING_IMAGE_CACHE_DIR: '/protected/listing-image-cache/',
+}
+MEDIA_CACHE_MAX_AGE = 86400
+
+# Anlık mesaj olayları (SSE) için pub/sub backend'i
+# Tek node: InMemoryBroker | Birden fazla node: RedisBroker
+MESSAGE_EVENTS_BACKEND = os.environ.get('MESSAGE_EVENTS_BACKEND', 'private_messages.events.InMemoryBroker')
+MESSAGE_EVENTS_REDIS_URL = os.environ.get('MESSAGE_EVENTS_REDIS_URL', 'redis://localhost:6379/0')
+
+# Önbellek - birden fazla süreçte invalidation için paylaşılan bir backend verilmeli
+# (ör. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache, CACHE_LOCATION=redis://...)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+# Dashboard istatistikleri (users.utils.get_dashboard_stats) - sinyallerle silinir, bu süre üst sınır
+DASHBOARD_STATS_CACHE_SECONDS = 300
+
+# Rate limit durumu (core.throttles)
+# Cache: CacheThrottleStore (varsayılan, THROTTLE_CACHE_ALIAS) | Redis: RedisThrottleStore
+# DB tablosu: DatabaseThrottleStore - her istek bir yazma, SQLite'ta yoğun endpoint'leri sıraya sokar
+THROTTLE_STORE = os.environ.get('THROTTLE_STORE', 'core.throttles.CacheThrottleStore')
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_REDIS_URL = os.environ.get('THROTTLE_REDIS_URL', 'redis://localhost:6379/1')
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.TokenClaimsAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES":(
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -169,6 +222,8 @@ REST_FRAMEWORK = {
         "listing_create": "5/minute",
         "message_send": "100/minute",
         "login": "15/minute",
+        # Birim/dakika - istek maliyeti core.throttles.ListingSearchThrottle.get_cost
+        "listing_search": "300/minute",
     },
     # Custom JSON Renderer - Türkçe karakterler için
     "DEFAULT_RENDERER_CLASSES": [
@@ -178,11 +233,25 @@ REST_FRAMEWORK = {
 }
 
 # JWT Configuration
+# Pasif kullanıcı kontrolünün cache süresi (users.authentication) - en kötü
+# durumda pasifleştirilen kullanıcı bu kadar saniye daha istek atabilir.
+# Kullanıcı kaydedilince anahtar silinir, ama yalnızca AUTH_USER_STATE_CACHE_ALIAS
+# paylaşılan bir backend ise (Redis/Memcached) tüm worker'larda. LocMem'de (varsayılan)
+# silme yalnızca kaydeden worker'a ulaşır; diğerleri pasif kullanıcının token'larını
+# süre dolana kadar kabul eder - çok worker'lı kurulumda CACHE_BACKEND ayarlanmalı.
+AUTH_USER_STATE_CACHE_ALIAS = 'default'
+AUTH_USER_STATE_CACHE_SECONDS = 60
+# Refresh token blacklist Bloom filter'ı (users.blacklist)
+JWT_BLACKLIST_FILTER_SYNC_SECONDS = 5        # yeni blacklist kayıtlarını alma aralığı
+JWT_BLACKLIST_FILTER_REBUILD_SECONDS = 3600  # baştan kurma (purge sonrası küçülür)
+JWT_BLACKLIST_FILTER_ERROR_RATE = 0.01
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    # Yalnızca token alınırken (login) tek yazma, her istekte değil;
+    # dedupe_user_emails hangi hesabın tutulacağını last_login'e göre seçer
     'UPDATE_LAST_LOGIN': True,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -238,8 +307,16 @@ EMAIL_HOST_USER = "m.besiraslan40@gmail.com"
 EMAIL_HOST_PASSWORD = "okpfkelrhtilljvx"
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# E-posta outbox'ı (core.mail) - gönderim: python manage.py send_queued_emails --loop
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 60  # 1, 2, 4, 8 dk...
+
 #Logging Configuration
 
+# logs/ git'te yok - FileHandler açılmadan önce oluştur
+os.makedirs(os.path.join(BASE_DIR, 'logs'), exist_ok=True)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -253,6 +330,20 @@ LOGGING = {
             'format': '{levelname}: {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'core.logging.JSONFormatter',
+        },
+    },
+
+    'filters': {
+        # Yüksek hacimli olaylar: INFO/DEBUG kayıtlarının sadece bir kısmı yazılır
+        'sampling': {
+            '()': 'core.logging.SamplingFilter',
+            'rates': {
+                'custom.listings.images': 0.1,
+                'custom.messages.events': 0.1,
+            },
+        },
     },
 
     'handlers': {
@@ -261,20 +352,30 @@ LOGGING = {
             'formatter': 'simple',
         },
         'file': {
-            'class': 'logging.FileHandler',
+            'class': 'core.logging.SizedTimedRotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs/project.log'),
-            'formatter': 'verbose',
+            'formatter': 'json',
+            'when': 'midnight',
+            'backupCount': 14,
+            'max_bytes': 50 * 1024 * 1024,  # 50 MB
+            'encoding': 'utf-8',
+        },
+        # İstek thread'i sadece kuyruğa yazar; console/file listener thread'inde çalışır
+        'queue': {
+            'class': 'core.logging.QueueListenerHandler',
+            'targets': ['console', 'file'],
+            'filters': ['sampling'],
         },
     },
 
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',  # ya da 'DEBUG'
             'propagate': True,
         },
-        'custom': {  # biz bunu kendimiz kullanacağız
-            'handlers': ['console', 'file'],
+        'custom': {  # biz bunu kendimiz kullanacağız (alt logger'lar: custom.listings, custom.messages, ...)
+            'handlers': ['queue'],
             'level': 'DEBUG',
         },
     }
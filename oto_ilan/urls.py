@@ -16,15 +16,10 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import  settings
-from django.conf.urls.static import static
-from users.views import CustomTokenObtainPairView
-
-
-from rest_framework_simplejwt.views import (
-    TokenRefreshView
-    )
+from users.views import CustomTokenObtainPairView, CustomTokenRefreshView
+from core.views import serve_media
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -38,9 +33,11 @@ urlpatterns = [
 
     # JWT Authentication
     path("api/token/", CustomTokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("api/token/refresh/", CustomTokenRefreshView.as_view(), name="token_refresh"),
     
     # Django Allauth (for email verification and social auth)
     path("auth/", include("allauth.urls")),
 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Medya dosyaları - transfer SENDFILE_BACKEND ile front sunucuya devredilir
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$", serve_media, name="media"),
+]
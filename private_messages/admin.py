@@ -1,6 +1,14 @@
 from django.contrib import admin
-from .models import Message
+from .models import Message, Conversation
 
 # Register your models here.
 
-admin.site.register(Message)
\ No newline at end of file
+admin.site.register(Message)
+
+
+# Konuşma özetleri mesajlardan türetilir - sadece izleme amaçlı
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ['user_low', 'user_high', 'last_activity', 'unread_low', 'unread_high']
+    raw_id_fields = ['user_low', 'user_high', 'last_message']
+    readonly_fields = ['last_activity', 'unread_low', 'unread_high']
@@ -0,0 +1,145 @@
+"""
+Mesaj olayları için pub/sub
+
+Mesaj gönderilince / okununca ilgili kullanıcılara olay yayınlanır; SSE
+bağlantıları (views.message_events) kullanıcı kanalına abone olur.
+
+Backend MESSAGE_EVENTS_BACKEND ayarı ile seçilir:
+- InMemoryBroker: tek süreç / tek node (varsayılan)
+- RedisBroker:    birden fazla node - Redis PUBLISH/SUBSCRIBE (MESSAGE_EVENTS_REDIS_URL)
+
+Olay biçimi: {"type": "message" | "read" | "unread_count", "data": {...}}
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+from .models import UnreadCounter
+
+logger = logging.getLogger("custom.messages.events")
+
+
+class InMemoryBroker:
+    """
+    Süreç içi broker. Abonelikler asyncio kuyruklarıdır; publish herhangi bir
+    thread'den (senkron view, sinyal) çağrılabilir, olay aboneliğin event
+    loop'una call_soon_threadsafe ile aktarılır.
+    """
+    # Yavaş istemci belleği doldurmasın - kuyruk doluysa olay atlanır
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # Event loop kapanmış - abonelik birazdan kaldırılacak
+                pass
+
+    @staticmethod
+    def _put(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("[MessageEvents] Abone kuyruğu dolu, olay atlandı")
+
+    async def subscribe(self, user_id):
+        """Kullanıcının olaylarını üreten async iterator"""
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            while True:
+                yield await subscription[1].get()
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(user_id, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._subscribers.pop(user_id, None)
+
+
+class RedisBroker:
+    """Node'lar arası broker - her kullanıcı bir Redis kanalı"""
+
+    def __init__(self):
+        import redis
+        import redis.asyncio
+
+        self.url = settings.MESSAGE_EVENTS_REDIS_URL
+        self._client = redis.Redis.from_url(self.url)
+        self._async_module = redis.asyncio
+
+    @staticmethod
+    def channel(user_id):
+        return f"messages:user:{user_id}"
+
+    def publish(self, user_id, event):
+        self._client.publish(self.channel(user_id), json.dumps(event, cls=DjangoJSONEncoder))
+
+    async def subscribe(self, user_id):
+        client = self._async_module.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.channel(user_id))
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield json.loads(message["data"])
+        finally:
+            await pubsub.unsubscribe(self.channel(user_id))
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Ayarlardaki broker'ın süreç genelindeki tek örneği"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.MESSAGE_EVENTS_BACKEND)()
+    return _broker
+
+
+def publish(user_id, event_type, data):
+    """
+    Olayı transaction commit olduktan sonra yayınla - geri alınan bir
+    mesaj istemciye hiç ulaşmaz. Broker hatası isteği bozmaz.
+    """
+    event = {"type": event_type, "data": data}
+
+    def send():
+        try:
+            get_broker().publish(user_id, event)
+        except Exception as e:
+            logger.error(f"[MessageEvents] Olay yayınlanamadı: {e}")
+
+    transaction.on_commit(send)
+
+
+def publish_unread_count(user_id):
+    """Kullanıcının güncel okunmamış sayısını commit sonrası yayınla"""
+
+    def send():
+        try:
+            count = UnreadCounter.get_for(user_id)
+            get_broker().publish(user_id, {"type": "unread_count", "data": {"unread_count": count}})
+        except Exception as e:
+            logger.error(f"[MessageEvents] Olay yayınlanamadı: {e}")
+
+    transaction.on_commit(send)
@@ -0,0 +1,96 @@
+"""
+Django Management Command: Okunmamış sayaçlarını mesajlardan yeniden hesapla
+
+UnreadCounter (kullanıcı toplamı) ve Conversation.unread_low/unread_high
+(konuşma bazında) artımlı güncellenir. Bir hata veya elle yapılan DB
+değişikliği sonrası sapma olursa bu komut gerçek sayıları mesaj tablosundan
+(receiver, is_read) indeksiyle hesaplar ve sadece sapan satırları düzeltir.
+
+Kullanım:
+    python manage.py reconcile_unread_counters
+    python manage.py reconcile_unread_counters --dry-run
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from private_messages.models import Message, Conversation, UnreadCounter
+
+
+def unread_subquery(**filters):
+    """Dış sorgudaki kullanıcı(lar) için okunmamış mesaj sayısı"""
+    return Coalesce(
+        Subquery(
+            Message.objects.filter(is_read=False, **filters)
+            .order_by()
+            .values('receiver')
+            .annotate(total=Count('id'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Okunmamış mesaj sayaçlarını (kullanıcı ve konuşma) mesajlarla uzlaştırır'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sadece sapmaları say, düzeltme',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        start_time = time.time()
+
+        with transaction.atomic():
+            # Okunmamış mesajı olup sayacı olmayan kullanıcılar
+            missing = (
+                Message.objects.filter(is_read=False)
+                .exclude(receiver__unread_counter__isnull=False)
+                .order_by()
+                .values_list('receiver_id', flat=True)
+                .distinct()
+            )
+            missing_count = missing.count()
+            if not dry_run:
+                UnreadCounter.objects.bulk_create(
+                    [UnreadCounter(user_id=user_id) for user_id in missing.iterator()],
+                    batch_size=1000,
+                    ignore_conflicts=True,
+                )
+
+            user_actual = unread_subquery(receiver=OuterRef('user'))
+            drifted_users = UnreadCounter.objects.annotate(actual=user_actual).filter(~Q(unread_count=F('actual')))
+
+            low_actual = unread_subquery(receiver=OuterRef('user_low'), sender=OuterRef('user_high'))
+            high_actual = unread_subquery(receiver=OuterRef('user_high'), sender=OuterRef('user_low'))
+            drifted_conversations = Conversation.objects.annotate(
+                actual_low=low_actual,
+                actual_high=high_actual,
+            ).filter(~Q(unread_low=F('actual_low')) | ~Q(unread_high=F('actual_high')))
+
+            user_count = drifted_users.count()
+            conversation_count = drifted_conversations.count()
+
+            if not dry_run:
+                UnreadCounter.objects.filter(pk__in=drifted_users.values('pk')).update(unread_count=user_actual)
+                Conversation.objects.filter(pk__in=drifted_conversations.values('pk')).update(
+                    unread_low=low_actual,
+                    unread_high=high_actual,
+                )
+
+        summary = (
+            f'{missing_count} eksik sayaç, {user_count} sapan kullanıcı sayacı, '
+            f'{conversation_count} sapan konuşma sayacı'
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'🧪 DRY RUN: {summary}'))
+        else:
+            elapsed_time = time.time() - start_time
+            self.stdout.write(self.style.SUCCESS(f'✅ Düzeltildi: {summary}. Süre: {elapsed_time:.1f} saniye'))
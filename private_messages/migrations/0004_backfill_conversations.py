@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def backfill_conversations(apps, schema_editor):
+    """Mevcut mesajlardan konuşma özetlerini oluştur (mesajlar bir kez taranır)"""
+    Message = apps.get_model("private_messages", "Message")
+    Conversation = apps.get_model("private_messages", "Conversation")
+
+    summaries = {}
+    messages = Message.objects.order_by("timestamp", "id").values_list(
+        "id", "sender_id", "receiver_id", "is_read", "timestamp"
+    )
+    for message_id, sender_id, receiver_id, is_read, timestamp in messages.iterator(chunk_size=2000):
+        pair = (sender_id, receiver_id) if sender_id < receiver_id else (receiver_id, sender_id)
+        summary = summaries.setdefault(pair, {"unread_low": 0, "unread_high": 0})
+        summary["last_message_id"] = message_id
+        summary["last_activity"] = timestamp
+        if not is_read:
+            summary["unread_low" if receiver_id <= sender_id else "unread_high"] += 1
+
+    Conversation.objects.bulk_create(
+        [
+            Conversation(user_low_id=user_low_id, user_high_id=user_high_id, **summary)
+            for (user_low_id, user_high_id), summary in summaries.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("private_messages", "0003_conversation"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_unread_counters(apps, schema_editor):
+    Message = apps.get_model("private_messages", "Message")
+    UnreadCounter = apps.get_model("private_messages", "UnreadCounter")
+
+    totals = (
+        Message.objects.filter(is_read=False)
+        .order_by()
+        .values_list("receiver_id")
+        .annotate(unread_count=Count("id"))
+    )
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, unread_count=unread_count) for user_id, unread_count in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("private_messages", "0006_unreadcounter"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_unread_counters, migrations.RunPython.noop),
+    ]
@@ -1,19 +1,176 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.conf import settings
+from django.dispatch import Signal
+from core.models import FieldTrackerMixin
 
-class Message(models.Model):
+# UnreadCounter değişti (user_id=...) - toplu update() post_save tetiklemediği için
+# sayaca bağlı önbellekler (ör. dashboard istatistikleri) bu sinyali dinler
+unread_count_changed = Signal()
+
+class Message(FieldTrackerMixin, models.Model):
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_messages')
     receiver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='received_messages')
     text = models.TextField()
     is_read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    # Şu anda yalnızca "is_read" güncellenebilir; text mantıksal olarak değişmez
+    tracked_fields = ['is_read', 'text']
+
     class Meta:
         ordering = ['-timestamp']
         verbose_name = 'Mesaj'
         verbose_name_plural = 'Mesajlar'
+        indexes = [
+            # Konuşma geçmişi: iki yönün her biri (sender, receiver) aralığı, zaman sıralı
+            models.Index(fields=['sender', 'receiver', 'timestamp', 'id'], name='message_pair_timestamp'),
+            # Okunmamışlar (mark_as_read, sayaç uzlaştırma)
+            models.Index(fields=['receiver', 'is_read'], name='message_receiver_unread'),
+        ]
 
     def __str__(self):
         return f"{self.sender.username} → {self.receiver.username}: {self.text[:30]}"
         
     
+
+
+class Conversation(models.Model):
+    """
+    İki kullanıcı arasındaki konuşmanın özeti - gelen kutusu için.
+
+    Kullanıcı çifti sıralı tutulur (user_low.id < user_high.id), böylece her
+    çift için tek satır olur. Son mesaj, son aktivite ve her katılımcının
+    okunmamış sayısı mesaj gönderilirken / okunurken güncellenir;
+    gelen kutusu mesaj tablosunu taramadan tek sorguyla listelenir.
+    """
+    user_low = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    user_high = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_activity = models.DateTimeField()
+    unread_low = models.PositiveIntegerField(default=0, help_text="user_low'un okumadığı mesaj sayısı")
+    unread_high = models.PositiveIntegerField(default=0, help_text="user_high'ın okumadığı mesaj sayısı")
+
+    class Meta:
+        ordering = ['-last_activity']
+        verbose_name = 'Konuşma'
+        verbose_name_plural = 'Konuşmalar'
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='unique_conversation_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['user_low', '-last_activity'], name='conversation_low_activity'),
+            models.Index(fields=['user_high', '-last_activity'], name='conversation_high_activity'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_low_id} ↔ {self.user_high_id}"
+
+    @staticmethod
+    def pair(user_a_id, user_b_id):
+        return (user_a_id, user_b_id) if user_a_id < user_b_id else (user_b_id, user_a_id)
+
+    @staticmethod
+    def unread_field(user_id, other_id):
+        """Kullanıcının bu konuşmadaki okunmamış sayacı alanı"""
+        return 'unread_low' if user_id <= other_id else 'unread_high'
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.objects.filter(models.Q(user_low=user) | models.Q(user_high=user))
+
+    @classmethod
+    def between(cls, user_a_id, user_b_id):
+        user_low_id, user_high_id = cls.pair(user_a_id, user_b_id)
+        return cls.objects.filter(user_low_id=user_low_id, user_high_id=user_high_id)
+
+    def contact_for(self, user):
+        return self.user_high if self.user_low_id == user.id else self.user_low
+
+    def unread_for(self, user):
+        return self.unread_low if self.user_low_id == user.id else self.unread_high
+
+    @classmethod
+    def record_message(cls, message):
+        """
+        Yeni mesaj: son mesajı güncelle, alıcının sayacını artır (tek UPDATE).
+        Okunmuş olarak oluşturulan mesaj (ör. admin'den) sayacı artırmaz.
+        """
+        user_low_id, user_high_id = cls.pair(message.sender_id, message.receiver_id)
+        unread_field = cls.unread_field(message.receiver_id, message.sender_id)
+        unread = 0 if message.is_read else 1
+        with transaction.atomic():
+            conversation, created = cls.objects.get_or_create(
+                user_low_id=user_low_id,
+                user_high_id=user_high_id,
+                defaults={'last_message': message, 'last_activity': message.timestamp, unread_field: unread},
+            )
+            if not created:
+                cls.objects.filter(pk=conversation.pk).update(**{
+                    'last_message': message,
+                    'last_activity': message.timestamp,
+                    unread_field: F(unread_field) + unread,
+                })
+            if unread:
+                UnreadCounter.increment(message.receiver_id)
+
+    @classmethod
+    def mark_read(cls, reader_id, sender_id, count):
+        """
+        Okunan mesaj sayısı kadar azalt. Sıfırlamak yerine azaltılır; aynı
+        anda gelen yeni mesajın sayacı kaybolmaz.
+        """
+        if not count:
+            return
+        unread_field = cls.unread_field(reader_id, sender_id)
+        cls.between(reader_id, sender_id).update(**{unread_field: Greatest(F(unread_field) - count, 0)})
+        UnreadCounter.decrement(reader_id, count)
+
+    @classmethod
+    def mark_unread(cls, reader_id, sender_id, count):
+        """Okunmuş mesaj tekrar okunmamış yapıldı - mark_read'in tersi"""
+        if not count:
+            return
+        unread_field = cls.unread_field(reader_id, sender_id)
+        cls.between(reader_id, sender_id).update(**{unread_field: F(unread_field) + count})
+        UnreadCounter.increment(reader_id, count)
+
+
+class UnreadCounter(models.Model):
+    """
+    Kullanıcının toplam okunmamış mesaj sayısı - her sayfada gösterilen rozet
+    için COUNT yerine tek satır okunur. Konuşma bazındaki sayılar
+    Conversation'da; ikisi birlikte record_message/mark_read ile güncellenir.
+    Sapma olursa: python manage.py reconcile_unread_counters
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    unread_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Okunmamış Sayacı'
+        verbose_name_plural = 'Okunmamış Sayaçları'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count}"
+
+    @classmethod
+    def get_for(cls, user_id):
+        return cls.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first() or 0
+
+    @classmethod
+    def increment(cls, user_id, amount=1):
+        if not cls.objects.filter(user_id=user_id).update(unread_count=F('unread_count') + amount):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, unread_count=amount)
+            except IntegrityError:
+                # Aynı anda başka bir istek oluşturdu
+                cls.objects.filter(user_id=user_id).update(unread_count=F('unread_count') + amount)
+        unread_count_changed.send(sender=cls, user_id=user_id)
+
+    @classmethod
+    def decrement(cls, user_id, amount):
+        cls.objects.filter(user_id=user_id).update(unread_count=Greatest(F('unread_count') - amount, 0))
+        unread_count_changed.send(sender=cls, user_id=user_id)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Message
+from .models import Message, Conversation
 from users.serializers import UserSerializer
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -15,4 +15,37 @@ class MessageSerializer(serializers.ModelSerializer):
             'text',
             'is_read',
             'timestamp'
-        ]
\ No newline at end of file
+        ]
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """Gelen kutusu satırı - karşı taraf isteği yapan kullanıcıya göre belirlenir"""
+    contact = serializers.SerializerMethodField()
+    last_message = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'contact', 'last_message', 'unread_count', 'last_activity']
+
+    def get_contact(self, obj):
+        contact = obj.contact_for(self.context['request'].user)
+        return {
+            'id': contact.id,
+            'username': contact.username,
+            'email': contact.email,
+        }
+
+    def get_last_message(self, obj):
+        message = obj.last_message
+        if not message:
+            return None
+        return {
+            'id': message.id,
+            'text': message.text,
+            'timestamp': message.timestamp,
+            'sender_id': message.sender_id,
+        }
+
+    def get_unread_count(self, obj):
+        return obj.unread_for(self.context['request'].user)
@@ -1,22 +1,11 @@
 import logging
-from django.db.models.signals import post_save, pre_save, post_delete   
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Message
-
-logger = logging.getLogger("custom")
-
-# --- Güncelleme loglamak için eski hali kaydet ---
-_PREVIOSUS_MESSAGES = {}
-
-@receiver(pre_save, sender=Message)
-def store_old_message_state(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old = Message.objects.get(pk=instance.pk)
-            _PREVIOSUS_MESSAGES [instance.pk] = old
-        except Message.DoesNotExist:
-            pass
+from .models import Message, Conversation
+from .serializers import MessageSerializer
+from . import events
 
+logger = logging.getLogger("custom.messages")
 
 @receiver(post_save, sender=Message)
 def log_message_change(sender, instance, created, **kwargs):
@@ -25,22 +14,72 @@ def log_message_change(sender, instance, created, **kwargs):
                     f"Alıcı={instance.receiver.username}, "
                     f"ID={instance.id}, "
                     f"Mesaj: '{instance.text[:50]}'")
-        
+        return
+
+    # Eski değerler mesaj yüklenirken saklandı (FieldTrackerMixin) - ek SELECT yok
+    changes = []
+    for field, (old_val, new_val) in instance.get_changes().items():
+        if field == 'text':
+            changes.append(f"text: '{old_val[:30]}...' → '{new_val[:30]}...'")
+        else:
+            changes.append(f"{field}: {old_val} → {new_val}")
+
+    if changes:
+        logger.info(f"[Message] Mesaj güncellendi: ID={instance.id}, "
+                    f"Değişiklikler: {', '.join(changes)}")
+
+
+@receiver(post_save, sender=Message)
+def update_conversation_on_send(sender, instance, created, **kwargs):
+    if created:
+        Conversation.record_message(instance)
+
+        # Anlık bildirim: alıcıya ve gönderenin diğer cihazlarına
+        data = MessageSerializer(instance).data
+        events.publish(instance.receiver_id, 'message', data)
+        events.publish(instance.sender_id, 'message', data)
+        events.publish_unread_count(instance.receiver_id)
+
+
+@receiver(post_save, sender=Message)
+def update_conversation_on_read_change(sender, instance, created, **kwargs):
+    """
+    mark_as_read dışındaki yollardan (PATCH /messages/<id>/, admin) is_read
+    değişirse konuşma ve kullanıcı sayaçları da güncellenir. Eski değer
+    FieldTrackerMixin'den gelir. mark_as_read toplu update() kullanır,
+    sinyal üretmez - orada sayaçları view kendisi günceller.
+    """
+    if created:
+        return
+    change = instance.get_changes().get('is_read')
+    if not change:
+        return
+    if change[1]:
+        Conversation.mark_read(instance.receiver_id, instance.sender_id, 1)
+        events.publish(instance.sender_id, 'read', {'reader_id': instance.receiver_id, 'count': 1})
+    else:
+        Conversation.mark_unread(instance.receiver_id, instance.sender_id, 1)
+    events.publish_unread_count(instance.receiver_id)
+
+
+@receiver(post_delete, sender=Message)
+def update_conversation_on_delete(sender, instance, **kwargs):
+    """Silinen mesaj okunmamışsa sayacı düşür, son mesajsa bir öncekini bul"""
+    if not instance.is_read:
+        Conversation.mark_read(instance.receiver_id, instance.sender_id, 1)
+
+    conversation = Conversation.between(instance.sender_id, instance.receiver_id).first()
+    if not conversation or conversation.last_message_id not in (None, instance.pk):
+        return
+
+    last_message = Message.objects.filter(
+        sender_id__in=[instance.sender_id, instance.receiver_id],
+        receiver_id__in=[instance.sender_id, instance.receiver_id],
+    ).exclude(pk=instance.pk).order_by('-timestamp', '-id').first()
+    if last_message:
+        Conversation.objects.filter(pk=conversation.pk).update(
+            last_message=last_message,
+            last_activity=last_message.timestamp,
+        )
     else:
-        old = _PREVIOSUS_MESSAGES.get(instance.pk, None)
-        if not old: 
-            return
-        changes = []
-        # Şu anda yalnızca "is_read" field’ı güncellenebilir; diğerleri mantıksal olarak değişmez
-        if old.is_read != instance.is_read:
-            changes.append(f"is_read: {old.is_read} → {instance.is_read}")
-
-        if old.text != instance.text:
-            changes.append(f"text: '{old.text[:30]}...' → '{instance.text[:30]}...'")
-        # Ekstra field eklemek istersen buraya ekleyebilirsin
-
-        if changes:
-            logger.info(f"[Message] Mesaj güncellendi: ID={instance.id}, "
-                        f"Değişiklikler: {', '.join(changes)}")
-            
-        _PREVIOSUS_MESSAGES.pop(instance.pk, None)
+        conversation.delete()
@@ -1,3 +1,231 @@
-from django.test import TestCase
+import asyncio
+import io
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase
+from rest_framework.test import APIClient
+from users.models import User
+from users.tokens import UserRefreshToken
+from . import events
+from .models import Conversation, Message, UnreadCounter
+from .views import SSE_RETRY_MS, SSE_WSGI_RETRY_MS, MessageCursorPagination
 
-# Create your tests here.
+
+class MessagingTestCase(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='Str0ng!pass99')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='Str0ng!pass99')
+        self.carol = User.objects.create_user(username='carol', email='carol@example.com', password='Str0ng!pass99')
+        self.client = APIClient()
+
+    def send(self, sender, receiver, text='Merhaba'):
+        return Message.objects.create(sender=sender, receiver=receiver, text=text)
+
+    def login(self, user):
+        self.client.force_authenticate(user)
+
+
+class ConversationTests(MessagingTestCase):
+    def test_single_row_per_pair(self):
+        self.send(self.alice, self.bob)
+        last = self.send(self.bob, self.alice, 'Selam')
+
+        conversation = Conversation.objects.get()
+        self.assertEqual((conversation.user_low, conversation.user_high), (self.alice, self.bob))
+        self.assertEqual(conversation.last_message, last)
+        self.assertEqual(conversation.unread_for(self.alice), 1)
+        self.assertEqual(conversation.unread_for(self.bob), 1)
+
+    def test_conversations_endpoint(self):
+        self.send(self.bob, self.alice, 'Eski')
+        self.send(self.carol, self.alice, 'Bir')
+        self.send(self.carol, self.alice, 'İki')
+        self.login(self.alice)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/messages/conversations/')
+        self.assertEqual(response.status_code, 200)
+
+        results = response.json()['results']
+        self.assertEqual([row['contact']['username'] for row in results], ['carol', 'bob'])
+        self.assertEqual(results[0]['last_message']['text'], 'İki')
+        self.assertEqual(results[0]['unread_count'], 2)
+        self.assertEqual(results[1]['unread_count'], 1)
+
+    def test_mark_as_read_updates_conversation(self):
+        self.send(self.bob, self.alice)
+        self.send(self.bob, self.alice)
+        self.login(self.alice)
+
+        response = self.client.post('/api/messages/mark_as_read/', {'sender_id': self.bob.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Conversation.objects.get().unread_for(self.alice), 0)
+        self.assertEqual(UnreadCounter.get_for(self.alice.pk), 0)
+
+    def test_deleting_last_message_moves_back(self):
+        first = self.send(self.alice, self.bob, 'Bir')
+        second = self.send(self.alice, self.bob, 'İki')
+
+        second.delete()
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.last_message, first)
+        self.assertEqual(conversation.unread_for(self.bob), 1)
+
+
+class MessageCursorTests(MessagingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.messages = [self.send(self.alice if i % 2 else self.bob, self.bob if i % 2 else self.alice, str(i)) for i in range(7)]
+        # 2..4 aynı zaman damgasında - sıra id ile belirlenir
+        tie = self.messages[2].timestamp
+        Message.objects.filter(pk__in=[m.pk for m in self.messages[2:5]]).update(timestamp=tie)
+        self.login(self.alice)
+
+    def page(self, **params):
+        response = self.client.get('/api/messages/conversation_with/', {'user_id': self.bob.pk, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def texts(self, data):
+        return [message['text'] for message in data['results']]
+
+    def test_latest_page_then_scroll_up(self):
+        data = self.page(limit=3)
+        self.assertEqual(self.texts(data), ['4', '5', '6'])
+        self.assertTrue(data['has_more'])
+
+        # Cursor aynı zaman damgasındaki mesajların ortasına düşer
+        data = self.page(limit=3, before=data['before'])
+        self.assertEqual(self.texts(data), ['1', '2', '3'])
+
+        data = self.page(limit=3, before=data['before'])
+        self.assertEqual(self.texts(data), ['0'])
+        self.assertFalse(data['has_more'])
+        self.assertIsNone(data['before'])
+
+    def test_after_returns_only_newer(self):
+        data = self.page(limit=3)
+        after = data['after']
+        self.assertEqual(self.page(after=after)['results'], [])
+        # Yeni mesaj yokken cursor aynı kalır
+        self.assertEqual(self.page(after=after)['after'], after)
+
+        self.send(self.bob, self.alice, '7')
+        data = self.page(after=after)
+        self.assertEqual(self.texts(data), ['7'])
+
+    def test_cursors_within_timestamp_tie(self):
+        middle = Message.objects.get(pk=self.messages[3].pk)
+        cursor = MessageCursorPagination.encode_cursor(middle)
+
+        self.assertEqual(self.texts(self.page(limit=2, after=cursor)), ['4', '5'])
+        self.assertEqual(self.texts(self.page(limit=2, before=cursor)), ['1', '2'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/messages/conversation_with/', {'user_id': self.bob.pk, 'before': 'bozuk'})
+        self.assertEqual(response.status_code, 400)
+
+
+class MessageEventsTests(MessagingTestCase):
+    def token(self, user):
+        return str(UserRefreshToken.for_user(user).access_token)
+
+    def test_requires_token(self):
+        self.assertEqual(self.client.get('/api/messages/events/').status_code, 401)
+        self.assertEqual(self.client.get('/api/messages/events/', {'token': 'bozuk'}).status_code, 401)
+
+    def test_wsgi_returns_snapshot(self):
+        self.send(self.bob, self.alice)
+
+        response = self.client.get('/api/messages/events/', {'token': self.token(self.alice)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertFalse(response.streaming)
+        body = response.content.decode()
+        self.assertTrue(body.startswith(f'retry: {SSE_WSGI_RETRY_MS}\n\n'))
+        self.assertIn('event: unread_count\ndata: {"unread_count": 1}\n\n', body)
+
+    async def test_asgi_streams_events(self):
+        token = await sync_to_async(self.token)(self.alice)
+        response = await AsyncClient().get('/api/messages/events/', {'token': token})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), f'retry: {SSE_RETRY_MS}\n\n'.encode())
+        self.assertIn(b'"unread_count": 0', await anext(stream))
+
+        # Abonelik ilk olay beklenirken açılır
+        next_chunk = asyncio.ensure_future(anext(stream))
+        broker = events.get_broker()
+        while self.alice.pk not in broker._subscribers:
+            await asyncio.sleep(0.01)
+        broker.publish(self.alice.pk, {'type': 'read', 'data': {'reader_id': self.bob.pk, 'count': 1}})
+        chunk = await asyncio.wait_for(next_chunk, timeout=5)
+        self.assertEqual(chunk, f'event: read\ndata: {{"reader_id": {self.bob.pk}, "count": 1}}\n\n'.encode())
+        await stream.aclose()
+
+    def test_send_publishes_after_commit(self):
+        with mock.patch.object(events.get_broker(), 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.send(self.bob, self.alice, 'Merhaba')
+
+        published = [(call.args[0], call.args[1]['type']) for call in publish.call_args_list]
+        self.assertIn((self.alice.pk, 'message'), published)
+        self.assertIn((self.bob.pk, 'message'), published)
+        self.assertIn((self.alice.pk, 'unread_count'), published)
+
+
+class UnreadCounterTests(MessagingTestCase):
+    def test_counters_follow_send_and_read(self):
+        first = self.send(self.bob, self.alice)
+        self.send(self.carol, self.alice)
+        self.assertEqual(UnreadCounter.get_for(self.alice.pk), 2)
+
+        first.is_read = True
+        first.save()
+        self.assertEqual(UnreadCounter.get_for(self.alice.pk), 1)
+        self.assertEqual(Conversation.between(self.alice.pk, self.bob.pk).get().unread_for(self.alice), 0)
+
+        first.is_read = False
+        first.save()
+        self.assertEqual(UnreadCounter.get_for(self.alice.pk), 2)
+
+    def test_unread_count_endpoint_is_single_query(self):
+        self.send(self.bob, self.alice)
+        self.login(self.alice)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/messages/unread_count/')
+        self.assertEqual(response.json(), {'unread_count': 1})
+
+    def test_only_receiver_changes_read_state(self):
+        message = self.send(self.bob, self.alice)
+        self.login(self.bob)
+        response = self.client.patch(f'/api/messages/{message.pk}/', {'is_read': True})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(UnreadCounter.get_for(self.alice.pk), 1)
+
+    def test_reconcile_fixes_drift(self):
+        self.send(self.bob, self.alice)
+        self.send(self.bob, self.alice)
+        self.send(self.alice, self.carol)
+        # Sinyalsiz toplu değişiklikler sayaçları saptırır
+        UnreadCounter.objects.filter(user=self.alice).update(unread_count=7)
+        UnreadCounter.objects.filter(user=self.carol).delete()
+        Conversation.between(self.alice.pk, self.bob.pk).update(unread_low=0, unread_high=5)
+
+        out = io.StringIO()
+        call_command('reconcile_unread_counters', '--dry-run', stdout=out)
+        self.assertIn('1 eksik sayaç, 1 sapan kullanıcı sayacı, 1 sapan konuşma sayacı', out.getvalue())
+        self.assertEqual(UnreadCounter.get_for(self.alice.pk), 7)
+
+        call_command('reconcile_unread_counters', stdout=io.StringIO())
+        self.assertEqual(UnreadCounter.get_for(self.alice.pk), 2)
+        self.assertEqual(UnreadCounter.get_for(self.carol.pk), 1)
+        conversation = Conversation.between(self.alice.pk, self.bob.pk).get()
+        self.assertEqual((conversation.unread_for(self.alice), conversation.unread_for(self.bob)), (2, 0))
+
+        out = io.StringIO()
+        call_command('reconcile_unread_counters', stdout=out)
+        self.assertIn('0 eksik sayaç, 0 sapan kullanıcı sayacı, 0 sapan konuşma sayacı', out.getvalue())
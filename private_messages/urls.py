@@ -1,9 +1,10 @@
 from rest_framework import routers
 from django.urls import path, include
-from .views import MessageViewSet
+from .views import MessageViewSet, message_events
 
 router = routers.DefaultRouter()
 router.register(r'messages', MessageViewSet)
 urlpatterns = [
+    path('messages/events/', message_events, name='message-events'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,14 +1,111 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+from users.authentication import TokenClaimsAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import serializers
 from django.db.models import Q, Max, Count, Case, When, IntegerField
-from .models import Message
-from .serializers import MessageSerializer
+import base64
+from datetime import datetime
+from django.db import transaction
+from rest_framework.pagination import BasePagination
+from .models import Message, Conversation, UnreadCounter
+from .serializers import MessageSerializer, ConversationSerializer
+from . import events
 from core.throttles import MessageSendThrottle
 from users.models import User
 
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 3000
+# WSGI'da akış açılmaz; istemci bu aralıkla yeniden bağlanıp anlık durumu alır
+SSE_WSGI_RETRY_MS = 30000
+
+
+class MessageCursorPagination(BasePagination):
+    """
+    (timestamp, id) üzerine kurulu cursor sayfalama
+
+    - Cursor yok: en yeni `limit` mesaj
+    - ?before=<cursor>: bu mesajdan eskiler (yukarı kaydırma)
+    - ?after=<cursor>: bu mesajdan yeniler (yeni mesaj kontrolü)
+    Sonuçlar her durumda eskiden yeniye sıralıdır. OFFSET kullanılmaz;
+    her sayfa (sender, receiver, timestamp) indeksinden okunur.
+    """
+    default_limit = 50
+    max_limit = 100
+
+    @staticmethod
+    def encode_cursor(message):
+        raw = f"{message.timestamp.isoformat()}|{message.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            timestamp, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return datetime.fromisoformat(timestamp), int(message_id)
+        except (ValueError, UnicodeDecodeError):
+            raise serializers.ValidationError({'cursor': 'Geçersiz cursor.'})
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        limit = self.get_limit(request)
+        before = request.query_params.get('before')
+        after = request.query_params.get('after')
+
+        if after:
+            timestamp, message_id = self.decode_cursor(after)
+            queryset = queryset.filter(
+                Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=message_id)
+            ).order_by('timestamp', 'id')
+            messages = list(queryset[:limit + 1])
+            self.has_more = len(messages) > limit
+            messages = messages[:limit]
+        else:
+            if before:
+                timestamp, message_id = self.decode_cursor(before)
+                queryset = queryset.filter(
+                    Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id)
+                )
+            messages = list(queryset.order_by('-timestamp', '-id')[:limit + 1])
+            self.has_more = len(messages) > limit
+            messages = messages[:limit][::-1]
+
+        self.after_mode = bool(after)
+        self.request_after = after
+        self.messages = messages
+        return messages
+
+    def get_paginated_response(self, data):
+        messages = self.messages
+        if self.after_mode:
+            # Yeni mesaj yoksa istemci aynı cursor ile tekrar sorar
+            before = None
+            after = self.encode_cursor(messages[-1]) if messages else self.request_after
+        else:
+            before = self.encode_cursor(messages[0]) if messages and self.has_more else None
+            after = self.encode_cursor(messages[-1]) if messages else None
+        return Response({
+            'results': data,
+            'before': before,
+            'after': after,
+            'has_more': self.has_more,
+        })
+
 
 class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.all()
@@ -54,70 +151,32 @@ class MessageViewSet(viewsets.ModelViewSet):
             
         serializer.save(sender=self.request.user, receiver=receiver)
 
+    def perform_update(self, serializer):
+        # Okundu bilgisini sadece alıcı değiştirebilir - sayaçlar alıcıya ait
+        # (sayaç güncellemesi signals.update_conversation_on_read_change'de)
+        if 'is_read' in serializer.validated_data and serializer.instance.receiver_id != self.request.user.id:
+            raise PermissionDenied("Okundu bilgisini sadece alıcı değiştirebilir.")
+        serializer.save()
+
     @action(detail=False, methods=['get'])
     def conversations(self, request):
         """
-        Kullanıcının tüm konuşmalarını listele
+        Kullanıcının tüm konuşmalarını listele (son aktiviteye göre, sayfalı)
         GET /api/messages/conversations/
         """
-        user = request.user
-        
-        # Kullanıcının dahil olduğu tüm konuşmaları bul
-        # Her konuşmadaki en son mesajı al
-        conversations = []
-        
-        # Kullanıcının mesajlaştığı tüm kişileri bul
-        sent_to = Message.objects.filter(sender=user).values_list('receiver', flat=True).distinct()
-        received_from = Message.objects.filter(receiver=user).values_list('sender', flat=True).distinct()
-        
-        # Tüm benzersiz kullanıcıları topla
-        all_contacts = set(list(sent_to) + list(received_from))
-        
-        for contact_id in all_contacts:
-            try:
-                contact = User.objects.get(id=contact_id)
-                
-                # Bu kişiyle son mesaj
-                last_message = Message.objects.filter(
-                    Q(sender=user, receiver=contact) | 
-                    Q(sender=contact, receiver=user)
-                ).order_by('-timestamp').first()
-                
-                # Okunmamış mesaj sayısı
-                unread_count = Message.objects.filter(
-                    sender=contact,
-                    receiver=user,
-                    is_read=False
-                ).count()
-                
-                if last_message:
-                    conversations.append({
-                        'contact': {
-                            'id': contact.id,
-                            'username': contact.username,
-                            'email': contact.email,
-                        },
-                        'last_message': {
-                            'id': last_message.id,
-                            'text': last_message.text,
-                            'timestamp': last_message.timestamp,
-                            'sender_id': last_message.sender.id,
-                        },
-                        'unread_count': unread_count
-                    })
-            except User.DoesNotExist:
-                continue
-        
-        # Konuşmaları son mesaj tarihine göre sırala
-        conversations.sort(key=lambda x: x['last_message']['timestamp'], reverse=True)
-        
-        return Response(conversations)
+        conversations = Conversation.for_user(request.user).select_related(
+            'user_low', 'user_high', 'last_message'
+        ).order_by('-last_activity')
+
+        page = self.paginate_queryset(conversations)
+        serializer = ConversationSerializer(page, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def conversation_with(self, request):
         """
         Belirli bir kullanıcıyla konuşmayı getir
-        GET /api/messages/conversation-with/?user_id=X
+        GET /api/messages/conversation-with/?user_id=X[&before=<cursor>|&after=<cursor>][&limit=50]
         """
         user = request.user
         other_user_id = request.query_params.get('user_id')
@@ -134,14 +193,16 @@ class MessageViewSet(viewsets.ModelViewSet):
                 'error': 'User not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Bu iki kullanıcı arasındaki tüm mesajları getir
+        # Bu iki kullanıcı arasındaki mesajlar - cursor ile sayfa sayfa
         messages = Message.objects.filter(
             Q(sender=user, receiver=other_user) |
             Q(sender=other_user, receiver=user)
-        ).order_by('timestamp')
-        
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        ).select_related('sender', 'receiver')
+
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
+        serializer = MessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['post'])
     def mark_as_read(self, request):
@@ -166,11 +227,17 @@ class MessageViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_404_NOT_FOUND)
         
         # Bu kullanıcıdan gelen tüm okunmamış mesajları okundu işaretle
-        updated_count = Message.objects.filter(
-            sender=sender,
-            receiver=user,
-            is_read=False
-        ).update(is_read=True)
+        with transaction.atomic():
+            updated_count = Message.objects.filter(
+                sender=sender,
+                receiver=user,
+                is_read=False
+            ).update(is_read=True)
+            Conversation.mark_read(user.id, sender.id, updated_count)
+            if updated_count:
+                # Okundu bilgisi gönderene, yeni sayaç okuyana
+                events.publish(sender.id, 'read', {'reader_id': user.id, 'count': updated_count})
+                events.publish_unread_count(user.id)
         
         return Response({
             'success': True,
@@ -185,13 +252,88 @@ class MessageViewSet(viewsets.ModelViewSet):
         """
         user = request.user
         
-        unread_count = Message.objects.filter(
-            receiver=user,
-            is_read=False
-        ).count()
+        unread_count = UnreadCounter.get_for(user.id)
         
         return Response({
             'unread_count': unread_count
         })
 
 # Create your views here.
+
+
+async def message_events(request):
+    """
+    Mesaj olayları (Server-Sent Events)
+    GET /api/messages/events/?token=<access token>
+
+    EventSource header gönderemediği için access token query string ile de
+    kabul edilir (Authorization: Bearer de olur). Olaylar: message, read,
+    unread_count. Bağlantı ASGI sunucusunda (uvicorn/daphne) worker thread
+    tutmadan açık kalır.
+
+    WSGI'da (runserver, sync gunicorn) StreamingHttpResponse async iterator'ı
+    göndermeden önce sonuna kadar tüketir - sonsuz akış worker'ı sonsuza dek
+    tutardı. Orada yalnızca anlık unread_count gönderilip bağlantı kapatılır;
+    EventSource SSE_WSGI_RETRY_MS sonra yeniden bağlanır (yoklama).
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    authentication = TokenClaimsAuthentication()
+    raw_token = request.GET.get('token')
+    if not raw_token:
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header else None
+    if not raw_token:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        user = await sync_to_async(authentication.get_user)(validated_token)
+    except (InvalidToken, AuthenticationFailed) as e:
+        return JsonResponse({'detail': str(e)}, status=401)
+
+    unread_count = await sync_to_async(UnreadCounter.get_for)(user.id)
+
+    if not isinstance(request, ASGIRequest):
+        response = HttpResponse(
+            f"retry: {SSE_WSGI_RETRY_MS}\n\n"
+            + format_event({'type': 'unread_count', 'data': {'unread_count': unread_count}}),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    response = StreamingHttpResponse(
+        event_stream(user.id, unread_count),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # nginx yanıtı tamponlamasın - olaylar anında iletilsin
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], cls=DjangoJSONEncoder)}\n\n"
+
+
+async def event_stream(user_id, unread_count):
+    yield f"retry: {SSE_RETRY_MS}\n\n"
+    yield format_event({'type': 'unread_count', 'data': {'unread_count': unread_count}})
+
+    subscription = events.get_broker().subscribe(user_id)
+    next_event = asyncio.ensure_future(anext(subscription))
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_event}, timeout=SSE_HEARTBEAT_SECONDS)
+            if not done:
+                # Proxy'ler boşta bağlantıyı kapatmasın
+                yield ": ping\n\n"
+                continue
+            yield format_event(next_event.result())
+            next_event = asyncio.ensure_future(anext(subscription))
+    finally:
+        # Bekleyen okuma iptal edilir; aboneliğin finally bloğu onu kaldırır
+        next_event.cancel()
+        await asyncio.gather(next_event, return_exceptions=True)
+        await subscription.aclose()
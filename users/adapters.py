@@ -48,7 +48,7 @@ class DefaultSocialAccountAdapter(BaseSocialAccountAdapter):
             email = sociallogin.account.extra_data.get('email')
             if email:
                 try:
-                    user = User.objects.get(email=email)
+                    user = User.objects.get_by_email(email)
                     # Connect social account to existing user
                     sociallogin.connect(request, user)
                 except User.DoesNotExist:
@@ -0,0 +1,73 @@
+"""
+DB sorgusuz JWT doğrulama
+
+JWTAuthentication her istekte User satırını yükler. TokenClaimsAuthentication
+kullanıcıyı access token'daki alanlardan (users.tokens.USER_CLAIMS) kurar:
+User.from_db ile gerçek bir model örneği oluşur, diğer alanlar ertelenir ve
+ilk erişildiklerinde tek sorguda yüklenir (User.refresh_from_db). Böylece
+request.user ile filtreleme/FK ataması ek sorgu yapmaz; profil gibi tam
+kullanıcı gereken view'lar ise bir sorgu öder.
+
+Token'daki alanlar (is_staff, username...) token üretildiğinden beri değişmiş
+olabilir; bu yüzden token'dan kurulan kullanıcı kaydedilemez. Kullanıcıyı
+değiştiren view'lar önce satırı yükler: User.objects.get(pk=request.user.pk)
+
+Pasif (is_active=False) veya silinmiş kullanıcı kontrolü kısa süreli cache'ten
+yapılır (AUTH_USER_STATE_CACHE_SECONDS); kullanıcı kaydedilince silinir. Silme
+tüm worker'lara ancak AUTH_USER_STATE_CACHE_ALIAS paylaşılan bir cache ise
+ulaşır; LocMem'de diğer worker'lar süre dolana kadar eski durumu görür.
+Alanları taşımayan eski token'lar normal yoldan (DB) doğrulanır.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+from .tokens import USER_CLAIMS
+
+
+def user_state_key(user_id):
+    return f"auth:user_active:{user_id}"
+
+
+def is_user_active(user_id):
+    """Kullanıcı var ve aktif mi - sonuç kısa süre cache'lenir"""
+    key = user_state_key(user_id)
+    cache = caches[settings.AUTH_USER_STATE_CACHE_ALIAS]
+    is_active = cache.get(key)
+    if is_active is None:
+        # Silinmiş kullanıcı False olarak cache'lenir
+        is_active = bool(User.objects.filter(pk=user_id).values_list('is_active', flat=True).first())
+        cache.set(key, is_active, settings.AUTH_USER_STATE_CACHE_SECONDS)
+    return is_active
+
+
+def invalidate_user_state(user_id):
+    caches[settings.AUTH_USER_STATE_CACHE_ALIAS].delete(user_state_key(user_id))
+
+
+class TokenClaimsAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+
+        if not is_user_active(user_id):
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        claims = {claim: validated_token[claim] for claim in USER_CLAIMS}
+        claims[api_settings.USER_ID_FIELD] = user_id
+        # from_db değerleri modeldeki alan sırasında bekler; verilmeyenler (is_active dahil) ertelenir
+        fields = [field.attname for field in User._meta.concrete_fields if field.attname in claims]
+        user = User.from_db(router.db_for_read(User), fields, [claims[name] for name in fields])
+        # Token'daki değerler eski olabilir - bu nesne kaydedilemez (User.save)
+        user.from_token_claims = True
+        return user
@@ -0,0 +1,109 @@
+"""
+Refresh token blacklist'i için Bloom filter
+
+simplejwt her refresh isteğinde jti'nin BlacklistedToken'da olup olmadığını
+sorgular. Süreç içindeki Bloom filter "kesinlikle yok" diyebildiği için
+sorgu sadece filtre eşleşince yapılır (eşleşmelerin ~%1'i yanlış pozitif).
+
+- Açılışta ve JWT_BLACKLIST_FILTER_REBUILD_SECONDS'ta bir tablodan baştan
+  kurulur (boyut satır sayısına göre; purge sonrası silinenler de düşer)
+- JWT_BLACKLIST_FILTER_SYNC_SECONDS'ta bir sadece yeni satırlar eklenir
+- Bu süreçte blacklist'e eklenen jti filtreye hemen eklenir
+
+Başka bir süreçte blacklist'e alınan token bu süreçte en fazla SYNC süresi
+kadar geçerli görünebilir; 0 verilirse her kontrolde senkronize edilir.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from django.conf import settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        # m = -n ln p / (ln 2)^2 bit, k = m/n ln 2 hash
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item):
+        # Tek özetten k konum (double hashing)
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+class BlacklistFilter:
+    MIN_CAPACITY = 10000
+    # Eşzamanlı transaction'lar id'leri commit sırasından farklı alabilir -
+    # son görülen id'nin biraz gerisinden okunur (tekrar eklemek zararsız)
+    SYNC_ID_OVERLAP = 100
+    BATCH_SIZE = 5000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._last_id = 0
+        self._built_at = 0
+        self._synced_at = 0
+
+    def rebuild(self):
+        count = BlacklistedToken.objects.count()
+        bloom = BloomFilter(max(count * 2, self.MIN_CAPACITY), settings.JWT_BLACKLIST_FILTER_ERROR_RATE)
+        last_id = 0
+        rows = BlacklistedToken.objects.order_by('id').values_list('id', 'token__jti')
+        for pk, jti in rows.iterator(chunk_size=self.BATCH_SIZE):
+            bloom.add(jti)
+            last_id = pk
+        self._filter = bloom
+        self._last_id = last_id
+        self._built_at = self._synced_at = time.monotonic()
+
+    def sync(self):
+        rows = BlacklistedToken.objects.filter(
+            id__gt=self._last_id - self.SYNC_ID_OVERLAP
+        ).order_by('id').values_list('id', 'token__jti')
+        for pk, jti in rows.iterator(chunk_size=self.BATCH_SIZE):
+            self._filter.add(jti)
+            self._last_id = max(self._last_id, pk)
+        self._synced_at = time.monotonic()
+
+    def might_contain(self, jti):
+        """False ise token kesinlikle blacklist'te değil"""
+        now = time.monotonic()
+        with self._lock:
+            if self._filter is None or now - self._built_at >= settings.JWT_BLACKLIST_FILTER_REBUILD_SECONDS:
+                self.rebuild()
+            elif now - self._synced_at >= settings.JWT_BLACKLIST_FILTER_SYNC_SECONDS:
+                self.sync()
+            return jti in self._filter
+
+    def add(self, jti):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+
+_blacklist_filter = None
+_blacklist_filter_lock = threading.Lock()
+
+
+def get_blacklist_filter():
+    """Süreç genelindeki tek filtre"""
+    global _blacklist_filter
+    if _blacklist_filter is None:
+        with _blacklist_filter_lock:
+            if _blacklist_filter is None:
+                _blacklist_filter = BlacklistFilter()
+    return _blacklist_filter
@@ -0,0 +1,71 @@
+"""
+Django Management Command: Aynı e-postayı (büyük/küçük harf duyarsız) kullanan hesapları ayıkla
+
+users.0007 migration'ı LOWER(email) üzerine unique kısıt ekler; tekrar eden
+adresler varsa migration durur ve bu komutun çalıştırılmasını ister.
+
+Her tekrar grubunda en son giriş yapmış hesap (hiç giriş yoksa en eski kayıt)
+adresi korur. Diğer hesapların e-postası boşaltılır; hesaplar, ilanları ve
+mesajları silinmez, kullanıcı adıyla giriş yapabilirler. Değişen hesaplar
+çıktıda listelenir.
+
+Kullanım:
+    python manage.py dedupe_user_emails --dry-run
+    python manage.py dedupe_user_emails
+    python manage.py migrate users
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Lower
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Büyük/küçük harf duyarsız tekrar eden e-postaları tek hesapta bırakır'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sadece listele, değiştirme',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        duplicates = (
+            User.objects.exclude(email='')
+            .annotate(email_lower=Lower('email'))
+            .values('email_lower')
+            .annotate(total=Count('id'))
+            .filter(total__gt=1)
+            .order_by('email_lower')
+            .values_list('email_lower', flat=True)
+        )
+
+        group_count = cleared_count = 0
+        for email in duplicates.iterator():
+            with transaction.atomic():
+                # email DB'nin LOWER'ı ile küçültülmüş; with_email de parametreyi
+                # aynı fonksiyondan geçirdiği için ASCII dışı harflerde de aynı grup bulunur
+                users = list(
+                    User.objects.select_for_update()
+                    .with_email(email)
+                    .order_by(F('last_login').desc(nulls_last=True), 'date_joined', 'id')
+                )
+                keep, others = users[0], users[1:]
+                group_count += 1
+                cleared_count += len(others)
+                self.stdout.write(
+                    f'📧 {email}: ID={keep.pk} ({keep.username}) korunuyor, '
+                    f'boşaltılıyor: {", ".join(f"ID={user.pk} ({user.username})" for user in others)}'
+                )
+                if not dry_run:
+                    User.objects.filter(pk__in=[user.pk for user in others]).update(email='')
+
+        summary = f'{group_count} tekrar eden adres, {cleared_count} hesabın e-postası boşaltıldı'
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'🧪 DRY RUN: {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ {summary}'))
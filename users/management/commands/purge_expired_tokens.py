@@ -0,0 +1,87 @@
+"""
+Django Management Command: Süresi dolmuş JWT kayıtlarını batch'ler halinde sil
+
+Token rotasyonu her refresh'te bir OutstandingToken ve bir BlacklistedToken
+satırı üretir; simplejwt bunları hiç silmez. Süresi dolmuş refresh token
+zaten reddedildiği için kayıtları tutmaya gerek yoktur. flushexpiredtokens
+tek DELETE ile tabloyu uzun süre kilitler; bu komut id sırasıyla küçük
+batch'ler halinde siler (önce BlacklistedToken, sonra OutstandingToken).
+
+Blacklist Bloom filter'ı bir sonraki yeniden kurulumda küçülür
+(JWT_BLACKLIST_FILTER_REBUILD_SECONDS).
+
+Kullanım:
+    python manage.py purge_expired_tokens
+    python manage.py purge_expired_tokens --dry-run
+    python manage.py purge_expired_tokens --batch-size 5000 --sleep 0.1
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Süresi dolmuş outstanding/blacklisted JWT kayıtlarını batch halinde siler'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sadece say, silme',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Batch başına silinecek token sayısı (default: 1000)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Batch\'ler arası bekleme (saniye) - DB yükünü yaymak için (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        start_time = time.time()
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+
+        if options['dry_run']:
+            blacklisted = BlacklistedToken.objects.filter(token__in=expired.values('pk')).count()
+            self.stdout.write(
+                self.style.WARNING(f'🧪 DRY RUN: {expired.count()} outstanding, {blacklisted} blacklisted token silinecekti')
+            )
+            return
+
+        outstanding_total = blacklisted_total = 0
+        last_id = 0
+        while True:
+            ids = list(
+                expired.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            with transaction.atomic():
+                # Cascade toplayıcısını atlamak için bağlı satırlar önce ve doğrudan silinir
+                blacklisted, _ = BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                outstanding, _ = OutstandingToken.objects.filter(pk__in=ids).delete()
+            blacklisted_total += blacklisted
+            outstanding_total += outstanding
+            self.stdout.write(f'🗑️  {outstanding_total} token silindi...')
+
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        elapsed_time = time.time() - start_time
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ {outstanding_total} outstanding, {blacklisted_total} blacklisted token silindi. '
+                f'Süre: {elapsed_time:.1f} saniye'
+            )
+        )
@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-19 13:14
+
+import django.db.models.functions.text
+import users.models
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """Tekrar eden adresler varsa kısıt eklenemez - önce dedupe_user_emails çalıştırılmalı"""
+    User = apps.get_model("users", "User")
+    duplicates = (
+        User.objects.exclude(email="")
+        .annotate(email_lower=Lower("email"))
+        .values("email_lower")
+        .annotate(total=Count("id"))
+        .filter(total__gt=1)
+        .count()
+    )
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} e-posta adresi birden fazla kullanıcıda var. "
+            f"Önce 'python manage.py dedupe_user_emails' çalıştırın."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0006_remove_user_birth_date_remove_user_location_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', users.models.UserManager()),
+            ],
+        ),
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='user_email_ci_unique'),
+        ),
+    ]
@@ -1,5 +1,30 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
+
+
+class UserQuerySet(models.QuerySet):
+    def with_email(self, email):
+        """
+        Büyük/küçük harf duyarsız e-posta eşleşmesi: LOWER(email) = LOWER(%s)
+        - Küçültme iki tarafta da veritabanının LOWER'ı ile yapılır; Python'un
+          str.lower()'ı ASCII dışı harflerde (İ, Ç...) DB'den farklı sonuç verebilir
+        - email <> '' koşulu kısmi user_email_ci_unique indeksinin koşuludur;
+          sorguda olmazsa planlayıcı indeksi kullanamaz
+        """
+        return (
+            self.exclude(email='')
+            .alias(email_lower=Lower('email'))
+            .filter(email_lower=Lower(Value((email or '').strip())))
+        )
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):
+    def get_by_email(self, email):
+        """E-posta ile tek kullanıcı - bulunamazsa User.DoesNotExist"""
+        return self.with_email(email).get()
+
 
 class User(AbstractUser):
     email = models.EmailField()
@@ -10,8 +35,38 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Giriş yollarının tek indeksli araması; aynı adres farklı harflerle tekrar kaydedilemez
+            models.UniqueConstraint(Lower('email'), condition=~Q(email=''), name='user_email_ci_unique'),
+        ]
+
     def __str__(self):
         return self.username
+
+    # users.authentication token'dan kurulan kullanıcıyı işaretler
+    from_token_claims = False
+
+    def save(self, *args, **kwargs):
+        if self.from_token_claims:
+            # Token'dan kopyalanan is_staff/username gibi eski değerler satıra geri yazılmasın
+            raise ValueError(
+                "Token'dan kurulan kullanıcı kaydedilemez; önce User.objects.get(pk=...) ile yükleyin."
+            )
+        super().save(*args, **kwargs)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Token'dan kurulan kullanıcıda (users.authentication) ertelenen bir alana
+        # erişilince alan başına ayrı sorgu yerine hepsi birlikte yüklenir
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+            if self.from_token_claims:
+                # Token'dan gelen alanlar da satırın güncel değeriyle yenilenir
+                fields = {field.attname for field in self._meta.concrete_fields}
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
     
     @property
     def full_name(self):
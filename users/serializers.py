@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
 from .models import User
 
 
@@ -41,7 +42,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         }
     
     def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
+        if User.objects.with_email(value).exists():
             raise serializers.ValidationError("Bu email adresi zaten kullanılıyor.")
         return value
     
@@ -60,14 +61,23 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         validated_data.pop('password_confirm')
         
         # Create user with hashed password
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            password=validated_data['password'],
-            first_name=validated_data.get('first_name', ''),
-            last_name=validated_data.get('last_name', ''),
-            phone_number=validated_data.get('phone_number', ''),
-        )
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=validated_data['username'],
+                    email=validated_data['email'],
+                    password=validated_data['password'],
+                    first_name=validated_data.get('first_name', ''),
+                    last_name=validated_data.get('last_name', ''),
+                    phone_number=validated_data.get('phone_number', ''),
+                )
+        except IntegrityError:
+            # Aynı anda gelen kayıt validate_*'ten sonra unique index'e takıldı
+            if User.objects.with_email(validated_data['email']).exists():
+                raise serializers.ValidationError({'email': ["Bu email adresi zaten kullanılıyor."]})
+            if User.objects.filter(username=validated_data['username']).exists():
+                raise serializers.ValidationError({'username': ["Bu kullanıcı adı zaten kullanılıyor."]})
+            raise
         return user
 
 
@@ -91,7 +101,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
     
     def validate_email(self, value):
         user = self.instance
-        if User.objects.exclude(pk=user.pk).filter(email=value).exists():
+        if User.objects.exclude(pk=user.pk).with_email(value).exists():
             raise serializers.ValidationError("Bu email adresi zaten kullanılıyor.")
         return value
     
@@ -113,7 +123,7 @@ class EmailLoginSerializer(serializers.Serializer):
         if email and password:
             # Email ile kullanıcıyı bul
             try:
-                user = User.objects.get(email=email)
+                user = User.objects.get_by_email(email)
                 # Şifreyi kontrol et
                 if user.check_password(password):
                     if not user.is_active:
@@ -132,7 +142,7 @@ class PasswordResetSerializer(serializers.Serializer):
     email = serializers.EmailField()
     
     def validate_email(self, value):
-        if not User.objects.filter(email=value).exists():
+        if not User.objects.with_email(value).exists():
             raise serializers.ValidationError("Bu email adresi ile kayıtlı kullanıcı bulunamadı.")
         return value
 
@@ -1,11 +1,35 @@
 import logging
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from listings.models import Listing
+from private_messages.models import unread_count_changed
 from .models import User
+from .authentication import invalidate_user_state
+from .utils import invalidate_dashboard_stats
 
-logger = logging.getLogger("custom")
+logger = logging.getLogger("custom.users")
 
 @receiver(post_save, sender=User)
 def log_user_created(sender, instance, created, **kwargs):
     if created:
-        logger.info(f"Yeni kullanıcı oluşturuldu: ID={instance.id}, Email={instance.email}")
\ No newline at end of file
+        logger.info(f"Yeni kullanıcı oluşturuldu: ID={instance.id}, Email={instance.email}")
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_state(sender, instance, **kwargs):
+    # Pasifleştirilen/silinen kullanıcının token'ları cache süresini beklemeden reddedilir
+    invalidate_user_state(instance.pk)
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def invalidate_stats_on_listing_change(sender, instance, **kwargs):
+    # Oluşturma, aktif/pasif ve soft delete (is_deleted) hepsi save() ile gelir
+    invalidate_dashboard_stats(instance.user_id)
+
+
+@receiver(unread_count_changed)
+def invalidate_stats_on_unread_change(sender, user_id, **kwargs):
+    # Yeni mesaj, okundu işaretleme ve silme UnreadCounter üzerinden geçer
+    invalidate_dashboard_stats(user_id)
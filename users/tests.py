@@ -1,3 +1,284 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from listings.tests import MediaTestCase, make_image, make_listing
+from listings.models import Listing, ListingImage
+from private_messages.models import Message
+from . import blacklist
+from .authentication import TokenClaimsAuthentication
+from .blacklist import BloomFilter
+from .models import User
+from .tokens import UserRefreshToken
+from .utils import get_dashboard_stats
 
-# Create your tests here.
+
+class UsersTestCase(MediaTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='seller', email='seller@example.com', password='Str0ng!pass99')
+        self.client = APIClient()
+
+    def login(self, user=None):
+        self.client.force_authenticate(user or self.user)
+
+
+class DashboardTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.user)
+        Listing.objects.create(user=self.user, car=self.listing.car, title='Pasif', description='-', price=1, is_active=False)
+        Listing.objects.create(user=self.user, car=self.listing.car, title='Silinmiş', description='-', price=1, is_deleted=True)
+        other = User.objects.create_user(username='buyer', email='buyer@example.com', password='Str0ng!pass99')
+        Message.objects.create(sender=other, receiver=self.user, text='Merhaba')
+
+    def test_stats(self):
+        self.assertEqual(get_dashboard_stats(self.user.pk), {
+            'total_listings': 2,
+            'active_listings': 1,
+            'inactive_listings': 1,
+            'unread_messages': 1,
+        })
+
+    def test_stats_cached_until_change(self):
+        get_dashboard_stats(self.user.pk)
+        with self.assertNumQueries(0):
+            get_dashboard_stats(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.is_active = False
+            self.listing.save()
+        self.assertEqual(get_dashboard_stats(self.user.pk)['active_listings'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.filter(receiver=self.user).get().delete()
+        self.assertEqual(get_dashboard_stats(self.user.pk)['unread_messages'], 0)
+
+    def test_endpoint_query_count(self):
+        self.login()
+        get_dashboard_stats(self.user.pk)
+        for _ in range(3):
+            ListingImage.objects.create(listing=self.listing, image=make_image())
+
+        # Son ilanlar ve resimleri (2) + son mesajlar (1); istatistik önbellekte
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/users/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['recent_listings']), 2)
+        self.assertEqual(len(response.json()['recent_messages']), 1)
+
+
+class MyListingsTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.user)
+        self.login()
+
+    def test_image_counts(self):
+        ListingImage.objects.create(listing=self.listing, image=make_image())
+        processing = ListingImage.objects.create(listing=self.listing, image=make_image(color=(0, 0, 255)))
+        ListingImage.objects.filter(pk=processing.pk).update(variants={})
+
+        row = self.client.get('/api/users/my_listings/').json()['results'][0]
+        self.assertEqual(row['image_count'], 2)
+        self.assertEqual(row['processing_image_count'], 1)
+        self.assertTrue(row['is_processing'])
+
+    def test_query_count_does_not_grow(self):
+        for i in range(5):
+            listing = Listing.objects.create(user=self.user, car=self.listing.car, title=f'İlan {i}', description='-', price=1)
+            ListingImage.objects.create(listing=listing, image=make_image(color=(i, 0, 0)))
+
+        # Sayım + sayfa + resimler - ilan sayısından bağımsız
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/users/my_listings/')
+        self.assertEqual(len(response.json()['results']), 6)
+
+    def test_status_filter_and_deleted(self):
+        Listing.objects.create(user=self.user, car=self.listing.car, title='Pasif', description='-', price=1, is_active=False)
+        Listing.objects.create(user=self.user, car=self.listing.car, title='Silinmiş', description='-', price=1, is_deleted=True)
+
+        def titles(params):
+            return {row['title'] for row in self.client.get('/api/users/my_listings/', params).json()['results']}
+
+        self.assertEqual(titles({}), {'İlan', 'Pasif'})
+        self.assertEqual(titles({'status': 'active'}), {'İlan'})
+        self.assertEqual(titles({'status': 'inactive'}), {'Pasif'})
+
+
+class TokenClaimsAuthenticationTests(UsersTestCase):
+    def authenticate(self, token):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return TokenClaimsAuthentication().authenticate(request)[0]
+
+    def access_token(self, user=None):
+        return str(UserRefreshToken.for_user(user or self.user).access_token)
+
+    def test_user_built_from_claims(self):
+        token = self.access_token()
+        self.authenticate(token)
+
+        # Aktiflik cache'te - kullanıcı satırı okunmaz
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+        self.assertEqual((user.pk, user.username, user.is_staff), (self.user.pk, 'seller', False))
+
+        # Ertelenen alanlar ilk erişimde tek sorguda yüklenir
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'seller@example.com')
+            self.assertEqual(user.first_name, '')
+
+    def test_deactivated_user_rejected(self):
+        token = self.access_token()
+        self.authenticate(token)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_deleted_user_rejected(self):
+        token = self.access_token()
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_token_user_cannot_be_saved(self):
+        user = self.authenticate(self.access_token())
+        with self.assertRaises(ValueError):
+            user.save()
+
+    def test_token_without_claims_loads_user(self):
+        token = RefreshToken.for_user(self.user).access_token
+        with self.assertNumQueries(1):
+            user = self.authenticate(str(token))
+        self.assertFalse(user.from_token_claims)
+        self.assertEqual(user.email, 'seller@example.com')
+
+    def test_endpoint_without_user_query(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token()}')
+        self.client.get('/api/messages/unread_count/')
+        # Sadece UnreadCounter
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/messages/unread_count/')
+        self.assertEqual(response.json(), {'unread_count': 0})
+
+
+class RefreshTokenBlacklistTests(UsersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(setattr, blacklist, '_blacklist_filter', None)
+        blacklist._blacklist_filter = None
+
+    def refresh(self, token):
+        return self.client.post('/api/token/refresh/', {'refresh': str(token)})
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 0.01)
+        items = [f'jti-{i}' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_rotated_token_rejected_after_filter_rebuild(self):
+        token = UserRefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['refresh'], str(token))
+
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+        # Yeni süreç: filtre tablodan baştan kurulur
+        blacklist._blacklist_filter = None
+        self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertEqual(self.refresh(response.json()['refresh']).status_code, 200)
+
+    def test_blacklisted_in_other_process_seen_after_sync(self):
+        token = UserRefreshToken.for_user(self.user)
+        jti = token['jti']
+        blacklist_filter = blacklist.get_blacklist_filter()
+        self.assertFalse(blacklist_filter.might_contain(jti))
+
+        # Başka bir süreç blacklist'e ekledi - bu süreçteki filtre sync ile görür
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))
+        with override_settings(JWT_BLACKLIST_FILTER_SYNC_SECONDS=0):
+            self.assertTrue(blacklist_filter.might_contain(jti))
+            self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_filter_miss_skips_blacklist_query(self):
+        token = UserRefreshToken.for_user(self.user)
+        blacklist.get_blacklist_filter().might_contain('warm-up')
+        with mock.patch('rest_framework_simplejwt.tokens.BlacklistMixin.check_blacklist') as check_blacklist:
+            token.check_blacklist()
+        check_blacklist.assert_not_called()
+
+    def test_purge_expired_tokens(self):
+        expired = UserRefreshToken.for_user(self.user)
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=expired['jti']))
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - timedelta(days=1))
+        valid = UserRefreshToken.for_user(self.user)
+
+        call_command('purge_expired_tokens', stdout=io.StringIO())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [valid['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class EmailLookupTests(UsersTestCase):
+    def register(self, **data):
+        payload = {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'Str0ng!pass99',
+            'password_confirm': 'Str0ng!pass99',
+            **data,
+        }
+        return self.client.post('/api/users/', payload)
+
+    def test_case_insensitive_lookup(self):
+        self.assertEqual(User.objects.get_by_email('  SELLER@Example.com '), self.user)
+        self.assertEqual(User.objects.with_email('seller@example.com').count(), 1)
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_by_email('other@example.com')
+        # Boş e-posta hiçbir kullanıcıyla eşleşmez
+        User.objects.create_user(username='noemail', email='', password='Str0ng!pass99')
+        self.assertFalse(User.objects.with_email('').exists())
+
+    def test_unique_ignoring_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='copy', email='Seller@Example.COM', password='Str0ng!pass99')
+        # Boş e-postalar kısıta girmez
+        User.objects.create_user(username='empty1', email='', password='Str0ng!pass99')
+        User.objects.create_user(username='empty2', email='', password='Str0ng!pass99')
+
+    def test_registration(self):
+        response = self.register()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(User.objects.get_by_email('NEW@example.com').username, 'newuser')
+
+    def test_registration_duplicate_email(self):
+        response = self.register(email='SELLER@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+
+    def test_registration_race_returns_400(self):
+        # validate_email'i geçen eşzamanlı kayıt unique index'e takılır
+        with mock.patch('users.serializers.UserRegistrationSerializer.validate_email', side_effect=lambda value: value):
+            response = self.register(email='Seller@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_token_login_with_email_in_any_case(self):
+        response = self.client.post('/api/token/', {'username': 'Seller@EXAMPLE.com', 'password': 'Str0ng!pass99'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json())
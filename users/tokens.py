@@ -0,0 +1,26 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .blacklist import get_blacklist_filter
+
+# Access token'a da kopyalanan kullanıcı alanları - users.authentication bunlardan
+# DB'ye gitmeden User kurar. Değişirse eski token'lar süresi dolana kadar eski değeri taşır.
+USER_CLAIMS = ['username', 'is_seller', 'is_staff']
+
+
+class UserRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+    def check_blacklist(self):
+        # Filtre "yok" diyorsa DB'ye gitmeye gerek yok; eşleşmede kesin kontrol
+        if get_blacklist_filter().might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        get_blacklist_filter().add(self.payload[api_settings.JTI_CLAIM])
+        return result
@@ -1,8 +1,45 @@
-from django.core.mail import send_mail
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
 from django.template.loader import render_to_string
+from core.mail import queue_email
 
-def send_welcome_email(email):
+
+def dashboard_stats_key(user_id):
+    return f"dashboard:stats:{user_id}"
+
+
+def get_dashboard_stats(user_id):
+    """
+    Dashboard istatistikleri - ilan sayıları tek koşullu aggregate sorgusunda,
+    okunmamış sayısı UnreadCounter'dan. Sonuç kullanıcı bazında önbelleğe alınır;
+    ilan ve mesaj sinyalleri invalidate_dashboard_stats ile siler (users.signals).
+    """
+    key = dashboard_stats_key(user_id)
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    from listings.models import Listing
+    from private_messages.models import UnreadCounter
+
+    stats = Listing.objects.filter(user_id=user_id, is_deleted=False).aggregate(
+        total_listings=Count('id'),
+        active_listings=Count('id', filter=Q(is_active=True)),
+        inactive_listings=Count('id', filter=Q(is_active=False)),
+    )
+    stats['unread_messages'] = UnreadCounter.get_for(user_id)
+    cache.set(key, stats, settings.DASHBOARD_STATS_CACHE_SECONDS)
+    return stats
+
+
+def invalidate_dashboard_stats(user_id):
+    # Commit'ten önce silinirse eşzamanlı bir istek eski değeri tekrar yazabilir
+    transaction.on_commit(lambda: cache.delete(dashboard_stats_key(user_id)))
+
+
+def send_welcome_email(email, user_id=None):
     subject = 'Oto İlan\'a Hoş Geldiniz!'
     message = '''Merhaba,
 
@@ -18,12 +55,13 @@ Artık:
 
 Oto İlan Ekibi'''
 
-    send_mail(
+    # Kuyruğa eklenir, send_queued_emails gönderir - kayıt isteği SMTP beklemez
+    queue_email(
         subject=subject,
         message=message,
         from_email=settings.DEFAULT_FROM_EMAIL,
         recipient_list=[email],
-        fail_silently=False,
+        dedup_key=f"welcome:{user_id or email}",
     )
 
 def send_verification_email(user, verification_url):
@@ -51,10 +89,9 @@ Bu bağlantı 3 gün geçerlidir.
 Saygılarımızla,
 Oto İlan Ekibi"""
     
-    send_mail(
+    queue_email(
         subject=subject,
         message=message,
         from_email=settings.DEFAULT_FROM_EMAIL,
         recipient_list=[user.email],
-        fail_silently=False,
     )
\ No newline at end of file
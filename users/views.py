@@ -8,7 +8,7 @@ from django.db.models import Count, Q
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
+from core.mail import queue_email
 from django.conf import settings
 from django.template.loader import render_to_string
 from google.auth.transport import requests
@@ -24,11 +24,11 @@ from .serializers import (
     PasswordResetSerializer,
     GoogleOAuthSerializer
 )
-from .utils import send_welcome_email
+from .utils import send_welcome_email, get_dashboard_stats
 from core.throttles import LoginThrottle
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .tokens import UserRefreshToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -78,7 +78,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         user = serializer.save()
-        send_welcome_email(user.email)
+        send_welcome_email(user.email, user.pk)
 
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def email_login(self, request):
@@ -92,7 +92,7 @@ class UserViewSet(viewsets.ModelViewSet):
             user = serializer.validated_data['user']
             
             # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = UserRefreshToken.for_user(user)
             
             return Response({
                 'access': str(refresh.access_token),
@@ -124,7 +124,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 
                 # Check if user exists
                 try:
-                    user = User.objects.get(email=email)
+                    user = User.objects.get_by_email(email)
                     # Update user info from Google
                     user.first_name = google_user_info.get('given_name', '')
                     user.last_name = google_user_info.get('family_name', '')
@@ -148,10 +148,10 @@ class UserViewSet(viewsets.ModelViewSet):
                         is_email_verified=True,
                     )
                     # Send welcome email
-                    send_welcome_email(user.email)
+                    send_welcome_email(user.email, user.pk)
                 
                 # Generate JWT tokens
-                refresh = RefreshToken.for_user(user)
+                refresh = UserRefreshToken.for_user(user)
                 
                 return Response({
                     'access': str(refresh.access_token),
@@ -192,7 +192,7 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             email = serializer.validated_data['email']
-            user = User.objects.get(email=email)
+            user = User.objects.get_by_email(email)
             
             # Generate password reset token
             token = default_token_generator.make_token(user)
@@ -210,12 +210,12 @@ class UserViewSet(viewsets.ModelViewSet):
             subject = 'Şifre Sıfırlama - Oto İlan'
             message = render_to_string('emails/password_reset.txt', context)
             
-            send_mail(
+            queue_email(
                 subject=subject,
                 message=message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[user.email],
-                fail_silently=False,
+                dedup_key=f"password_reset:{user.pk}:{token}",
             )
             
             return Response({'message': 'Şifre sıfırlama maili gönderildi.'}, 
@@ -234,8 +234,10 @@ class UserViewSet(viewsets.ModelViewSet):
             serializer = UserProfileSerializer(request.user)
             return Response(serializer.data)
         else:
+            # request.user token'dan kurulmuş olabilir - güncelleme gerçek satır üzerinden
+            user = User.objects.get(pk=request.user.pk)
             serializer = UserProfileSerializer(
-                request.user, 
+                user, 
                 data=request.data, 
                 partial=request.method == 'PATCH'
             )
@@ -256,70 +258,37 @@ class UserViewSet(viewsets.ModelViewSet):
         
         user = request.user
         
-        try:
-            # Kullanıcının ilanları
-            from listings.models import Listing
-            from listings.serializers import ListingSerializer
-            listings = Listing.objects.filter(
-                user=user, 
-                is_deleted=False
-            ).select_related('car', 'province', 'district', 'neighborhood')
-            
-            # Mesajlar
-            from private_messages.models import Message
-            from private_messages.serializers import MessageSerializer
-            unread_messages = Message.objects.filter(
-                receiver=user,
-                is_read=False
-            ).count()
-        
-            # Son ilanlar (en yeni 5 tanesi)
-            recent_listings = listings.order_by('-created_at')[:5]
-            recent_listings_data = ListingSerializer(
-                recent_listings, 
-                many=True, 
-                context={'request': request}
-            ).data
-        
-                        # Son mesajlar (en yeni 5 tanesi)
-            recent_messages = Message.objects.filter(
-                Q(sender=user) | Q(receiver=user)
-            ).order_by('-timestamp')[:5]
-            recent_messages_data = MessageSerializer(recent_messages, many=True).data
-            
-            # İstatistikler
-            stats = {
-                'total_listings': listings.count(),
-                'active_listings': listings.filter(is_active=True).count(),
-                'inactive_listings': listings.filter(is_active=False).count(),
-                'unread_messages': unread_messages,
-            }
-        
-            return Response({
-                'user': UserSerializer(user).data,
-                'stats': stats,
-                'recent_listings': recent_listings_data,
-                'recent_messages': recent_messages_data,
-            })
-            
-        except Exception as e:
-            # Debug için error'u log'layalım
-            print(f"Dashboard error: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            
-            # Fallback response
-            return Response({
-                'user': UserSerializer(user).data,
-                'stats': {
-                    'total_listings': 0,
-                    'active_listings': 0,
-                    'inactive_listings': 0,
-                    'unread_messages': 0,
-                },
-                'recent_listings': [],
-                'recent_messages': [],
-            })
+        from listings.models import Listing
+        from listings.serializers import ListingSerializer
+        from private_messages.models import Message
+        from private_messages.serializers import MessageSerializer
+
+        # Sabit sorgu sayısı: istatistik (önbellekte yoksa 2) + son ilanlar ve resimleri (2) + son mesajlar (1)
+        stats = get_dashboard_stats(user.id)
+
+        # Son ilanlar (en yeni 5 tanesi)
+        recent_listings = Listing.objects.filter(
+            user=user,
+            is_deleted=False
+        ).with_details().order_by('-created_at')[:5]
+        recent_listings_data = ListingSerializer(
+            recent_listings,
+            many=True,
+            context={'request': request}
+        ).data
+
+        # Son mesajlar (en yeni 5 tanesi)
+        recent_messages = Message.objects.filter(
+            Q(sender=user) | Q(receiver=user)
+        ).select_related('sender', 'receiver').order_by('-timestamp')[:5]
+        recent_messages_data = MessageSerializer(recent_messages, many=True).data
+
+        return Response({
+            'user': UserSerializer(user).data,
+            'stats': stats,
+            'recent_listings': recent_listings_data,
+            'recent_messages': recent_messages_data,
+        })
 
     @action(detail=False, methods=['get'])
     def my_listings(self, request):
@@ -328,12 +297,9 @@ class UserViewSet(viewsets.ModelViewSet):
         GET /api/users/my-listings/
         """
         from listings.models import Listing
-        from listings.serializers import ListingSerializer
-        
-        listings = Listing.objects.filter(
-            user=request.user, 
-            is_deleted=False
-        ).order_by('-created_at')
+        from listings.serializers import OwnerListingSerializer
+
+        listings = Listing.objects.for_owner(request.user)
         
         # Filtreleme
         status_filter = request.query_params.get('status')
@@ -345,10 +311,10 @@ class UserViewSet(viewsets.ModelViewSet):
         # Pagination
         page = self.paginate_queryset(listings)
         if page is not None:
-            serializer = ListingSerializer(page, many=True, context={'request': request})
+            serializer = OwnerListingSerializer(page, many=True, context={'request': request})
             return self.get_paginated_response(serializer.data)
         
-        serializer = ListingSerializer(listings, many=True, context={'request': request})
+        serializer = OwnerListingSerializer(listings, many=True, context={'request': request})
         return Response(serializer.data)
 
 
@@ -356,19 +322,18 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     Custom serializer to support email-based authentication
     """
+    token_class = UserRefreshToken
+
     def validate(self, attrs):
         # Check if username is actually an email
         username = attrs.get('username')
-        print(f"DEBUG: CustomTokenObtainPairSerializer validating username: {username}")
         
         if '@' in username:
             try:
                 # Find user by email and replace username
-                user = User.objects.get(email=username)
+                user = User.objects.get_by_email(username)
                 attrs['username'] = user.username
-                print(f"DEBUG: Found user by email, using username: {user.username}")
             except User.DoesNotExist:
-                print(f"DEBUG: No user found with email: {username}")
                 pass
         
         return super().validate(attrs)
@@ -379,3 +344,12 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     
     def get_throttles(self):
         return [LoginThrottle()]
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    # Blacklist kontrolü Bloom filter üzerinden (users.blacklist)
+    token_class = UserRefreshToken
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer